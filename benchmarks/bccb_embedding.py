@@ -0,0 +1,103 @@
+"""
+Benchmark of the vectorised construction of the first column of the BCCB
+matrix embedding a BTTB matrix (gravmag.convolve.embedding_BCCB) against the
+former construction, which builds one circulant block per Toeplitz block in a
+Python loop and concatenates the pieces.
+
+It builds the first column for all nine combinations of symmetries with both
+constructions, checks that they are equal and prints the execution times.
+
+Usage:
+
+    python benchmarks/bccb_embedding.py [nblocks] [npoints_per_block]
+"""
+
+import sys
+from time import perf_counter
+import numpy as np
+from gravmag import convolve
+
+
+def timing(function, *args, repeat=5, **kwargs):
+    "return the minimum execution time of function(*args, **kwargs)"
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function(*args, **kwargs)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def embedding_BCCB_loop(BTTB_metadata):
+    "first column of the BCCB matrix built block by block"
+    symmetry_structure = BTTB_metadata["symmetry_structure"]
+    symmetry_blocks = BTTB_metadata["symmetry_blocks"]
+    nblocks = BTTB_metadata["nblocks"]
+    columns = BTTB_metadata["columns"]
+    rows = BTTB_metadata["rows"]
+    if rows is None:
+        rows = [None] * columns.shape[0]
+
+    c0 = []
+    for t0, r0 in zip(columns, rows):
+        Toeplitz = {"symmetry": symmetry_blocks, "column": t0, "row": r0}
+        c0.append(
+            convolve.Circulant_from_Toeplitz(
+                Toeplitz, full=False, check_input=False
+            )
+        )
+
+    zero_blocks = np.zeros(2 * columns.shape[1])
+    if symmetry_structure == "symm":
+        c0 = c0 + [zero_blocks] + c0[-1:0:-1]
+    elif symmetry_structure == "skew":
+        c0 = c0 + [zero_blocks] + [-c for c in c0[-1:0:-1]]
+    else:  # symmetry_structure == "gene"
+        c0 = c0[:nblocks] + [zero_blocks] + c0[-1 : nblocks - 1 : -1]
+
+    return np.hstack(c0)
+
+
+def main(nblocks=2000, npoints_per_block=500):
+    rng = np.random.default_rng(5)
+    print("{} blocks x {} points".format(nblocks, npoints_per_block))
+    print(
+        "{:>10s} {:>10s} {:>12s} {:>12s} {:>9s}".format(
+            "structure", "blocks", "loop (s)", "vector (s)", "speedup"
+        )
+    )
+    for symmetry_structure in ["symm", "skew", "gene"]:
+        for symmetry_blocks in ["symm", "skew", "gene"]:
+            ncolumns = (
+                2 * nblocks - 1 if symmetry_structure == "gene" else nblocks
+            )
+            BTTB = {
+                "ordering": "xy",
+                "symmetry_structure": symmetry_structure,
+                "symmetry_blocks": symmetry_blocks,
+                "nblocks": nblocks,
+                "columns": rng.random((ncolumns, npoints_per_block)),
+                "rows": (
+                    rng.random((ncolumns, npoints_per_block - 1))
+                    if symmetry_blocks == "gene"
+                    else None
+                ),
+            }
+            reference = embedding_BCCB_loop(BTTB)
+            result = convolve.embedding_BCCB(BTTB, check_input=False)
+            np.testing.assert_array_equal(result, reference)
+            loop = timing(embedding_BCCB_loop, BTTB)
+            vector = timing(convolve.embedding_BCCB, BTTB, check_input=False)
+            print(
+                "{:>10s} {:>10s} {:>12.4f} {:>12.4f} {:>9.2f}".format(
+                    symmetry_structure,
+                    symmetry_blocks,
+                    loop,
+                    vector,
+                    loop / vector,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
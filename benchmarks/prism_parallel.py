@@ -0,0 +1,85 @@
+"""
+Scaling benchmark of the parallel engine in
+gravmag.models.rectangular_prism_numba.
+
+It computes the vertical component of the gravitational field produced by a
+set of prisms on a large set of computation points by using the serial engine
+and the parallel engine with an increasing number of threads.
+
+Usage:
+
+    python benchmarks/prism_parallel.py [npoints] [nprisms]
+"""
+
+import sys
+from time import perf_counter
+import numpy as np
+import numba
+from gravmag.models import rectangular_prism_numba as rp_nb
+
+
+def timing(function, *args, repeat=3, **kwargs):
+    "return the minimum execution time of function(*args, **kwargs)"
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function(*args, **kwargs)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def main(npoints=40000, nprisms=100):
+    rng = np.random.default_rng(5)
+    coordinates = {
+        "x": rng.uniform(-5000.0, 5000.0, npoints),
+        "y": rng.uniform(-5000.0, 5000.0, npoints),
+        "z": np.full(npoints, -100.0),
+    }
+    x1 = rng.uniform(-4000.0, 3500.0, nprisms)
+    y1 = rng.uniform(-4000.0, 3500.0, nprisms)
+    z1 = rng.uniform(100.0, 1000.0, nprisms)
+    prisms = {
+        "x1": x1,
+        "x2": x1 + 500.0,
+        "y1": y1,
+        "y2": y1 + 500.0,
+        "z1": z1,
+        "z2": z1 + 500.0,
+    }
+    density = rng.uniform(-500.0, 500.0, nprisms)
+
+    # compile
+    small = {key: value[:2] for key, value in coordinates.items()}
+    rp_nb.grav(small, prisms, density, "z")
+    rp_nb.grav(small, prisms, density, "z", parallel=True)
+
+    reference = rp_nb.grav(coordinates, prisms, density, "z")
+    serial = timing(rp_nb.grav, coordinates, prisms, density, "z")
+    print("{} points x {} prisms".format(npoints, nprisms))
+    print("{:>8s} {:>12s} {:>9s} {:>11s}".format("threads", "time (s)", "speedup", "efficiency"))
+    print("{:>8s} {:>12.4f} {:>9.2f} {:>11s}".format("serial", serial, 1.0, "-"))
+    for nthreads in range(1, numba.config.NUMBA_NUM_THREADS + 1):
+        result = rp_nb.grav(
+            coordinates, prisms, density, "z", parallel=True, nthreads=nthreads
+        )
+        # the result must not depend on the number of threads
+        assert np.array_equal(result, reference)
+        elapsed = timing(
+            rp_nb.grav,
+            coordinates,
+            prisms,
+            density,
+            "z",
+            parallel=True,
+            nthreads=nthreads,
+        )
+        speedup = serial / elapsed
+        print(
+            "{:>8d} {:>12.4f} {:>9.2f} {:>11.2f}".format(
+                nthreads, elapsed, speedup, speedup / nthreads
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
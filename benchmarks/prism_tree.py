@@ -0,0 +1,98 @@
+"""
+Benchmark of the hierarchical (Barnes-Hut) engine in
+gravmag.models.rectangular_prism_numba against the direct engine.
+
+It computes the vertical component of the gravitational field produced by a
+regular mesh of prisms with random densities on a regular grid of computation
+points by using the direct summation ('grav') and the octree ('grav_tree')
+with decreasing values of the accuracy parameter theta.
+
+Usage:
+
+    python benchmarks/prism_tree.py [npoints] [ncells] [field]
+
+where npoints is the number of points along each horizontal axis and ncells
+the number of prisms along each horizontal axis (the mesh has ncells / 4
+layers).
+"""
+
+import sys
+from time import perf_counter
+import numpy as np
+from gravmag.models import rectangular_prism_numba as rp_nb
+
+
+def timing(function, *args, repeat=3, **kwargs):
+    "return the minimum execution time of function(*args, **kwargs)"
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function(*args, **kwargs)
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def main(npoints=50, ncells=40, field="z"):
+    rng = np.random.default_rng(5)
+    size = 10000.0 / ncells
+    x, y, z = np.meshgrid(
+        size * np.arange(ncells),
+        size * np.arange(ncells),
+        100.0 + size * np.arange(max(ncells // 4, 1)),
+        indexing="ij",
+    )
+    prisms = {
+        "x1": x.ravel(),
+        "x2": x.ravel() + size,
+        "y1": y.ravel(),
+        "y2": y.ravel() + size,
+        "z1": z.ravel(),
+        "z2": z.ravel() + size,
+    }
+    density = rng.uniform(-300.0, 300.0, x.size)
+    xp, yp = np.meshgrid(
+        np.linspace(-1000.0, 11000.0, npoints),
+        np.linspace(-1000.0, 11000.0, npoints),
+    )
+    coordinates = {
+        "x": xp.ravel(),
+        "y": yp.ravel(),
+        "z": np.full(xp.size, -100.0),
+    }
+
+    # compile
+    small = {key: value[:2] for key, value in coordinates.items()}
+    rp_nb.grav(small, prisms, density, field)
+    rp_nb.grav_tree(small, prisms, density, field)
+
+    print("{} points x {} prisms".format(xp.size, x.size))
+    reference = rp_nb.grav(coordinates, prisms, density, field)
+    direct = timing(rp_nb.grav, coordinates, prisms, density, field, repeat=1)
+    print("direct: {:.4f} s".format(direct))
+
+    # the octree is built once by the model and reused
+    model = rp_nb.PrismModel(prisms)
+    start = perf_counter()
+    model._tree(32)
+    print("octree: {:.4f} s".format(perf_counter() - start))
+
+    packed = rp_nb.pack_coordinates(coordinates)
+    print(
+        "{:>6s} {:>12s} {:>9s} {:>15s}".format(
+            "theta", "time (s)", "speedup", "relative error"
+        )
+    )
+    for theta in [0.8, 0.6, 0.4, 0.2, 0.1]:
+        result = model.grav_tree(packed, density, field, theta=theta)
+        error = np.max(np.abs(result - reference)) / np.max(np.abs(reference))
+        elapsed = timing(model.grav_tree, packed, density, field, theta=theta)
+        print(
+            "{:>6.2f} {:>12.4f} {:>9.2f} {:>15.2e}".format(
+                theta, elapsed, direct / elapsed, error
+            )
+        )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(*[int(arg) for arg in args[:2]], *args[2:])
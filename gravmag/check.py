@@ -1,4 +1,5 @@
 import numpy as np
+from scipy.sparse.linalg import LinearOperator
 
 
 def are_rectangular_prisms(prisms):
@@ -221,8 +222,9 @@ def is_array(x, ndim=None, shape=None):
     ----------
     prop : generic object
         Python object to be verified.
-    ndim : int
-        Positive integer defining the dimension of x.
+    ndim : int or tuple of ints
+        Positive integer defining the dimension of x or tuple of positive
+        integers defining the allowed dimensions of x.
         If None, ndim is ignored. Default is None.
     shape : tuple
         Tuple defining the shape of x.
@@ -231,15 +233,21 @@ def is_array(x, ndim=None, shape=None):
     if type(x) != np.ndarray:
         raise ValueError("x must be a numpy array")
     if ndim != None:
-        if (type(ndim) != int) and (ndim <= 0):
-            raise ValueError("'ndim' must be a positive integer")
-        if x.ndim != ndim:
+        if type(ndim) == tuple:
+            ndims = ndim
+        else:
+            ndims = (ndim,)
+        for item in ndims:
+            if (type(item) != int) and (item <= 0):
+                raise ValueError("'ndim' must be a positive integer")
+        if x.ndim not in ndims:
             raise ValueError(
                 "x.ndim ({}) ".format(x.ndim)
                 + "not equal to the predefined ndim {}".format(ndim)
             )
     if shape != None:
-        if (type(shape) != tuple) or (len(shape) != ndim):
+        # x.ndim is one of the predefined ndims at this point
+        if (type(shape) != tuple) or (ndim == None) or (len(shape) != x.ndim):
             raise ValueError("'shape' must be a tuple of 'ndim' elements")
         for item in shape:
             if (type(item) != int) and (item <= 0):
@@ -322,7 +330,7 @@ def is_ordering(ordering):
         raise ValueError("invalid ordering {}".format(ordering))
 
 
-def sensitivity_matrix_and_data(matrix, data):
+def sensitivity_matrix_and_data(matrix, data, operator=False):
     """
     Check if the given matrix and data are formed by consistent numpy arrays.
 
@@ -330,8 +338,13 @@ def sensitivity_matrix_and_data(matrix, data):
     ----------
     matrix , vector : generic objects
         Lists of Python objects to be verified.
+    operator : boolean
+        If True, matrix can also be a 'scipy.sparse.linalg.LinearOperator'.
+        Default is False.
     """
-    if type(matrix) != np.ndarray:
+    if (operator is True) and isinstance(matrix, LinearOperator):
+        pass
+    elif type(matrix) != np.ndarray:
         raise ValueError("matrix must be a numpy array")
     if type(data) != np.ndarray:
         raise ValueError("data must be a numpy array")
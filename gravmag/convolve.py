@@ -4,7 +4,7 @@ This file contains Python codes for dealing with 2D discrete convolutions.
 
 import numpy as np
 from scipy.linalg import toeplitz, circulant
-from scipy.fft import fft2, ifft2
+from scipy.fft import fft2, ifft2, rfft2, irfft2, next_fast_len
 from . import check, data_structures
 
 
@@ -398,7 +398,7 @@ def BTTB_from_metadata(BTTB_metadata, check_input=True):
     return T
 
 
-def embedding_BCCB(BTTB_metadata, full=False, check_input=True):
+def embedding_BCCB(BTTB_metadata, full=False, fast=False, check_input=True):
     """
     Generate the first column or the full Block Circulant formed by Circulant Blocks (BCCB)
     matrix (Davis, 1979, p. 184) that embeds a given Block Toeplitz formed by Toeplitz Blocks (BTTB)
@@ -406,12 +406,21 @@ def embedding_BCCB(BTTB_metadata, full=False, check_input=True):
 
     See details in the function 'data_structures.BTTB_metadata'.
 
+    A BTTB matrix with Q x Q blocks of P x P elements is embedded, by default, into a BCCB
+    matrix with 2Q x 2Q blocks of 2P x 2P elements. Any larger number of blocks and elements
+    also embeds the BTTB matrix, provided that the extra elements are null (see function
+    'embedding_shape').
+
     parameters
     ----------
     BTTB_metadata : dictionary
         See function 'check.BTTB_metadata' for a description of the input parameters.
     full : boolean
         If True, returns the full BCCB matrix C. Otherwise, returns only its first column. Default is False.
+    fast : boolean
+        If True, the numbers of blocks and elements per block of the BCCB matrix are the
+        smallest even 5-smooth numbers greater than or equal to 2Q and 2P, respectively,
+        so that the FFTs of arrays with these dimensions are fast. Default is False.
     check_input : boolean
         If True, verify if the input is valid. Default is True.
 
@@ -425,6 +434,8 @@ def embedding_BCCB(BTTB_metadata, full=False, check_input=True):
         check.BTTB_metadata(BTTB_metadata)
         if full not in [True, False]:
             raise ValueError("invalid parameter full ({})".format(full))
+        if fast not in [True, False]:
+            raise ValueError("invalid parameter fast ({})".format(fast))
 
     # get the parameters defining the BTTB matrix
     symmetry_structure = BTTB_metadata["symmetry_structure"]
@@ -433,59 +444,47 @@ def embedding_BCCB(BTTB_metadata, full=False, check_input=True):
     columns = BTTB_metadata["columns"]
     rows = BTTB_metadata["rows"]
 
-    nblocks_C = 2 * nblocks
-    npoints_per_block_C = 2 * columns.shape[1]
-
-    # list to store the first (block) column
-    c0 = []
-
-    if symmetry_blocks in ["symm", "skew"]:
-        # iterate over columns
-        for t0 in columns:
-            Toeplitz = {
-                "symmetry": symmetry_blocks,
-                "column": t0,
-                "row": None,
-            }
-            c0.append(
-                Circulant_from_Toeplitz(Toeplitz, full=False, check_input=False)
-            )
+    npoints_per_block = columns.shape[1]
+    nblocks_C, npoints_per_block_C = embedding_shape(
+        nblocks, npoints_per_block, fast, check_input=False
+    )
+
+    # matrix whose rows are the first columns of the circulant blocks forming
+    # the first block column of the BCCB matrix
+    c0 = np.zeros((nblocks_C, npoints_per_block_C), dtype="float64")
+
+    # rows of c0 receiving the Toeplitz blocks: the blocks in the first block
+    # column go to the first rows and those in the first block row go, in the
+    # reversed order, to the last rows. The null blocks lie in between.
+    if symmetry_structure == "gene":
+        indices = np.hstack(
+            [
+                np.arange(nblocks),
+                np.arange(nblocks_C - 1, nblocks_C - nblocks, -1),
+            ]
+        )
+    else:  # symmetry_structure in ["symm", "skew"]
+        indices = np.arange(nblocks)
+
+    # the first column of each circulant block is formed by the column of the
+    # Toeplitz block, zeros and the row of the Toeplitz block in the reversed
+    # order, which is defined by the column if the blocks are 'symm' or 'skew'
+    start = npoints_per_block_C - npoints_per_block + 1
+    c0[indices, :npoints_per_block] = columns
+    if symmetry_blocks == "symm":
+        c0[indices, start:] = columns[:, :0:-1]
+    elif symmetry_blocks == "skew":
+        c0[indices, start:] = -columns[:, :0:-1]
     else:  # symmetry_blocks == "gene"
-        # iterate over columns and rows
-        for t0, r0 in zip(columns, rows):
-            Toeplitz = {
-                "symmetry": symmetry_blocks,
-                "column": t0,
-                "row": r0,
-            }
-            c0.append(
-                Circulant_from_Toeplitz(Toeplitz, full=False, check_input=False)
-            )
+        c0[indices, start:] = rows[:, ::-1]
 
+    # blocks in the first block row defined by those in the first block column
     if symmetry_structure == "symm":
-        c0 = np.hstack(
-            (
-                np.hstack(c0),
-                np.zeros_like(c0[0]),
-                np.hstack(c0[-1:0:-1]),
-            )
-        )
+        c0[nblocks_C - nblocks + 1 :] = c0[nblocks - 1 : 0 : -1]
     elif symmetry_structure == "skew":
-        c0 = np.hstack(
-            (
-                np.hstack(c0),
-                np.zeros_like(c0[0]),
-                -np.hstack(c0[-1:0:-1]),
-            )
-        )
-    else:  # symmetry_structure == "gene"
-        c0 = np.hstack(
-            (
-                np.hstack(c0[:nblocks]),
-                np.zeros_like(c0[0]),
-                np.hstack(c0[-1 : nblocks - 1 : -1]),
-            )
-        )
+        c0[nblocks_C - nblocks + 1 :] = -c0[nblocks - 1 : 0 : -1]
+
+    c0 = c0.ravel()
 
     if full == True:
         C = []
@@ -497,18 +496,64 @@ def embedding_BCCB(BTTB_metadata, full=False, check_input=True):
         C = np.hstack(np.hstack(C[indices]))
 
     else:  # full == False
-        # concatenate all pieces to form the first column of the BCCB matrix
-        C = np.hstack(c0)
+        C = c0
 
     return C
 
 
-def eigenvalues_BCCB(BTTB_metadata, ordering="row", check_input=True):
+def embedding_shape(nblocks, npoints_per_block, fast=False, check_input=True):
+    """
+    Compute the number of blocks and the number of elements per block (along
+    rows/columns) of the BCCB matrix embedding a BTTB matrix (see function
+    'embedding_BCCB'). A circulant matrix of order M embeds a Toeplitz matrix of
+    order P if M >= 2P - 1 and the extra elements of its first column are null.
+
+    parameters
+    ----------
+    nblocks, npoints_per_block : ints
+        Number of blocks and number of elements per block of the BTTB matrix.
+    fast : boolean
+        If False, returns 2 nblocks and 2 npoints_per_block. If True, returns the
+        smallest even 5-smooth numbers greater than or equal to them (see function
+        'scipy.fft.next_fast_len'). Default is False.
+    check_input : boolean
+        If True, verify if the input is valid. Default is True.
+
+    returns
+    -------
+    nblocks_C, npoints_per_block_C : ints
+        Number of blocks and number of elements per block of the BCCB matrix.
+    """
+
+    if check_input == True:
+        check.is_integer(x=nblocks, positive=True)
+        check.is_integer(x=npoints_per_block, positive=True)
+        if fast not in [True, False]:
+            raise ValueError("invalid parameter fast ({})".format(fast))
+
+    # even sizes keep the half spectrum computed by rfft2 unambiguous
+    if fast == True:
+        nblocks_C = 2 * next_fast_len(nblocks, real=True)
+        npoints_per_block_C = 2 * next_fast_len(npoints_per_block, real=True)
+    else:  # fast == False
+        nblocks_C = 2 * nblocks
+        npoints_per_block_C = 2 * npoints_per_block
+
+    return nblocks_C, npoints_per_block_C
+
+
+def eigenvalues_BCCB(
+    BTTB_metadata, ordering="row", rfft=False, fast=False, check_input=True
+):
     """
     Compute the eigenvalues of a Block Circulant formed by Circulant Blocks (BCCB) matrix C
     that embeds a given Block Toeplitz formed by Toeplitz Blocks (BTTB) matrix. The eigenvalues
     are rearranged along the rows or columns of a matrix L (Takahashi et al., 2020, 2022).
 
+    The first column of C is real, so that L is Hermitian-symmetric and can be
+    represented only by its first half columns, which are computed with a
+    real-to-complex FFT (see parameter 'rfft').
+
     parameters
     ----------
     BTTB_metadata : dictionary
@@ -517,6 +562,14 @@ def eigenvalues_BCCB(BTTB_metadata, ordering="row", check_input=True):
         If "row", the eigenvalues will be arranged along the rows of a matrix L;
         if "column", they will be arranged along the columns of a matrix L.
         Default is 'row'.
+    rfft : boolean
+        If True, returns only the first Q + 1 columns of L, where 2Q is its
+        number of columns. This half spectrum must be used with
+        'product_BCCB_vector' having rfft=True. Default is False.
+    fast : boolean
+        If True, uses the BCCB matrix with FFT-friendly dimensions (see function
+        'embedding_BCCB'). The resulting L must be used with the parameter 'nblocks'
+        of function 'product_BCCB_vector'. Default is False.
     check_input : boolean
         If True, verify if the input is valid. Default is True.
 
@@ -532,6 +585,10 @@ def eigenvalues_BCCB(BTTB_metadata, ordering="row", check_input=True):
         # check if ordering is valid
         if ordering not in ["row", "column"]:
             raise ValueError("invalid {} ordering".format(ordering))
+        if rfft not in [True, False]:
+            raise ValueError("invalid parameter rfft ({})".format(rfft))
+        if fast not in [True, False]:
+            raise ValueError("invalid parameter fast ({})".format(fast))
 
     # get the parameters defining the associated BTTB matrix
     symmetry_structure = BTTB_metadata["symmetry_structure"]
@@ -543,98 +600,367 @@ def eigenvalues_BCCB(BTTB_metadata, ordering="row", check_input=True):
     npoints_per_block_BTTB = columns_BTTB.shape[1]
 
     # compute the first column of the BCCB matrix
-    c0 = embedding_BCCB(BTTB_metadata, full=False, check_input=False)
+    c0 = embedding_BCCB(BTTB_metadata, full=False, fast=fast, check_input=False)
+    shape_BCCB = embedding_shape(
+        nblocks_BTTB, npoints_per_block_BTTB, fast, check_input=False
+    )
 
     # reshape c0 according to ordering
     if ordering == "row":
         # matrix containing the elements of c0 arranged along its rows
-        G = np.reshape(c0, (2 * nblocks_BTTB, 2 * npoints_per_block_BTTB))
+        G = np.reshape(c0, shape_BCCB)
     else:  # if ordering == 'column':
         # matrix containing the elements of vector a arranged along its columns
-        G = np.reshape(c0, (2 * nblocks_BTTB, 2 * npoints_per_block_BTTB)).T
+        G = np.reshape(c0, shape_BCCB).T
 
     # compute the matrix L containing the eigenvalues
-    L = np.sqrt(4 * nblocks_BTTB * npoints_per_block_BTTB) * fft2(
-        x=G, norm="ortho"
-    )
+    if rfft == True:
+        L = np.sqrt(c0.size) * rfft2(x=G, norm="ortho")
+    else:  # rfft == False
+        L = np.sqrt(c0.size) * fft2(x=G, norm="ortho")
 
     return L
 
 
-def product_BCCB_vector(eigenvalues, ordering, v, check_input=True):
+def _BTTB_shape(shape, ordering, size, nblocks, check_input):
+    """
+    Number of blocks and number of points per block of the BTTB matrix with
+    'size' columns embedded in the BCCB matrix whose eigenvalues matrix has
+    the given shape.
+    """
+    if nblocks is None:
+        if check_input == True:
+            if shape[0] * shape[1] != 4 * size:
+                raise ValueError(
+                    "'eigenvalues' size ({}) ".format(shape[0] * shape[1])
+                    + "must be equal to 4 times v size ({})".format(4 * size)
+                )
+        if ordering == "row":
+            return shape[0] // 2, shape[1] // 2
+        # ordering == 'column'
+        return shape[1] // 2, shape[0] // 2
+    if check_input == True:
+        check.is_integer(x=nblocks, positive=True)
+        if size % nblocks != 0:
+            raise ValueError(
+                "v size ({}) must be a multiple of nblocks ({})".format(
+                    size, nblocks
+                )
+            )
+    npoints_per_block = size // nblocks
+    if ordering == "row":
+        shape_BTTB = (nblocks, npoints_per_block)
+    else:  # ordering == 'column'
+        shape_BTTB = (npoints_per_block, nblocks)
+    if check_input == True:
+        if (shape[0] < 2 * shape_BTTB[0] - 1) or (
+            shape[1] < 2 * shape_BTTB[1] - 1
+        ):
+            raise ValueError(
+                "'eigenvalues' shape {} ".format(shape)
+                + "is too small to embed the BTTB matrix"
+            )
+    return nblocks, npoints_per_block
+
+
+def product_BCCB_vector(
+    eigenvalues,
+    ordering,
+    v,
+    rfft=False,
+    workers=None,
+    nblocks=None,
+    check_input=True,
+):
     """
     Compute the product of a BCCB matrix and a vector v by using the eigenvalues of the BCCB
     (Takahashi et al., 2020, 2022).
 
+    The function also computes K products at once, with a single batched FFT over the
+    last two axes, if v is a matrix whose K columns are the vectors to be multiplied
+    and/or if the eigenvalues are a stack of K matrices L. If both are given, each
+    column of v is multiplied by the corresponding BCCB matrix.
+
     parameters
     ----------
-    L : numpy array 2D
-        Matrix formed by the eigenvalues of the BCCB.
+    L : numpy array 2D or 3D
+        Matrix formed by the eigenvalues of the BCCB or array with shape (K, ...)
+        containing K of these matrices.
     ordering: string
         If "row", the eigenvalues are arranged along the rows of matrix L;
         if "column", they are arranged along the columns of L.
-    v: numpy array 1d
-        Vector to be multiplied by the BCCB matrix.
+    v: numpy array 1d or 2d
+        Vector to be multiplied by the BCCB matrix or matrix whose K columns are
+        the vectors to be multiplied.
+    rfft : boolean
+        If True, L contains only the first half columns of the eigenvalues
+        (see function 'eigenvalues_BCCB') and the product is computed with
+        real-to-complex FFTs. Default is False.
+    workers : int or None
+        Maximum number of workers used by scipy.fft. If None (default),
+        uses the default of scipy.fft.
+    nblocks : int or None
+        Number of blocks of the BTTB matrix associated with the BCCB matrix. It must
+        be given if L was computed by function 'eigenvalues_BCCB' with fast=True.
+        If None (default), the BCCB matrix has twice the number of blocks and
+        elements per block of the BTTB matrix.
     check_input : boolean
         If True, verify if the input is valid. Default is True.
 
     returns
     -------
-    w: numpy array 1d
+    w: numpy array 1d or 2d
         Vector containing the non-null elements of the product of the BCCB
-        matrix and vector v.
+        matrix and vector v. If v is a matrix or L is a stack of matrices, w
+        is a matrix whose K columns are the products.
     """
 
     if check_input == True:
-        check.is_array(x=eigenvalues, ndim=2)
+        check.is_array(x=eigenvalues, ndim=(2, 3))
         if ordering not in ["row", "column"]:
             raise ValueError("invalid ordering {}".format(ordering))
-        check.is_array(x=v, ndim=1)
-        if eigenvalues.size != 4 * v.size:
-            raise ValueError(
-                "'eigenvalues' size ({}) must be equal to 4 times v size ({})".format(
-                    eigenvalues.size, 4 * v.size
+        check.is_array(x=v, ndim=(1, 2))
+        if (eigenvalues.ndim == 3) and (v.ndim == 2):
+            if eigenvalues.shape[0] != v.shape[1]:
+                raise ValueError(
+                    "the number of eigenvalues matrices ({}) ".format(
+                        eigenvalues.shape[0]
+                    )
+                    + "must be equal to the number of columns of v "
+                    + "({})".format(v.shape[1])
                 )
-            )
+        if rfft not in [True, False]:
+            raise ValueError("invalid parameter rfft ({})".format(rfft))
+        if workers is not None:
+            check.is_integer(x=workers, positive=True)
+
+    # shape of the full matrix of eigenvalues
+    if rfft == True:
+        shape = (eigenvalues.shape[-2], 2 * (eigenvalues.shape[-1] - 1))
+    else:  # rfft == False
+        shape = eigenvalues.shape[-2:]
+
+    # define the number of blocks and points per block of the
+    # BTTB matrix associated with the BCCB matrix
+    nblocks_BTTB, npoints_per_block_BTTB = _BTTB_shape(
+        shape, ordering, v.shape[0], nblocks, check_input
+    )
+
+    # number of products; the vectors are stacked along the first axis
+    batch = (v.ndim == 2) or (eigenvalues.ndim == 3)
+    if v.ndim == 2:
+        vectors = v.T
+    else:  # v.ndim == 1
+        vectors = v[np.newaxis, :]
+    K = vectors.shape[0]
 
-    # rearrange vector v into a matrix and pad with zeros
+    # rearrange the vectors into matrices and pad with zeros
+    V = np.zeros((K,) + shape, dtype="float64")
     if ordering == "row":
-        # define the number of blocks and points per block of the
-        # BTTB matrix associated with the BCCB matrix
-        nblocks_BTTB = eigenvalues.shape[0] // 2
-        npoints_per_block_BTTB = eigenvalues.shape[1] // 2
-        # matrix containing the elements of vector a arranged along its rows
-        V = np.reshape(v, (nblocks_BTTB, npoints_per_block_BTTB))
-        V = np.hstack([V, np.zeros((nblocks_BTTB, npoints_per_block_BTTB))])
-        V = np.vstack([V, np.zeros((nblocks_BTTB, 2 * npoints_per_block_BTTB))])
+        # matrices containing the elements of the vectors arranged along their rows
+        V[:, :nblocks_BTTB, :npoints_per_block_BTTB] = np.reshape(
+            vectors, (K, nblocks_BTTB, npoints_per_block_BTTB)
+        )
     else:  # if ordering == 'column':
-        # define the number of blocks and points per block of the
-        # BTTB matrix associated with the BCCB matrix
-        nblocks_BTTB = eigenvalues.shape[1] // 2
-        npoints_per_block_BTTB = eigenvalues.shape[0] // 2
-        # matrix containing the elements of vector a arranged along its columns
-        V = np.reshape(v, (nblocks_BTTB, npoints_per_block_BTTB)).T
-        V = np.hstack([V, np.zeros((npoints_per_block_BTTB, nblocks_BTTB))])
-        V = np.vstack([V, np.zeros((npoints_per_block_BTTB, 2 * nblocks_BTTB))])
+        # matrices containing the elements of the vectors arranged along their columns
+        V[:, :npoints_per_block_BTTB, :nblocks_BTTB] = np.transpose(
+            np.reshape(vectors, (K, nblocks_BTTB, npoints_per_block_BTTB)),
+            (0, 2, 1),
+        )
 
-    # matrix obtained by computing the Hadamard product
-    H = eigenvalues * fft2(x=V, norm="ortho")
+    # matrices obtained by computing the Hadamard product and
+    # the corresponding inverse FFT, which is real
+    if rfft == True:
+        H = rfft2(x=V, norm="ortho", workers=workers)
+    else:  # rfft == False
+        H = fft2(x=V, norm="ortho", workers=workers)
+    # the Hadamard product is computed in place, except if a single vector
+    # is multiplied by a stack of eigenvalues matrices
+    if (eigenvalues.ndim == 3) and (eigenvalues.shape[0] != K):
+        H = eigenvalues * H
+    else:
+        H *= eigenvalues
+    if rfft == True:
+        W = irfft2(
+            x=H, s=shape, norm="ortho", overwrite_x=True, workers=workers
+        )
+    else:  # rfft == False
+        W = ifft2(x=H, norm="ortho", overwrite_x=True, workers=workers).real
 
-    # matrix containing the non-null elements of the product BCCB v
+    # matrix containing the non-null elements of the products BCCB v
     # arranged according to the parameter 'ordering'
     # the non-null elements are located in the first quadrant.
     if ordering == "row":
-        w = ifft2(x=H, norm="ortho")[
-            :nblocks_BTTB, :npoints_per_block_BTTB
-        ].real
-        w = w.ravel()
+        w = W[:, :nblocks_BTTB, :npoints_per_block_BTTB]
     else:  # if ordering == 'column':
-        w = ifft2(x=H, norm="ortho")[
-            :npoints_per_block_BTTB, :nblocks_BTTB
-        ].real
-        w = w.T.ravel()
+        w = np.transpose(
+            W[:, :npoints_per_block_BTTB, :nblocks_BTTB], (0, 2, 1)
+        )
+    w = np.reshape(w, (W.shape[0], nblocks_BTTB * npoints_per_block_BTTB))
+
+    if batch == True:
+        return w.T
+    return w[0]
 
-    return w
+
+class ProductBCCB:
+    """
+    Reusable product of a BCCB matrix and vectors computed with the eigenvalues
+    of the BCCB (see function 'product_BCCB_vector'). The zero-padded matrix
+    and the spectrum are stored in a workspace allocated once, the FFTs are
+    computed in place (parameter 'overwrite_x' of scipy.fft) and the result is
+    written into a caller-supplied output, so that repeated products (e.g., at
+    each iteration of 'eqlayer.method_iterative_deconvolution_TOB20') do not
+    allocate N x M arrays. With rfft=True, scipy.fft allocates the half
+    spectrum and the inverse transform at each product.
+
+    parameters
+    ----------
+    eigenvalues : numpy array 2D
+        Matrix formed by the eigenvalues of the BCCB (see function 'eigenvalues_BCCB').
+    ordering: string
+        If "row", the eigenvalues are arranged along the rows of matrix L;
+        if "column", they are arranged along the columns of L.
+    rfft : boolean
+        If True, eigenvalues contains only the first half columns of the
+        eigenvalues (see function 'eigenvalues_BCCB'). Default is False.
+    workers : int or None
+        Maximum number of workers used by scipy.fft. If None (default),
+        uses the default of scipy.fft.
+    nblocks, size : ints or None
+        Number of blocks and number of columns of the BTTB matrix associated
+        with the BCCB matrix. They must be given if L was computed by function
+        'eigenvalues_BCCB' with fast=True (see function 'product_BCCB_vector').
+        Default is None.
+    check_input : boolean
+        If True, verify if the input is valid. Default is True.
+    """
+
+    def __init__(
+        self,
+        eigenvalues,
+        ordering,
+        rfft=False,
+        workers=None,
+        nblocks=None,
+        size=None,
+        check_input=True,
+    ):
+        if check_input == True:
+            check.is_array(x=eigenvalues, ndim=2)
+            if ordering not in ["row", "column"]:
+                raise ValueError("invalid ordering {}".format(ordering))
+            if rfft not in [True, False]:
+                raise ValueError("invalid parameter rfft ({})".format(rfft))
+            if workers is not None:
+                check.is_integer(x=workers, positive=True)
+            if (nblocks is None) != (size is None):
+                raise ValueError("nblocks and size must be given together")
+            if size is not None:
+                check.is_integer(x=size, positive=True)
+
+        self.eigenvalues = eigenvalues
+        self.ordering = ordering
+        self.rfft = rfft
+        self.workers = workers
+
+        # shape of the full matrix of eigenvalues
+        if rfft == True:
+            self.shape = (eigenvalues.shape[0], 2 * (eigenvalues.shape[1] - 1))
+            self._workspace = np.zeros(self.shape, dtype="float64")
+        else:  # rfft == False
+            self.shape = eigenvalues.shape
+            self._workspace = np.zeros(self.shape, dtype="complex128")
+
+        # number of blocks and points per block of the BTTB matrix
+        if size is None:
+            size = self.shape[0] * self.shape[1] // 4
+        self.nblocks, self.npoints_per_block = _BTTB_shape(
+            self.shape, ordering, size, nblocks, check_input
+        )
+        self.size = size
+
+    def __call__(self, v, out=None, transpose=False, check_input=True):
+        """
+        Compute the product of the BCCB matrix (or its transpose) and a vector v.
+
+        parameters
+        ----------
+        v: numpy array 1d
+            Vector to be multiplied by the BCCB matrix.
+        out : numpy array 1d or None
+            Array with dtype float64 receiving the result. If None (default),
+            a new array is created.
+        transpose : boolean
+            If True, computes the product with the transposed BTTB matrix by using
+            the conjugate eigenvalues. Default is False.
+        check_input : boolean
+            If True, verify if the input is valid. Default is True.
+
+        returns
+        -------
+        w: numpy array 1d
+            Vector containing the non-null elements of the product. It is 'out'
+            if a buffer is given.
+        """
+
+        if check_input == True:
+            check.is_array(x=v, ndim=1, shape=(self.size,))
+            if out is not None:
+                check.is_array(x=out, ndim=1, shape=(self.size,))
+                if out.dtype != np.float64:
+                    raise ValueError("out must have dtype float64")
+            if transpose not in [True, False]:
+                raise ValueError(
+                    "invalid parameter transpose ({})".format(transpose)
+                )
+
+        if out is None:
+            out = np.empty(self.size, dtype="float64")
+
+        # rearrange vector v into the zero-padded workspace
+        V = self._workspace
+        V.fill(0)
+        if self.ordering == "row":
+            V[: self.nblocks, : self.npoints_per_block] = np.reshape(
+                v, (self.nblocks, self.npoints_per_block)
+            )
+        else:  # if ordering == 'column':
+            V[: self.npoints_per_block, : self.nblocks] = np.reshape(
+                v, (self.nblocks, self.npoints_per_block)
+            ).T
+
+        # Hadamard product; conj(L) H = conj(L conj(H))
+        if self.rfft == True:
+            H = rfft2(x=V, norm="ortho", workers=self.workers)
+        else:  # rfft == False
+            H = fft2(x=V, norm="ortho", overwrite_x=True, workers=self.workers)
+        if transpose == True:
+            np.conjugate(H, out=H)
+            H *= self.eigenvalues
+            np.conjugate(H, out=H)
+        else:  # transpose == False
+            H *= self.eigenvalues
+        if self.rfft == True:
+            W = irfft2(
+                x=H,
+                s=self.shape,
+                norm="ortho",
+                overwrite_x=True,
+                workers=self.workers,
+            )
+        else:  # rfft == False
+            W = ifft2(x=H, norm="ortho", overwrite_x=True, workers=self.workers)
+            W = W.real
+
+        # the non-null elements are located in the first quadrant
+        w = np.reshape(out, (self.nblocks, self.npoints_per_block))
+        if self.ordering == "row":
+            w[:] = W[: self.nblocks, : self.npoints_per_block]
+        else:  # if ordering == 'column':
+            w[:] = W[: self.npoints_per_block, : self.nblocks].T
+
+        return out
 
 
 # def eigenvalues_matrix(h_hat, u_hat, eigenvalues_K,
@@ -282,8 +282,11 @@ def method_CGLS(
 
     parameters
     ----------
-    sensitivity_matrices: list of numpy arrays 2d
+    sensitivity_matrices: list of numpy arrays 2d or linear operators
         List of matrices with same number of columns defining the kernel of the equivalent layer integral.
+        The matrices can also be given as 'scipy.sparse.linalg.LinearOperator' objects
+        (e.g., 'inverse_distance.KernelOperator'), which are accessed only through the
+        products with vectors.
     data_vectors : list of numpy arrays 1d
         List of potential-field data.
     epsilon : float
@@ -314,7 +317,9 @@ def method_CGLS(
                 "sensitivity_matrices and data_vectors must have the same number of elements"
             )
         for G, data in zip(sensitivity_matrices, data_vectors):
-            check.sensitivity_matrix_and_data(matrix=G, data=data)
+            check.sensitivity_matrix_and_data(
+                matrix=G, data=data, operator=True
+            )
         nparams = sensitivity_matrices[0].shape[1]
         for G in sensitivity_matrices[1:]:
             if G.shape[1] != nparams:
@@ -548,6 +553,9 @@ def method_iterative_deconvolution_TOB20(
     epsilon,
     ITMAX=50,
     p0=None,
+    rfft=False,
+    workers=None,
+    nblocks=None,
     check_input=True,
 ):
     """
@@ -570,6 +578,17 @@ def method_iterative_deconvolution_TOB20(
         Maximum number of iterations. Default is 50.
     p0 : numpy aray 1d or None
         If not None, it is the initial approximation for the parameter vector.
+    rfft : boolean
+        If True, the eigenvalues_matrices contain only the half spectra computed
+        by 'convolve.eigenvalues_BCCB' with rfft=True and the products are computed
+        with real-to-complex FFTs. Default is False.
+    workers : int or None
+        Maximum number of workers used by scipy.fft. If None (default), uses the
+        default of scipy.fft.
+    nblocks : int or None
+        Number of blocks of the BTTB sensitivity matrices. It must be given if the
+        eigenvalues_matrices were computed by 'convolve.eigenvalues_BCCB' with
+        fast=True. Default is None.
     check_input : boolean
         If True, verify if the input is valid. Default is True.
 
@@ -582,6 +601,10 @@ def method_iterative_deconvolution_TOB20(
     """
 
     if check_input == True:
+        if rfft not in [True, False]:
+            raise ValueError("invalid parameter rfft ({})".format(rfft))
+        if workers is not None:
+            check.is_integer(x=workers, positive=True)
         if type(eigenvalues_matrices) != list:
             raise ValueError("eigenvalues_matrices must be a list")
         for L in eigenvalues_matrices:
@@ -602,7 +625,11 @@ def method_iterative_deconvolution_TOB20(
         shape = eigenvalues_matrices[0].shape
         # check the consistency of eigenvalues_matrices
         for L in eigenvalues_matrices:
-            if L.size != 4 * npoints:
+            if rfft == True:
+                size = L.shape[0] * 2 * (L.shape[1] - 1)
+            else:  # rfft == False
+                size = L.size
+            if (nblocks is None) and (size != 4 * npoints):
                 raise ValueError(
                     "All 'L' matrices must have a size equal to 4 times the number of observation points"
                 )
@@ -651,12 +678,27 @@ def method_iterative_deconvolution_TOB20(
     else:  # p0 is None
         parameters = np.zeros(npoints, dtype=float)
 
+    # products with the BCCB matrices reusing their workspaces
+    products = []
+    for L in eigenvalues_matrices:
+        products.append(
+            convolve.ProductBCCB(
+                eigenvalues=L,
+                ordering="row",
+                rfft=rfft,
+                workers=workers,
+                nblocks=nblocks,
+                size=None if nblocks is None else npoints,
+                check_input=check_input,
+            )
+        )
+
     # initialize auxiliary variables
     vartheta = np.zeros_like(parameters)
-    for L, res in zip(eigenvalues_matrices, residuals):
-        vartheta[:] += convolve.product_BCCB_vector(
-            eigenvalues=np.conj(L), ordering="row", v=res
-        )
+    aux_vector = np.zeros_like(parameters)
+    for product, res in zip(products, residuals):
+        product(v=res, out=aux_vector, transpose=True, check_input=False)
+        vartheta += aux_vector
     rho0 = np.sum(vartheta * vartheta)
     tau = 0.0
     eta = np.zeros_like(parameters)
@@ -669,10 +711,8 @@ def method_iterative_deconvolution_TOB20(
     while (delta > epsilon) and (m < ITMAX):
         eta[:] = vartheta + tau * eta
         aux = 0.0
-        for L, nu in zip(eigenvalues_matrices, nus):
-            nu[:] = convolve.product_BCCB_vector(
-                eigenvalues=L, ordering="row", v=eta
-            )
+        for product, nu in zip(products, nus):
+            product(v=eta, out=nu, check_input=False)
             aux += np.sum(nu * nu)
         upsilon = rho0 / aux
         parameters[:] += upsilon * eta
@@ -683,10 +723,9 @@ def method_iterative_deconvolution_TOB20(
         delta = np.sqrt(delta) / ndata
         deltas.append(delta)
         vartheta[:] = 0.0  # remember that vartheta in an array like parameters
-        for L, res in zip(eigenvalues_matrices, residuals):
-            vartheta[:] += convolve.product_BCCB_vector(
-                eigenvalues=np.conj(L), ordering="row", v=res
-            )
+        for product, res in zip(products, residuals):
+            product(v=res, out=aux_vector, transpose=True, check_input=False)
+            vartheta += aux_vector
         rho = np.sum(vartheta * vartheta)
         tau = rho / rho0
         rho0 = rho
@@ -0,0 +1,414 @@
+"""
+Hierarchical matrices (H-matrices) for representing the kernels of the
+equivalent layer computed at scattered points (Hackbusch, 1999). The data
+and source points are organized in cluster trees and the matrix is split
+into blocks defined by pairs of clusters. Blocks of well separated clusters
+are approximated by low-rank matrices computed via adaptive cross
+approximation (ACA) with partial pivoting (Bebendorf, 2000), which uses only
+some rows and columns of each block. The remaining blocks are stored as
+dense matrices.
+"""
+
+import numpy as np
+from scipy.sparse.linalg import LinearOperator
+from . import check
+from . import inverse_distance as idist
+
+
+def cluster_tree(points, leaf_size=64, check_input=True):
+    """
+    Build a binary cluster tree by recursively splitting the bounding box of
+    the points at the median of its largest side until each cluster has at
+    most 'leaf_size' points.
+
+    parameters
+    ----------
+    points: dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+    leaf_size : int
+        Maximum number of points in the leaves of the tree. Default is 64.
+    check_input : boolean
+        If True, verify if the input is valid. Default is True.
+
+    returns
+    -------
+    tree : dictionary
+        Dictionary containing the following keys:
+        - 'order' : permutation of the points. Each cluster contains the
+          points order[start:end], where start and end are the cluster limits.
+        - 'start', 'end' : numpy arrays 1d with the limits of the clusters.
+        - 'children' : C x 2 array containing the indices of the children of
+          each cluster. The leaves have children equal to -1. The root is the
+          cluster 0.
+        - 'lower', 'upper' : C x 3 arrays containing the lower and upper
+          corners of the bounding box of each cluster.
+    """
+
+    if check_input is True:
+        check.are_coordinates(points)
+        check.is_integer(x=leaf_size, positive=True)
+
+    coordinates = np.column_stack([points["x"], points["y"], points["z"]])
+    P = coordinates.shape[0]
+    order = np.arange(P)
+    start = []
+    end = []
+    children = []
+    lower = []
+    upper = []
+
+    # clusters waiting to be created: (start, end, parent)
+    stack = [(0, P, -1)]
+    while stack:
+        s, e, parent = stack.pop()
+        cluster = len(start)
+        indices = order[s:e]
+        cluster_points = coordinates[indices]
+        cluster_lower = cluster_points.min(axis=0)
+        cluster_upper = cluster_points.max(axis=0)
+        start.append(s)
+        end.append(e)
+        children.append([-1, -1])
+        lower.append(cluster_lower)
+        upper.append(cluster_upper)
+        if parent >= 0:
+            children[parent][children[parent].index(-1)] = cluster
+        # coincident points cannot be split
+        sides = cluster_upper - cluster_lower
+        if (e - s > leaf_size) and np.any(sides > 0):
+            axis = np.argmax(sides)
+            half = (e - s) // 2
+            split = np.argpartition(cluster_points[:, axis], half)
+            order[s:e] = indices[split]
+            stack.append((s + half, e, cluster))
+            stack.append((s, s + half, cluster))
+
+    tree = {
+        "order": order,
+        "start": np.array(start, dtype="int64"),
+        "end": np.array(end, dtype="int64"),
+        "children": np.array(children, dtype="int64"),
+        "lower": np.array(lower, dtype="float64"),
+        "upper": np.array(upper, dtype="float64"),
+    }
+
+    return tree
+
+
+def aca(row, column, shape, tolerance, max_rank=None):
+    """
+    Adaptive cross approximation (ACA) with partial pivoting of a matrix A
+    whose rows and columns are computed on demand (Bebendorf, 2000). The
+    matrix is approximated by U V, where U and V have k columns and rows,
+    respectively. The iterations stop when the norm of the last cross
+    u_k v_k is smaller than 'tolerance' times the estimated Frobenius norm of
+    the approximation.
+
+    parameters
+    ----------
+    row, column : functions
+        Functions receiving an index and returning the corresponding row and
+        column of the matrix A, respectively.
+    shape : tuple of 2 ints
+        Number of rows and columns of A.
+    tolerance : float
+        Positive scalar defining the relative accuracy of the approximation.
+    max_rank : int or None
+        Maximum number of crosses. If None (default), it is min(shape).
+
+    returns
+    -------
+    U : numpy array 2d
+        m x k matrix.
+    V : numpy array 2d
+        k x n matrix.
+    error : float
+        Estimated relative error of the approximation in the Frobenius norm.
+    """
+    m, n = shape
+    if max_rank is None:
+        max_rank = min(m, n)
+    us = []
+    vs = []
+    used_rows = np.zeros(m, dtype=bool)
+    used_columns = np.zeros(n, dtype=bool)
+    norm2 = 0.0
+    error = 1.0
+    i = 0
+    while len(us) < max_rank:
+        used_rows[i] = True
+        # residual of the row i
+        r = row(i)
+        for u, v in zip(us, vs):
+            r = r - u[i] * v
+        r_free = np.where(used_columns, 0.0, np.abs(r))
+        j = np.argmax(r_free)
+        if r_free[j] == 0.0:
+            # null residual row; try an unused row
+            if np.all(used_rows):
+                error = 0.0
+                break
+            i = np.argmin(used_rows)
+            continue
+        used_columns[j] = True
+        v_new = r / r[j]
+        # residual of the column j
+        u_new = column(j)
+        for u, v in zip(us, vs):
+            u_new = u_new - v[j] * u
+        # update the squared Frobenius norm of the approximation
+        u_norm2 = np.dot(u_new, u_new)
+        v_norm2 = np.dot(v_new, v_new)
+        for u, v in zip(us, vs):
+            norm2 += 2.0 * np.dot(u, u_new) * np.dot(v, v_new)
+        norm2 += u_norm2 * v_norm2
+        us.append(u_new)
+        vs.append(v_new)
+        error = np.sqrt(u_norm2 * v_norm2 / norm2) if norm2 > 0 else 0.0
+        if error <= tolerance:
+            break
+        # next row is that with the largest residual in the new column
+        u_free = np.where(used_rows, 0.0, np.abs(u_new))
+        i = np.argmax(u_free)
+        if u_free[i] == 0.0:
+            if np.all(used_rows):
+                break
+            i = np.argmin(used_rows)
+
+    if len(us) == 0:
+        return np.zeros((m, 0)), np.zeros((0, n)), error
+
+    return np.column_stack(us), np.vstack(vs), error
+
+
+class HMatrix(LinearOperator):
+    """
+    Hierarchical matrix approximating the N x M matrix computed by function
+    'inverse_distance.grad_combination'. The blocks of the matrix defined by
+    admissible pairs of clusters, which satisfy
+
+        min(diam_t, diam_s) <= eta * dist(t, s) ,
+
+    where diam are the diagonals of the bounding boxes and dist is the
+    distance between them, are approximated by low-rank matrices via ACA.
+    The memory and the cost of the products grow almost linearly with N + M.
+    The operator is compatible with 'scipy.sparse.linalg' and with
+    'eqlayer.method_CGLS'.
+
+    parameters
+    ----------
+    data_points: dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+    source_points: dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+    factors : dictionary
+        Factors multiplying the derivatives of the inverse distance function
+        (see function 'inverse_distance.grad_combination').
+    tolerance : float
+        Relative accuracy of the low-rank blocks. Default is 1e-6.
+    eta : float
+        Positive scalar controlling the admissibility condition. Default is 2.
+    leaf_size : int
+        Maximum number of points in the leaves of the cluster trees.
+        Default is 128.
+    nsamples : int
+        Number of rows and columns of each low-rank block used to measure
+        the error of the approximation. Default is 8.
+    check_input : boolean
+        If True, verify if the input is valid. Default is True.
+
+    attributes
+    ----------
+    dense_blocks : list
+        List of tuples (rows, columns, block) defining the dense blocks,
+        where rows and columns are slices of the points sorted according to
+        the cluster trees.
+    low_rank_blocks : list
+        List of tuples (rows, columns, U, V) defining the low-rank blocks.
+    compression_ratio : float
+        Ratio between N x M and the number of stored elements.
+    achieved_tolerance : float
+        Relative error of the whole matrix in the Frobenius norm. The error
+        of each low-rank block is measured from its residuals at 'nsamples'
+        randomly chosen rows and columns, which are computed exactly. It is
+        the exact error if 'nsamples' is not smaller than the number of rows
+        and columns of the blocks.
+    """
+
+    def __init__(
+        self,
+        data_points,
+        source_points,
+        factors,
+        tolerance=1e-6,
+        eta=2.0,
+        leaf_size=128,
+        nsamples=8,
+        check_input=True,
+    ):
+        if check_input is True:
+            check.are_coordinates(data_points)
+            check.are_coordinates(source_points)
+            idist._check_factors(factors)
+            check.is_scalar(x=tolerance, positive=True)
+            check.is_scalar(x=eta, positive=True)
+            check.is_integer(x=leaf_size, positive=True)
+            check.is_integer(x=nsamples, positive=True)
+
+        self.factors = factors
+        self.tolerance = tolerance
+        self.eta = eta
+        self.nsamples = nsamples
+        self.data_tree = cluster_tree(data_points, leaf_size, False)
+        self.source_tree = cluster_tree(source_points, leaf_size, False)
+        # points sorted according to the cluster trees
+        self._data = {
+            key: np.ascontiguousarray(data_points[key][self.data_tree["order"]])
+            for key in "xyz"
+        }
+        self._sources = {
+            key: np.ascontiguousarray(
+                source_points[key][self.source_tree["order"]]
+            )
+            for key in "xyz"
+        }
+        shape = (data_points["x"].size, source_points["x"].size)
+        super().__init__(dtype=np.dtype("float64"), shape=shape)
+        self._build()
+
+    def _block(self, rows, columns):
+        """
+        Compute the block of the matrix defined by the slices rows and
+        columns of the sorted points.
+        """
+        return idist.grad_combination(
+            data_points={key: self._data[key][rows] for key in "xyz"},
+            source_points={key: self._sources[key][columns] for key in "xyz"},
+            factors=self.factors,
+            check_input=False,
+        )
+
+    def _admissible(self, t, s):
+        """
+        Verify if the pair of clusters t (data) and s (sources) is admissible.
+        """
+        lower_t = self.data_tree["lower"][t]
+        upper_t = self.data_tree["upper"][t]
+        lower_s = self.source_tree["lower"][s]
+        upper_s = self.source_tree["upper"][s]
+        diam_t = np.linalg.norm(upper_t - lower_t)
+        diam_s = np.linalg.norm(upper_s - lower_s)
+        gap = np.maximum(0.0, np.maximum(lower_s - upper_t, lower_t - upper_s))
+        return min(diam_t, diam_s) <= self.eta * np.linalg.norm(gap)
+
+    def _residual_norm2(self, rows, columns, U, V, rng):
+        """
+        Estimate the squared Frobenius norm of the difference between the
+        block defined by the slices rows and columns and its low-rank
+        approximation U V. The residuals are computed exactly at randomly
+        chosen rows and columns and scaled by the sampled fractions of the
+        block. The estimate is exact if all rows and columns are sampled.
+        """
+        m, n = U.shape[0], V.shape[1]
+        i = rng.choice(m, size=min(self.nsamples, m), replace=False)
+        j = rng.choice(n, size=min(self.nsamples, n), replace=False)
+        residual_rows = self._block(rows.start + i, columns) - U[i] @ V
+        residual_columns = self._block(rows, columns.start + j) - U @ V[:, j]
+        return 0.5 * (
+            m * np.sum(residual_rows**2) / i.size
+            + n * np.sum(residual_columns**2) / j.size
+        )
+
+    def _build(self):
+        """
+        Split the matrix into blocks and compute them.
+        """
+        self.dense_blocks = []
+        self.low_rank_blocks = []
+        stored = 0
+        error2 = 0.0
+        norm2 = 0.0
+        # fixed seed so that the measured error is reproducible
+        rng = np.random.default_rng(0)
+        data_children = self.data_tree["children"]
+        source_children = self.source_tree["children"]
+        stack = [(0, 0)]
+        while stack:
+            t, s = stack.pop()
+            rows = slice(self.data_tree["start"][t], self.data_tree["end"][t])
+            columns = slice(
+                self.source_tree["start"][s], self.source_tree["end"][s]
+            )
+            m = rows.stop - rows.start
+            n = columns.stop - columns.start
+            t_leaf = data_children[t, 0] == -1
+            s_leaf = source_children[s, 0] == -1
+            if self._admissible(t, s):
+                # low-rank approximation is worthwhile only if k (m + n) < m n
+                U, V, error = aca(
+                    row=lambda i: self._block(
+                        slice(rows.start + i, rows.start + i + 1), columns
+                    )[0],
+                    column=lambda j: self._block(
+                        rows, slice(columns.start + j, columns.start + j + 1)
+                    )[:, 0],
+                    shape=(m, n),
+                    tolerance=self.tolerance,
+                    max_rank=max((m * n) // (m + n), 1),
+                )
+                if error <= self.tolerance:
+                    self.low_rank_blocks.append((rows, columns, U, V))
+                    stored += U.size + V.size
+                    norm2 += np.sum((U.T @ U) * (V @ V.T))
+                    error2 += self._residual_norm2(rows, columns, U, V, rng)
+                    continue
+            if t_leaf and s_leaf:
+                block = self._block(rows, columns)
+                self.dense_blocks.append((rows, columns, block))
+                stored += block.size
+                norm2 += np.sum(block * block)
+            elif t_leaf:
+                stack.extend([(t, child) for child in source_children[s]])
+            elif s_leaf:
+                stack.extend([(child, s) for child in data_children[t]])
+            else:
+                stack.extend(
+                    [
+                        (t_child, s_child)
+                        for t_child in data_children[t]
+                        for s_child in source_children[s]
+                    ]
+                )
+        self.compression_ratio = self.shape[0] * self.shape[1] / stored
+        self.achieved_tolerance = np.sqrt(error2 / norm2) if norm2 > 0 else 0.0
+
+    def _matvec(self, v):
+        return self._matmat(v.reshape(-1, 1)).ravel()
+
+    def _rmatvec(self, v):
+        return self._rmatmat(v.reshape(-1, 1)).ravel()
+
+    def _matmat(self, V):
+        V_sorted = V[self.source_tree["order"]]
+        result_sorted = np.zeros((self.shape[0], V.shape[1]))
+        for rows, columns, block in self.dense_blocks:
+            result_sorted[rows] += block @ V_sorted[columns]
+        for rows, columns, U, W in self.low_rank_blocks:
+            result_sorted[rows] += U @ (W @ V_sorted[columns])
+        result = np.empty_like(result_sorted)
+        result[self.data_tree["order"]] = result_sorted
+        return result
+
+    def _rmatmat(self, V):
+        V_sorted = V[self.data_tree["order"]]
+        result_sorted = np.zeros((self.shape[1], V.shape[1]))
+        for rows, columns, block in self.dense_blocks:
+            result_sorted[columns] += block.T @ V_sorted[rows]
+        for rows, columns, U, W in self.low_rank_blocks:
+            result_sorted[columns] += W.T @ (U.T @ V_sorted[rows])
+        result = np.empty_like(result_sorted)
+        result[self.source_tree["order"]] = result_sorted
+        return result
@@ -4,7 +4,10 @@ between a set of data points and a set of source points.
 """
 
 import numpy as np
-from scipy.spatial import distance
+from numba import njit
+from scipy.spatial import distance, cKDTree
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import LinearOperator
 from . import check, utils
 from . import convolve as cv
 
@@ -366,6 +369,377 @@ def grad_tensor(
     return Kab
 
 
+def grad_tensor_sparse(
+    data_points,
+    source_points,
+    cutoff,
+    components=["xx", "xy", "xz", "yy", "yz", "zz"],
+    nsamples=100,
+    check_input=True,
+):
+    """
+    Compute the partial derivatives of second order of the inverse distance
+    function (see function 'grad_tensor') only for the pairs of data and
+    source points closer than a cutoff radius. The pairs are found with
+    KD-trees and the derivatives are returned as sparse matrices, so that
+    the memory and the cost of the matrix-vector products grow with the
+    number of neighbours instead of N x M. The neglected elements decay with
+    the inverse of the cube of the distance.
+
+    parameters
+    ----------
+    data_points: dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+    source_points: dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+    cutoff : float
+        Positive scalar defining the maximum distance between the data and
+        source points of the computed elements.
+    components : list of strings
+        List of strings defining the tensor components to be computed.
+        Default is ['xx', 'xy', 'xz', 'yy', 'yz', 'zz'], which contains all
+        possible components.
+    nsamples : int
+        Number of rows (evenly spaced data points) used to estimate the
+        truncation error. Default is 100.
+    check_input : boolean
+        If True, verify if the input is valid. Default is True.
+
+    returns
+    -------
+    Kab: Dictionary
+        Dictionary of N x M sparse matrices (scipy.sparse.csr_matrix)
+        containing the computed partial derivatives of second order. The key
+        'truncation_error' contains a dictionary with the estimated relative
+        truncation error of each component. It is the maximum ratio between
+        the sum of the absolute values of the neglected elements and the sum
+        of the absolute values of all elements computed at 'nsamples' rows
+        of the full matrix.
+    """
+
+    if check_input is True:
+        # check shape and ndim of points
+        check.are_coordinates(data_points)
+        check.are_coordinates(source_points)
+        # check if components are valid
+        for component in components:
+            if component not in ["xx", "xy", "xz", "yy", "yz", "zz"]:
+                raise ValueError("component {} invalid".format(component))
+        # check if cutoff is a positive scalar
+        check.is_scalar(x=cutoff, positive=True)
+        # check if nsamples is a positive integer
+        check.is_integer(x=nsamples, positive=True)
+
+    D = data_points["x"].size
+    P = source_points["x"].size
+
+    # find the pairs of data and source points closer than the cutoff
+    data_tree = cKDTree(
+        np.column_stack([data_points["x"], data_points["y"], data_points["z"]])
+    )
+    source_tree = cKDTree(
+        np.column_stack(
+            [source_points["x"], source_points["y"], source_points["z"]]
+        )
+    )
+    pairs = data_tree.sparse_distance_matrix(
+        source_tree, max_distance=cutoff, output_type="ndarray"
+    )
+    i = pairs["i"]
+    j = pairs["j"]
+    R = pairs["v"]
+
+    # compute the inverse distance function to the powers 3 and 5
+    R3 = R * R * R
+    R5 = R3 * R * R
+
+    # full rows used to estimate the truncation error
+    rows = np.unique(np.linspace(0, D - 1, min(nsamples, D)).astype(int))
+    sampled_points = {key: data_points[key][rows] for key in "xyz"}
+    Kab_rows = grad_tensor(
+        sampled_points,
+        source_points,
+        sedm(sampled_points, source_points, check_input=False),
+        components,
+        check_input=False,
+    )
+
+    # compute the gradient tensor components defined in components
+    Kab = dict()
+    Kab["header"] = (
+        "2nd-order partial derivative(s) of the inverse distance function computed at neighbouring scattered points"
+    )
+    Kab["truncation_error"] = dict()
+    for component in components:
+        delta1 = data_points[component[0]][i] - source_points[component[0]][j]
+        delta2 = data_points[component[1]][i] - source_points[component[1]][j]
+        if component in ["xx", "yy", "zz"]:
+            values = ((3 * delta1 * delta2) / R5) - 1 / R3
+        else:
+            values = (3 * delta1 * delta2) / R5
+        Kab[component] = csr_matrix((values, (i, j)), shape=(D, P))
+        full = np.abs(Kab_rows[component])
+        neglected = np.abs(
+            Kab_rows[component] - Kab[component][rows].toarray()
+        )
+        Kab["truncation_error"][component] = np.max(
+            np.sum(neglected, axis=1) / np.sum(full, axis=1)
+        )
+
+    return Kab
+
+
+def grad_combination(
+    data_points,
+    source_points,
+    factors,
+    out=None,
+    check_input=True,
+):
+    """
+    Compute a linear combination of the partial derivatives of first and
+    second order of the inverse distance function between the data points
+    and the source points with a single pass over the pairs of points.
+
+    Differently from functions 'grad' and 'grad_tensor', this function does
+    not use the SEDM nor the N x M matrices of coordinate differences and
+    powers of the distance required by each component. The only N x M array
+    is the output, which can be a preallocated buffer. For example, the
+    first-order directional derivative computed by 'directional_1st_order'
+    is obtained with factors {'x': t[0], 'y': t[1], 'z': t[2]}, where t is
+    the unit vector 'utils.unit_vector(inc, dec)', and the second-order
+    directional derivative computed by 'directional_2nd_order' is obtained
+    with the factors 'utils.directional_factors(t, u)'.
+
+    parameters
+    ----------
+    data_points: dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+    source_points: dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+    factors : dictionary
+        Dictionary whose keys are the components 'x', 'y', 'z', 'xx', 'xy',
+        'xz', 'yy', 'yz' and 'zz' (or a subset of them) and whose values are
+        the scalars multiplying the corresponding derivatives.
+    out : None or numpy array 2d
+        If not None, N x M float64 array in which the result is stored.
+        Default is None.
+    check_input : boolean
+        If True, verify if the input is valid. Default is True.
+
+    returns
+    -------
+    K: numpy array 2d
+        N x M matrix containing the combination of the partial derivatives.
+        It is 'out' if a buffer is given.
+    """
+
+    D = data_points["x"].size
+    P = source_points["x"].size
+
+    if check_input is True:
+        # check shape and ndim of points
+        D = check.are_coordinates(data_points)
+        P = check.are_coordinates(source_points)
+        _check_factors(factors)
+        # check the output buffer
+        if out is not None:
+            check.is_array(x=out, ndim=2, shape=(D, P))
+            if out.dtype != np.float64:
+                raise ValueError("out must have dtype float64")
+
+    if out is None:
+        out = np.empty((D, P), dtype="float64")
+
+    # factors arranged according to COMPONENTS
+    f = np.array([factors.get(component, 0.0) for component in COMPONENTS])
+
+    _jit_grad_combination(
+        np.asarray(data_points["x"], dtype="float64"),
+        np.asarray(data_points["y"], dtype="float64"),
+        np.asarray(data_points["z"], dtype="float64"),
+        np.asarray(source_points["x"], dtype="float64"),
+        np.asarray(source_points["y"], dtype="float64"),
+        np.asarray(source_points["z"], dtype="float64"),
+        f,
+        np.any(f[3:] != 0),
+        out,
+    )
+
+    return out
+
+
+# components of the derivatives combined by 'grad_combination'
+COMPONENTS = ["x", "y", "z", "xx", "xy", "xz", "yy", "yz", "zz"]
+
+
+@njit(cache=True)
+def _jit_grad_combination(xd, yd, zd, xs, ys, zs, f, second_order, out):
+    """
+    Combination of the derivatives of the inverse distance function with
+    factors f arranged according to 'COMPONENTS'. The derivatives of second
+    order are computed only if 'second_order' is True.
+    """
+    trace = f[3] + f[6] + f[8]
+    for i in range(xd.size):
+        for j in range(xs.size):
+            dx = xd[i] - xs[j]
+            dy = yd[i] - ys[j]
+            dz = zd[i] - zs[j]
+            R2 = dx * dx + dy * dy + dz * dz
+            R3 = R2 * np.sqrt(R2)
+            result = -(f[0] * dx + f[1] * dy + f[2] * dz) / R3
+            if second_order:
+                quadratic = (
+                    f[3] * dx * dx
+                    + f[4] * dx * dy
+                    + f[5] * dx * dz
+                    + f[6] * dy * dy
+                    + f[7] * dy * dz
+                    + f[8] * dz * dz
+                )
+                result += 3 * quadratic / (R3 * R2) - trace / R3
+            out[i, j] = result
+
+
+def _check_factors(factors):
+    """
+    Check if the factors of function 'grad_combination' are valid.
+    """
+    if type(factors) != dict:
+        raise ValueError("factors must be a dictionary")
+    if len(factors) == 0:
+        raise ValueError("factors must have at least one component")
+    for component in factors:
+        if component not in COMPONENTS:
+            raise ValueError("component {} invalid".format(component))
+        check.is_scalar(x=factors[component], positive=False)
+
+
+class KernelOperator(LinearOperator):
+    """
+    Linear operator representing the N x M matrix computed by function
+    'grad_combination' without storing it. The products with vectors and
+    matrices are computed by splitting the matrix into tiles, which are
+    computed on the fly, multiplied and discarded (or kept in a cache).
+    Hence, the memory grows with N + M + the size of a tile instead of N x M.
+    The operator is compatible with 'scipy.sparse.linalg' (e.g., the
+    products 'K @ v', 'K.T @ r' and 'K @ V' and the iterative solvers) and
+    with 'eqlayer.method_CGLS'.
+
+    parameters
+    ----------
+    data_points: dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+    source_points: dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+    factors : dictionary
+        Factors multiplying the derivatives of the inverse distance function
+        (see function 'grad_combination').
+    tile_shape : tuple of 2 ints
+        Maximum number of data points and source points of each tile.
+        Default is (1024, 1024).
+    cache_memory : int or float
+        Maximum number of bytes used to store the computed tiles, which are
+        reused by the subsequent products instead of being recomputed. The
+        tiles are stored in the order they are computed until the limit is
+        reached. Default is 0, which does not store any tile.
+    check_input : boolean
+        If True, verify if the input is valid. Default is True.
+    """
+
+    def __init__(
+        self,
+        data_points,
+        source_points,
+        factors,
+        tile_shape=(1024, 1024),
+        cache_memory=0,
+        check_input=True,
+    ):
+        if check_input is True:
+            check.are_coordinates(data_points)
+            check.are_coordinates(source_points)
+            _check_factors(factors)
+            if (type(tile_shape) != tuple) or (len(tile_shape) != 2):
+                raise ValueError("tile_shape must be a tuple of 2 elements")
+            check.is_integer(x=tile_shape[0], positive=True)
+            check.is_integer(x=tile_shape[1], positive=True)
+            check.is_scalar(x=cache_memory, positive=False)
+            if cache_memory < 0:
+                raise ValueError("cache_memory must be non-negative")
+
+        self.data_points = data_points
+        self.source_points = source_points
+        self.factors = factors
+        self.tile_shape = tile_shape
+        self.cache_memory = cache_memory
+        self.cache = dict()
+        shape = (data_points["x"].size, source_points["x"].size)
+        super().__init__(dtype=np.dtype("float64"), shape=shape)
+
+    def _tile(self, rows, columns):
+        """
+        Return the tile of the matrix defined by the slices rows and columns.
+        """
+        key = (rows.start, columns.start)
+        if key in self.cache:
+            return self.cache[key]
+        tile = grad_combination(
+            data_points={key: self.data_points[key][rows] for key in "xyz"},
+            source_points={
+                key: self.source_points[key][columns] for key in "xyz"
+            },
+            factors=self.factors,
+            check_input=False,
+        )
+        if self.cached_bytes() + tile.nbytes <= self.cache_memory:
+            self.cache[key] = tile
+        return tile
+
+    def _tiles(self):
+        """
+        Generate the pairs of slices defining the tiles.
+        """
+        N, M = self.shape
+        for i in range(0, N, self.tile_shape[0]):
+            for j in range(0, M, self.tile_shape[1]):
+                yield (
+                    slice(i, min(i + self.tile_shape[0], N)),
+                    slice(j, min(j + self.tile_shape[1], M)),
+                )
+
+    def cached_bytes(self):
+        """
+        Number of bytes used by the tiles stored in the cache.
+        """
+        return sum(tile.nbytes for tile in self.cache.values())
+
+    def _matvec(self, v):
+        return self._matmat(v.reshape(-1, 1)).ravel()
+
+    def _rmatvec(self, v):
+        return self._rmatmat(v.reshape(-1, 1)).ravel()
+
+    def _matmat(self, V):
+        result = np.zeros((self.shape[0], V.shape[1]))
+        for rows, columns in self._tiles():
+            result[rows] += self._tile(rows, columns) @ V[columns]
+        return result
+
+    def _rmatmat(self, V):
+        result = np.zeros((self.shape[1], V.shape[1]))
+        for rows, columns in self._tiles():
+            result[columns] += self._tile(rows, columns).T @ V[rows]
+        return result
+
+
 def grad_tensor_BTTB(
     data_grid,
     delta_z,
@@ -728,6 +1102,102 @@ def directional_2nd_order(
     return Ktu
 
 
+def directional_2nd_order_combined(
+    data_points,
+    source_points,
+    inc0,
+    dec0,
+    inc,
+    dec,
+    out=None,
+    chunk_size=None,
+    check_input=True,
+):
+    """
+    Compute the sum of the weighted components xx, xy, xz, yy and yz returned
+    by function 'directional_2nd_order', i.e., the total 2nd-order directional
+    derivative of the inverse distance function between the data points and
+    the source points. The components are accumulated directly into a single
+    N x M array by function 'grad_combination', so that neither the SEDM nor
+    the separate components are computed. The rows can be computed in chunks
+    written directly into the output, which can be a preallocated buffer or
+    a numpy.memmap.
+
+    parameters
+    ----------
+    data_points: dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+    source_points: dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+    inc0, dec0, inc, dec : ints or floats
+        Scalars defining the constant inclinations and declinations of the
+        directions along which the derivative will be computed.
+    out : numpy array 2d or None
+        N x M C-contiguous array with dtype float64 receiving the result. If
+        None (default), a new array is created.
+    chunk_size : int or None
+        Maximum number of data points (rows) computed at once. If None
+        (default), all rows are computed at once.
+    check_input : boolean
+        If True, verify if the input is valid. Default is True.
+
+    returns
+    -------
+    Ktu: numpy array 2d
+        N x M matrix containing the 2nd-order directional derivative. It is
+        'out' if a buffer is given.
+    """
+
+    D = data_points["x"].size
+    P = source_points["x"].size
+
+    if check_input is True:
+        # check shape and ndim of points
+        D = check.are_coordinates(data_points)
+        P = check.are_coordinates(source_points)
+        check.is_scalar(x=inc0, positive=False)
+        check.is_scalar(x=dec0, positive=False)
+        check.is_scalar(x=inc, positive=False)
+        check.is_scalar(x=dec, positive=False)
+        # check the output buffer
+        if out is not None:
+            if isinstance(out, np.ndarray) is False:
+                raise ValueError("out must be a numpy array")
+            if out.shape != (D, P):
+                raise ValueError("out must have shape (N, M)")
+            if out.dtype != np.float64:
+                raise ValueError("out must have dtype float64")
+            if out.flags.c_contiguous is False:
+                raise ValueError("out must be C-contiguous")
+        if chunk_size is not None:
+            check.is_integer(x=chunk_size, positive=True)
+
+    if out is None:
+        out = np.empty((D, P), dtype="float64")
+    if chunk_size is None:
+        chunk_size = max(D, 1)
+
+    # compute the unit vectors and the directional factors
+    t = utils.unit_vector(inc=inc, dec=dec, check_input=False)
+    u = utils.unit_vector(inc=inc0, dec=dec0, check_input=False)
+    factors = utils.directional_factors(t, u, check_input=False)
+
+    # rows of a C-contiguous array are contiguous blocks of memory
+    for i in range(0, D, chunk_size):
+        rows = slice(i, min(i + chunk_size, D))
+        grad_combination(
+            data_points={key: data_points[key][rows] for key in "xyz"},
+            source_points=source_points,
+            factors=factors,
+            out=out[rows],
+            check_input=False,
+        )
+
+    return out
+
+
 def directional_2nd_order_BTTB(
     data_grid,
     delta_z,
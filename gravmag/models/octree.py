@@ -0,0 +1,345 @@
+"""
+Octree used by the hierarchical (Barnes-Hut) forward engines. The sources
+are represented by points (e.g., the centres of prisms) enclosed by spheres
+with given radii. Each node of the tree groups the sources lying in an octant
+of its parent and stores the centre and radius of a sphere containing all of
+them. The gravitational effect of a node far from a computation point is
+approximated by a Taylor expansion of the inverse distance about the node
+centre, which depends on the multipole moments of the node (mass, dipole
+and quadrupole moments). The expansion is valid for masses of both signs.
+"""
+
+import numpy as np
+from numba import njit
+from .. import check
+
+
+def build(points, radii, leaf_size=32):
+    """
+    Build an octree by recursively splitting the bounding box of the points
+    into octants until each node has at most 'leaf_size' points.
+
+    Parameters
+    ----------
+    points : numpy array 2d
+        P x 3 array containing the x, y and z coordinates of the sources.
+    radii : numpy array 1d
+        Radius of the sphere centred at each point and containing the
+        corresponding source. It is zero for point sources.
+    leaf_size : int
+        Maximum number of points in the leaves of the tree. Default is 32.
+
+    Returns
+    -------
+    tree : dictionary
+        Dictionary containing the following keys:
+        - 'order' : permutation of the points. Each node contains the points
+          order[start:end], where start and end are the node limits.
+        - 'start', 'end' : numpy arrays 1d with the limits of the nodes.
+        - 'children' : N x 8 array containing the indices of the children of
+          each node. Missing children are set to -1, so that the leaves have
+          children[node, 0] = -1. The root is the node 0 and the children of
+          a node always have larger indices than their parent.
+        - 'center' : N x 3 array containing the centre of each node.
+        - 'radius' : radius of the sphere centred at 'center' and containing
+          all sources of each node.
+        - 'depth' : maximum depth of the tree (the root has depth 0).
+    """
+    check.is_array(points, ndim=2)
+    if points.shape[1] != 3:
+        raise ValueError("points must have 3 columns")
+    P = points.shape[0]
+    if P == 0:
+        raise ValueError("points must have at least one row")
+    check.is_array(radii, ndim=1, shape=(P,))
+    check.is_integer(x=leaf_size, positive=True)
+
+    order = np.arange(P)
+    start = []
+    end = []
+    children = []
+    center = []
+    radius = []
+    depth = 0
+
+    # nodes waiting to be created: (start, end, parent, depth)
+    stack = [(0, P, -1, 0)]
+    while stack:
+        s, e, parent, level = stack.pop()
+        node = len(start)
+        indices = order[s:e]
+        node_points = points[indices]
+        lower = node_points.min(axis=0)
+        upper = node_points.max(axis=0)
+        node_center = 0.5 * (lower + upper)
+        node_radius = np.max(
+            np.sqrt(np.sum((node_points - node_center) ** 2, axis=1))
+            + radii[indices]
+        )
+        start.append(s)
+        end.append(e)
+        children.append([-1] * 8)
+        center.append(node_center)
+        radius.append(node_radius)
+        depth = max(depth, level)
+        if parent >= 0:
+            children[parent][children[parent].index(-1)] = node
+        # coincident points cannot be split
+        if (e - s > leaf_size) and np.any(upper > lower):
+            octants = (
+                (node_points[:, 0] > node_center[0]).astype(int)
+                + 2 * (node_points[:, 1] > node_center[1])
+                + 4 * (node_points[:, 2] > node_center[2])
+            )
+            order[s:e] = indices[np.argsort(octants, kind="stable")]
+            limits = s + np.concatenate(
+                [[0], np.cumsum(np.bincount(octants, minlength=8))]
+            )
+            for octant in range(7, -1, -1):
+                if limits[octant + 1] > limits[octant]:
+                    stack.append(
+                        (limits[octant], limits[octant + 1], node, level + 1)
+                    )
+
+    tree = {
+        "order": order,
+        "start": np.array(start, dtype="int64"),
+        "end": np.array(end, dtype="int64"),
+        "children": np.array(children, dtype="int64"),
+        "center": np.array(center, dtype="float64"),
+        "radius": np.array(radius, dtype="float64"),
+        "depth": depth,
+    }
+
+    return tree
+
+
+def moments(tree, points, source_moments):
+    """
+    Compute the mass, the dipole moments and the quadrupole moments of each
+    node with respect to its centre.
+
+    Parameters
+    ----------
+    tree : dictionary
+        Octree computed with function 'build'.
+    points : numpy array 2d
+        P x 3 array used to build the tree.
+    source_moments : numpy array 2d
+        P x 10 array containing the moments of each source with respect to
+        its own point, arranged as the rows of the output (see below).
+        A point mass m has moments (m, 0, ..., 0), a point dipole with moment
+        (mx, my, mz) is represented by the dipole moments (-mx, -my, -mz) and
+        a homogeneous prism with mass m has the quadrupole moments
+        Qxx = m (x2 - x1)² / 12, Qyy = m (y2 - y1)² / 12 and
+        Qzz = m (z2 - z1)² / 12 (see function 'kernel_multipole').
+
+    Returns
+    -------
+    moments : numpy array 2d
+        N x 10 array whose columns contain the mass M, the dipole moments
+        Dx, Dy and Dz and the quadrupole moments Qxx, Qxy, Qxz, Qyy, Qyz and
+        Qzz of each node, where M = sum(m), Di = sum(m di) and
+        Qij = sum(m di dj), m is the mass density and di are the coordinates
+        relative to the node centre.
+    """
+    P = tree["order"].size
+    check.is_array(points, ndim=2, shape=(P, 3))
+    check.is_array(source_moments, ndim=2, shape=(P, 10))
+    order = tree["order"]
+    result = np.zeros((tree["start"].size, 10), dtype="float64")
+    _jit_moments(
+        np.ascontiguousarray(points[order], dtype="float64"),
+        np.ascontiguousarray(source_moments[order], dtype="float64"),
+        tree["start"],
+        tree["end"],
+        tree["children"],
+        tree["center"],
+        result,
+    )
+    return result
+
+
+# pairs of axes defining the quadrupole moments xx, xy, xz, yy, yz and zz
+QUADRUPOLE_AXES = ((0, 0), (0, 1), (0, 2), (1, 1), (1, 2), (2, 2))
+
+
+@njit(cache=True)
+def _jit_moments(points, source_moments, start, end, children, center, out):
+    """
+    Accumulate the moments of the nodes from the leaves to the root.
+    The moments of the sources and children are translated to the
+    centre of each node.
+    """
+    # children have larger indices than their parents
+    for node in range(start.size - 1, -1, -1):
+        if children[node, 0] == -1:
+            for p in range(start[node], end[node]):
+                _add_moments(
+                    out[node],
+                    source_moments[p],
+                    points[p, 0] - center[node, 0],
+                    points[p, 1] - center[node, 1],
+                    points[p, 2] - center[node, 2],
+                )
+        else:
+            for k in range(8):
+                child = children[node, k]
+                if child == -1:
+                    break
+                _add_moments(
+                    out[node],
+                    out[child],
+                    center[child, 0] - center[node, 0],
+                    center[child, 1] - center[node, 1],
+                    center[child, 2] - center[node, 2],
+                )
+    return
+
+
+@njit(cache=True)
+def _add_moments(out, moments, tx, ty, tz):
+    """
+    Add the moments defined with respect to a point located at (tx, ty, tz)
+    relative to the node centre. The translated moments are M' = M,
+    D' = D + M t and Q' = Q + D t + t D + M t t.
+    """
+    M = moments[0]
+    Dx = moments[1]
+    Dy = moments[2]
+    Dz = moments[3]
+    out[0] += M
+    out[1] += Dx + M * tx
+    out[2] += Dy + M * ty
+    out[3] += Dz + M * tz
+    out[4] += moments[4] + 2.0 * Dx * tx + M * tx * tx
+    out[5] += moments[5] + Dx * ty + Dy * tx + M * tx * ty
+    out[6] += moments[6] + Dx * tz + Dz * tx + M * tx * tz
+    out[7] += moments[7] + 2.0 * Dy * ty + M * ty * ty
+    out[8] += moments[8] + Dy * tz + Dz * ty + M * ty * tz
+    out[9] += moments[9] + 2.0 * Dz * tz + M * tz * tz
+
+
+@njit(cache=True)
+def kernel_multipole(code, X, Y, Z, moments):
+    """
+    Function for computing the field defined by the integer 'code'
+    (see 'FIELDS' in module 'rectangular_prism_numba') produced by the
+    multipole moments (see function 'moments') of a node, where X, Y and Z
+    are the coordinates of the node centre minus those of the computation
+    point. The field of a point mass is given by the derivatives of the
+    inverse distance with respect to the coordinates of the computation
+    point, so that it is expanded up to second order about the node centre.
+    The result is exact for a single point mass or point dipole located at
+    the centre. Null moments are skipped.
+    """
+    # order and axes of the derivatives defining the field
+    if code == 0:  # potential
+        n, a, b = 0, 0, 0
+    elif code <= 3:  # x, y, z
+        n, a, b = 1, code - 1, 0
+    elif code <= 6:  # xx, xy, xz
+        n, a, b = 2, 0, code - 4
+    elif code <= 8:  # yy, yz
+        n, a, b = 2, 1, code - 6
+    else:  # zz
+        n, a, b = 2, 2, 2
+    axes = (a, b, 0, 0)
+    result = 0.0
+    # monopole
+    if moments[0] != 0.0:
+        result += moments[0] * _inverse_r_derivative(n, axes, X, Y, Z)
+    # dipole
+    for i in range(3):
+        if moments[1 + i] == 0.0:
+            continue
+        result += moments[1 + i] * _inverse_r_derivative(
+            n + 1, _set_axis(axes, n, i), X, Y, Z
+        )
+    # quadrupole
+    for q in range(6):
+        if moments[4 + q] == 0.0:
+            continue
+        i, j = QUADRUPOLE_AXES[q]
+        weight = 0.5 if i == j else 1.0
+        result += (
+            weight
+            * moments[4 + q]
+            * _inverse_r_derivative(
+                n + 2, _set_axis(_set_axis(axes, n, i), n + 1, j), X, Y, Z
+            )
+        )
+    # derivatives with respect to the computation point
+    if n == 1:
+        result = -result
+    return result
+
+
+@njit(cache=True)
+def _set_axis(axes, position, i):
+    """
+    Return a copy of the tuple of four axes with the element at
+    'position' replaced by the axis i.
+    """
+    if position == 0:
+        return (i, axes[1], axes[2], axes[3])
+    elif position == 1:
+        return (axes[0], i, axes[2], axes[3])
+    elif position == 2:
+        return (axes[0], axes[1], i, axes[3])
+    return (axes[0], axes[1], axes[2], i)
+
+
+@njit(cache=True)
+def _delta(i, j):
+    """
+    Kronecker delta
+    """
+    return 1.0 if i == j else 0.0
+
+
+@njit(cache=True)
+def _inverse_r_derivative(n, axes, X, Y, Z):
+    """
+    Derivative of order n (0 <= n <= 4) of the inverse distance 1 / R with
+    respect to X, Y and Z along the axes in the tuple 'axes'. Only the first
+    n axes are used.
+    """
+    i, j, k, m = axes
+    v = (X, Y, Z)
+    R2 = X**2 + Y**2 + Z**2
+    R = np.sqrt(R2)
+    if n == 0:
+        return 1.0 / R
+    R3 = R2 * R
+    if n == 1:
+        return -v[i] / R3
+    R5 = R3 * R2
+    if n == 2:
+        return 3.0 * v[i] * v[j] / R5 - _delta(i, j) / R3
+    R7 = R5 * R2
+    if n == 3:
+        return -15.0 * v[i] * v[j] * v[k] / R7 + 3.0 * (
+            _delta(i, j) * v[k] + _delta(i, k) * v[j] + _delta(j, k) * v[i]
+        ) / R5
+    R9 = R7 * R2
+    return (
+        105.0 * v[i] * v[j] * v[k] * v[m] / R9
+        - 15.0
+        * (
+            _delta(i, j) * v[k] * v[m]
+            + _delta(i, k) * v[j] * v[m]
+            + _delta(i, m) * v[j] * v[k]
+            + _delta(j, k) * v[i] * v[m]
+            + _delta(j, m) * v[i] * v[k]
+            + _delta(k, m) * v[i] * v[j]
+        )
+        / R7
+        + 3.0
+        * (
+            _delta(i, j) * _delta(k, m)
+            + _delta(i, k) * _delta(j, m)
+            + _delta(i, m) * _delta(j, k)
+        )
+        / R5
+    )
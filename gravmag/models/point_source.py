@@ -4,13 +4,26 @@ magnetic induction fields produced by point sources.
 """
 
 import numpy as np
+from numba import njit, prange
 from .. import check
 from .. import utils
 from .. import constants as cts
 from .. import inverse_distance as id
+from . import octree
+from . import rectangular_prism as rp
+from . import rectangular_prism_numba as rp_nb
 
 
-def grav(coordinates, sources, mass, field, scale=True):
+def grav(
+    coordinates,
+    sources,
+    mass,
+    field,
+    scale=True,
+    chunk_size=None,
+    parallel=False,
+    nthreads=None,
+):
     """
     Gravitational potential, first and second derivatives
     produced by point sources in Cartesian coordinates.
@@ -19,13 +32,14 @@ def grav(coordinates, sources, mass, field, scale=True):
 
     Parameters
     ----------
-    coordinates : 2d-array
-        2d-array containing x (first line), y (second line), and z (third line) of
-        the computation points. All coordinates should be in meters.
-    sources : 2d-array
-        2d-array containing the coordinates of the dipoles. Each line must contain
-        the coordinates x, y and z of a single point source.
+    coordinates : dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
         All coordinates should be in meters.
+    sources : dictionary
+        Dictionary containing the x, y and z coordinates of the point sources at the
+        keys 'x', 'y' and 'z', respectively. Each key is a numpy array 1d having the
+        same number of elements. All coordinates should be in meters.
     mass : 1d-array
         1d-array containing the mass of each point source in kg.
     field : str
@@ -47,61 +61,72 @@ def grav(coordinates, sources, mass, field, scale=True):
         "constants.GRAVITATIONAL_CONST" (Gravitational constant),
         "constants.SI2MGAL" (constant tranforming from m/s² to mGal) or
         "constants.SI2EOTVOS" (constant tranforming from 1/s² to Eötvos)
+    chunk_size : None or int
+        Maximum number of sources used to compute the kernel matrix at once.
+        The sources are processed in chunks and the products of the N x
+        chunk_size kernel matrices and the corresponding masses are
+        accumulated, so that the full N x M matrix is never formed.
+        If None, all sources are used at once. Default is None.
+    parallel : boolean
+        If True, the field is computed by a jitted loop over the pairs of
+        computation points and sources, without forming any matrix and
+        distributing the computation points among multiple threads. In this
+        case, 'chunk_size' is not used. Default is False.
+    nthreads : None or int
+        Number of threads used if 'parallel' is True. If None, it uses the
+        number of threads defined by numba (see 'numba.get_num_threads').
+        Default is None.
 
     Returns
     -------
     result : array
-        Gravitational field generated by the spheres at the computation points.
-
-    """
-
-    if check_input is True:
-        check.coordinates(coordinates)
-        check.coordinates(sources)
-        check.scalar_prop(mass)
-        # check if field is valid
-        if field not in [
-            "potential",
-            "x",
-            "y",
-            "z",
-            "xx",
-            "xy",
-            "xz",
-            "yy",
-            "yz",
-            "zz",
-        ]:
-            raise ValueError("invalid field {}".format(field))
+        Gravitational field generated by the point sources at the computation points.
 
-    # compute Squared Euclidean Distance Matrix (SEDM)
-    R2 = id.sedm(coordinates, sources, check_input=False)
+    """
 
-    # compute the kernel matrix according to "field"
-    if field is "potential":
-        G = 1.0 / np.sqrt(R2)
-    elif field in ["x", "y", "z"]:
-        G = id.grad(coordinates, sources, R2, [field], False)[0]
-    else:  # field is in ["xx", "xy", "xz", "yy", "yz", "zz"]
-        G = id.grad_tensor(coordinates, sources, R2, [field], False)[0]
+    # Verify the input parameters
+    D = check.are_coordinates(coordinates)  # D = total number of data points
+    P = check.are_coordinates(sources)  # P = total number of sources
+    check.is_array(mass, ndim=1, shape=(P,))
+    if field not in rp_nb.FIELDS:
+        raise ValueError("invalid field {}".format(field))
+    rp_nb._check_threads(parallel, nthreads)
 
-    # compute the potential field
-    result = G @ mass
+    if parallel is True:
+        # moments of each source about its own position
+        source_moments = np.zeros((P, 10))
+        source_moments[:, 0] = mass
+        result = _direct(
+            coordinates,
+            sources,
+            source_moments,
+            rp_nb.FIELDS.index(field),
+            nthreads,
+        )
+    else:
+        result = np.zeros(D, dtype="float64")
+        for chunk in _chunks(P, chunk_size):
+            chunk_sources = {key: sources[key][chunk] for key in "xyz"}
+            G = _grav_kernel(coordinates, chunk_sources, field)
+            result += G @ mass[chunk]
 
     # multiply the computed field by the corresponding scale factors
     if scale is True:
-        result *= cts.GRAVITATIONAL_CONST
-        # Convert from m/s^2 to mGal
-        if field in ["x", "y", "z"]:
-            result *= cts.SI2MGAL
-        # Convert from 1/s^2 to Eötvös
-        if field in ["xx", "xy", "xz", "yy", "yz", "zz"]:
-            result *= cts.SI2EOTVOS
+        result *= rp._grav_scale_factor(field)
 
     return result
 
 
-def mag(coordinates, sources, moment, field, scale=True):
+def mag(
+    coordinates,
+    sources,
+    moment,
+    field,
+    scale=True,
+    chunk_size=None,
+    parallel=False,
+    nthreads=None,
+):
     """
     Magnetic scalar potential and magnetic induction components
     produced by point sources in Cartesian coordinates.
@@ -110,18 +135,18 @@ def mag(coordinates, sources, moment, field, scale=True):
 
     Parameters
     ----------
-    coordinates : 2d-array
-        2d-array containing x (first line), y (second line), and z (third line) of
-        the computation points. All coordinates should be in meters.
-    sources : 2d-array
-        2d-array containing the coordinates of the point sources. Each line must contain
-        the coordinates of a single point source in the following order:
-        south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2).
+    coordinates : dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
         All coordinates should be in meters.
+    sources : dictionary
+        Dictionary containing the x, y and z coordinates of the point sources at the
+        keys 'x', 'y' and 'z', respectively. Each key is a numpy array 1d having the
+        same number of elements. All coordinates should be in meters.
     moment : 2d-array
-        2d-array containing the total-magnetization components of the prisms.
+        2d-array containing the total-magnetization components of the point sources.
         Each line must contain the intensity (in A m²), inclination and
-        declination (in degrees) of the total magnetic moment of a single prism.
+        declination (in degrees) of the total magnetic moment of a single source.
     field : str
         Magnetic field to be computed.
         The available fields are:
@@ -135,6 +160,8 @@ def mag(coordinates, sources, moment, field, scale=True):
        "constants.CM" (Magnetic constant),
        "constants.T2MT" (constant tranforming from Tesla to microtesla) or
        "constants.T2NT" (constant tranforming from Tesla to nanotesla)
+    chunk_size, parallel, nthreads :
+        See function 'grav'.
 
     Returns
     -------
@@ -144,70 +171,493 @@ def mag(coordinates, sources, moment, field, scale=True):
     """
 
     # Verify the input parameters
-    check.coordinates(coordinates)
-    check.magnetization(moment, sources)
+    D = check.are_coordinates(coordinates)  # D = total number of data points
+    P = check.are_coordinates(sources)  # P = total number of sources
+    check.is_array(moment, ndim=2, shape=(P, 3))
 
     # check if field is valid
-    if field not in ["potential", "x", "y", "z"]:
+    if field not in rp_nb.MAG_FIELDS:
         raise ValueError("invalid field {}".format(field))
+    rp_nb._check_threads(parallel, nthreads)
 
     # Compute the Cartesian components of total-moment
     mx, my, mz = utils.magnetization_components(moment)
 
-    # compute Squared Euclidean Distance Matrix (SEDM)
-    # sources must be transposed because its shape is transposed
-    # with respect to coordinates
-    R2 = id.sedm(coordinates, sources.T, check_input=False)
+    if parallel is True:
+        # moments of each source about its own position (see 'mag_tree')
+        source_moments = np.zeros((P, 10))
+        source_moments[:, 1:4] = -np.stack([mx, my, mz], axis=1)
+        result = _direct(
+            coordinates,
+            sources,
+            source_moments,
+            rp_nb.FIELDS.index(field),
+            nthreads,
+        )
+    else:
+        result = np.zeros(D, dtype="float64")
+        for chunk in _chunks(P, chunk_size):
+            chunk_sources = {key: sources[key][chunk] for key in "xyz"}
+            Gx, Gy, Gz = _mag_kernels(coordinates, chunk_sources, field)
+            result += Gx @ mx[chunk] + Gy @ my[chunk] + Gz @ mz[chunk]
+
+    # multiply the computed field by the corresponding scale factors
+    if scale is True:
+        result *= cts.CM
+        # Convert from T to nT
+        if field in ["x", "y", "z"]:
+            result *= cts.T2nanoT
+        # Convert from T to uT and change sign
+        if field == "potential":
+            result *= -cts.T2microT
+
+    return result
+
+
+def grav_tree(
+    coordinates,
+    sources,
+    mass,
+    field,
+    theta=0.5,
+    leaf_size=32,
+    scale=True,
+    parallel=False,
+    nthreads=None,
+):
+    """
+    Gravitational potential, first and second derivatives produced by point
+    sources in Cartesian coordinates computed with a treecode (Barnes-Hut)
+    algorithm, without forming the kernel matrix.
+    All values are referred to a topocentric Cartesian system with axes
+    x, y and z pointing to north, east and down, respectively.
+
+    The sources are grouped into the nodes of an octree (see module 'octree').
+    A node whose sources lie within a distance 'a' from its centre, which lies
+    at a distance 'r' from the computation point, is accepted if a < theta r.
+    In this case, the effect of its sources is computed with the multipole
+    expansion (up to the quadrupole moments) about the node centre. Otherwise,
+    its children are visited. The sources of the leaves that are not accepted
+    are computed exactly. The cost grows with N x log(M) instead of N x M for
+    a fixed 'theta' and the memory with N + M.
+
+    Parameters
+    ----------
+    coordinates, sources, mass, field :
+        See function 'grav'.
+    theta : scalar
+        Accuracy parameter in the interval [0, 1). The relative error of the
+        multipole expansion of a node is of the order of theta³. If theta is
+        zero, all sources are computed exactly. Default is 0.5.
+    leaf_size : int
+        Maximum number of sources in the leaves of the octree. Default is 32.
+    scale : boolean
+        See function 'grav'.
+    parallel : boolean
+        If True, the computation points are distributed among multiple threads.
+        Default is False.
+    nthreads : None or int
+        Number of threads used if 'parallel' is True. If None, it uses the
+        number of threads defined by numba (see 'numba.get_num_threads').
+        Default is None.
+
+    Returns
+    -------
+    result : array
+        Gravitational field generated by the point sources at the computation points.
+
+    """
+
+    # Verify the input parameters
+    check.are_coordinates(coordinates)
+    P = check.are_coordinates(sources)  # P = total number of sources
+    check.is_array(mass, ndim=1, shape=(P,))
+    if field not in rp_nb.FIELDS:
+        raise ValueError("invalid field {}".format(field))
+
+    # moments of each source about its own position
+    source_moments = np.zeros((P, 10))
+    source_moments[:, 0] = mass
+
+    result = _tree(
+        coordinates,
+        sources,
+        source_moments,
+        rp_nb.FIELDS.index(field),
+        theta,
+        leaf_size,
+        parallel,
+        nthreads,
+    )
+
+    # multiply the computed field by the corresponding scale factors
+    if scale is True:
+        result *= rp._grav_scale_factor(field)
+
+    return result
+
+
+def mag_tree(
+    coordinates,
+    sources,
+    moment,
+    field,
+    theta=0.5,
+    leaf_size=32,
+    scale=True,
+    parallel=False,
+    nthreads=None,
+):
+    """
+    Magnetic scalar potential and magnetic induction components produced by
+    point sources (dipoles) in Cartesian coordinates computed with a treecode
+    (Barnes-Hut) algorithm, without forming the kernel matrix. See functions
+    'mag' and 'grav_tree'.
+
+    The field of a dipole with moment (mx, my, mz) is the gravitational field
+    of a mass distribution having null mass and dipole moments
+    (-mx, -my, -mz). Hence, the expansion of the nodes contains their dipole
+    and quadrupole moments only and its relative error is of the order of
+    theta².
 
+    Parameters
+    ----------
+    coordinates, sources, moment, field :
+        See function 'mag'.
+    theta, leaf_size, parallel, nthreads :
+        See function 'grav_tree'.
+    scale : boolean
+        See function 'mag'.
+
+    Returns
+    -------
+    result : array
+        Magnetic field generated by the point sources at the computation points.
+
+    """
+
+    # Verify the input parameters
+    check.are_coordinates(coordinates)
+    P = check.are_coordinates(sources)  # P = total number of sources
+    check.is_array(moment, ndim=2, shape=(P, 3))
+    if field not in rp_nb.MAG_FIELDS:
+        raise ValueError("invalid field {}".format(field))
+
+    # moments of each source about its own position
+    source_moments = np.zeros((P, 10))
+    source_moments[:, 1:4] = -np.stack(
+        utils.magnetization_components(moment), axis=1
+    )
+
+    result = _tree(
+        coordinates,
+        sources,
+        source_moments,
+        rp_nb.FIELDS.index(field),
+        theta,
+        leaf_size,
+        parallel,
+        nthreads,
+    )
+
+    # multiply the computed field by the corresponding scale factors
+    if scale is True:
+        result *= cts.CM
+        # Convert from T to nT
+        if field in ["x", "y", "z"]:
+            result *= cts.T2nanoT
+        # Convert from T to uT and change sign
+        if field == "potential":
+            result *= -cts.T2microT
+
+    return result
+
+
+def _grav_kernel(coordinates, sources, field):
+    """
+    Kernel matrix of the gravitational field 'field' between the
+    computation points and the sources.
+    """
     # compute the kernel matrix according to "field"
-    if field is "potential":
-        Gx, Gy, Gz = id.grad(
-            data_points=coordinates,
-            source_points=sources.T,
-            SEDM=R2,
-            components=["x", "y", "z"],
-            check_input=False,
-        )
-        G = -(mx * Gx + my * Gy + mz * Gz)
-    elif field is "x":
-        Gxx, Gxy, Gxz = id.grad_tensor(
-            data_points=coordinates,
-            source_points=sources.T,
-            SEDM=R2,
-            components=["xx", "xy", "xz"],
-            check_input=False,
+    if field == "potential":
+        # compute Squared Euclidean Distance Matrix (SEDM)
+        R2 = id.sedm(coordinates, sources, check_input=False)
+        G = 1.0 / np.sqrt(R2)
+    else:  # derivatives computed without the SEDM
+        G = id.grad_combination(
+            coordinates, sources, {field: 1.0}, check_input=False
         )
-        G = mx * Gxx + my * Gxy + mz * Gxz
-    elif field is "y":
-        Gxy, Gyy, Gyz = id.grad_tensor(
+
+    return G
+
+
+def _mag_kernels(coordinates, sources, field):
+    """
+    Kernel matrices combined with the x, y and z components of the magnetic
+    moments to compute the magnetic field 'field'.
+    """
+    # compute Squared Euclidean Distance Matrix (SEDM)
+    R2 = id.sedm(coordinates, sources, check_input=False)
+
+    # compute the kernel matrices according to "field"
+    components = rp_nb.MAG_FIELDS[field]
+    if field == "potential":
+        G = id.grad(
             data_points=coordinates,
-            source_points=sources.T,
+            source_points=sources,
             SEDM=R2,
-            components=["xy", "yy", "yz"],
+            components=components,
             check_input=False,
         )
-        G = mx * Gxy + my * Gyy + mz * Gyz
-    else:  # field is "z"
-        Gxz, Gyz, Gzz = id.grad_tensor(
+    else:  # field is in ["x", "y", "z"]
+        G = id.grad_tensor(
             data_points=coordinates,
-            source_points=sources.T,
+            source_points=sources,
             SEDM=R2,
-            components=["xz", "yz", "zz"],
+            components=components,
             check_input=False,
         )
-        G = mx * Gxz + my * Gyz + mz * Gzz
 
-    # compute the potential field
-    result = np.sum(G, axis=1)
+    return [G[component] for component in components]
+
+
+def _chunks(P, chunk_size):
+    """
+    Slices splitting P sources into chunks with at most chunk_size sources.
+    """
+    if chunk_size is None:
+        return [slice(0, P)]
+    check.is_integer(x=chunk_size, positive=True)
+    return [slice(i, min(i + chunk_size, P)) for i in range(0, P, chunk_size)]
 
-    # multiply the computed field by the corresponding scale factors
-    if scale is True:
-        result *= cts.CM
-        # Convert from T to nT
-        if field in ["x", "y", "z"]:
-            result *= cts.T2NT
-        # Convert from T to uT and change sign
-        if field == "potential":
-            result *= -cts.T2MT
 
+def _direct(coordinates, sources, source_moments, code, nthreads):
+    """
+    Compute the field defined by the integer 'code' (see
+    'rectangular_prism_numba.FIELDS') produced by the source moments
+    with a parallel loop over all pairs of computation points and sources.
+    """
+    coordinates = rp_nb._pack_coordinates(coordinates)
+    result = np.zeros(coordinates.shape[1], dtype="float64")
+    rp_nb._run(
+        jit_direct_parallel,
+        nthreads,
+        coordinates,
+        np.ascontiguousarray(
+            np.stack([sources["x"], sources["y"], sources["z"]], axis=1),
+            dtype="float64",
+        ),
+        np.ascontiguousarray(source_moments, dtype="float64"),
+        code,
+        result,
+    )
     return result
+
+
+def _tree(
+    coordinates,
+    sources,
+    source_moments,
+    code,
+    theta,
+    leaf_size,
+    parallel,
+    nthreads,
+):
+    """
+    Build the octree of the sources and compute the field defined by the
+    integer 'code' (see 'rectangular_prism_numba.FIELDS') produced by the
+    source moments.
+    """
+    check.is_scalar(x=theta, positive=False)
+    if (theta < 0) or (theta >= 1):
+        raise ValueError("theta must be in the interval [0, 1)")
+    rp_nb._check_threads(parallel, nthreads)
+
+    points = np.stack([sources["x"], sources["y"], sources["z"]], axis=1)
+    tree = octree.build(points, np.zeros(points.shape[0]), leaf_size)
+    moments = octree.moments(tree, points, source_moments)
+
+    coordinates = rp_nb._pack_coordinates(coordinates)
+    result = np.zeros(coordinates.shape[1], dtype="float64")
+    rp_nb._run(
+        jit_tree_parallel if parallel is True else jit_tree,
+        nthreads,
+        coordinates,
+        np.ascontiguousarray(points[tree["order"]], dtype="float64"),
+        np.ascontiguousarray(source_moments[tree["order"]]),
+        code,
+        tree["children"],
+        tree["start"],
+        tree["end"],
+        tree["center"],
+        tree["radius"],
+        moments,
+        float(theta),
+        7 * tree["depth"] + 1,
+        result,
+    )
+    return result
+
+
+@njit(parallel=True, cache=True)
+def jit_direct_parallel(coordinates, points, source_moments, code, out):
+    """
+    Compute the field at the points in 'coordinates' produced by all
+    sources by distributing the computation points among multiple threads
+    """
+    # Iterate over computation points
+    for l in prange(coordinates[0].size):
+        # Iterate over sources
+        for p in range(points.shape[0]):
+            out[l] += octree.kernel_multipole(
+                code,
+                points[p, 0] - coordinates[0, l],
+                points[p, 1] - coordinates[1, l],
+                points[p, 2] - coordinates[2, l],
+                source_moments[p],
+            )
+
+
+@njit(cache=True)
+def jit_tree(
+    coordinates,
+    points,
+    source_moments,
+    code,
+    children,
+    start,
+    end,
+    center,
+    radius,
+    moments,
+    theta,
+    stack_size,
+    out,
+):
+    """
+    Compute the field at the points in 'coordinates'
+    by traversing the octree of the sources
+    """
+    # Iterate over computation points
+    for l in range(coordinates[0].size):
+        _tree_point(
+            l,
+            coordinates,
+            points,
+            source_moments,
+            code,
+            children,
+            start,
+            end,
+            center,
+            radius,
+            moments,
+            theta,
+            stack_size,
+            out,
+        )
+
+
+@njit(parallel=True, cache=True)
+def jit_tree_parallel(
+    coordinates,
+    points,
+    source_moments,
+    code,
+    children,
+    start,
+    end,
+    center,
+    radius,
+    moments,
+    theta,
+    stack_size,
+    out,
+):
+    """
+    Compute the field at the points in 'coordinates'
+    by traversing the octree of the sources and distributing the
+    computation points among multiple threads
+    """
+    # Iterate over computation points
+    for l in prange(coordinates[0].size):
+        _tree_point(
+            l,
+            coordinates,
+            points,
+            source_moments,
+            code,
+            children,
+            start,
+            end,
+            center,
+            radius,
+            moments,
+            theta,
+            stack_size,
+            out,
+        )
+
+
+@njit(cache=True)
+def _tree_point(
+    l,
+    coordinates,
+    points,
+    source_moments,
+    code,
+    children,
+    start,
+    end,
+    center,
+    radius,
+    moments,
+    theta,
+    stack_size,
+    out,
+):
+    """
+    Compute the field at the l-th computation point
+    by traversing the octree of the sources
+    """
+    x = coordinates[0, l]
+    y = coordinates[1, l]
+    z = coordinates[2, l]
+    # nodes to be visited, starting at the root
+    stack = np.empty(stack_size, dtype=np.int64)
+    stack[0] = 0
+    top = 1
+    while top > 0:
+        top -= 1
+        node = stack[top]
+        distance2 = (
+            (center[node, 0] - x) ** 2
+            + (center[node, 1] - y) ** 2
+            + (center[node, 2] - z) ** 2
+        )
+        if radius[node] ** 2 < theta**2 * distance2:
+            # far node: multipole expansion about its centre
+            out[l] += octree.kernel_multipole(
+                code,
+                center[node, 0] - x,
+                center[node, 1] - y,
+                center[node, 2] - z,
+                moments[node],
+            )
+        elif children[node, 0] == -1:
+            # near leaf: exact field of each source
+            for p in range(start[node], end[node]):
+                out[l] += octree.kernel_multipole(
+                    code,
+                    points[p, 0] - x,
+                    points[p, 1] - y,
+                    points[p, 2] - z,
+                    source_moments[p],
+                )
+        else:
+            for k in range(8):
+                if children[node, k] == -1:
+                    break
+                stack[top] = children[node, k]
+                top += 1
@@ -5,12 +5,21 @@ Nagy et al (2000, 2002). This prototype makes use of the modified arctangent and
 functions proposed by Fukushima (2020) for dealing with singularities at some computation points.
 """
 
+import math
 import numpy as np
-from .. import check, utils, data_structures
+from .. import check, utils, data_structures, convolve
 from .. import constants as cts
 from .. import inverse_distance as idist
 
-def grav(coordinates, prisms, density, field, scale=True):
+def grav(
+    coordinates,
+    prisms,
+    density,
+    field,
+    scale=True,
+    tile_shape=None,
+    max_memory=None,
+):
     """
     Gravitational potential, first and second derivatives
     produced by right-rectangular prisms in Cartesian coordinates.
@@ -28,8 +37,10 @@ def grav(coordinates, prisms, density, field, scale=True):
         The corners south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2) of each
         prism are arranged in the keys 'x1', 'x2', 'y1', 'y2', 'z1' and 'z2', respectively.
         Each key is a numpy array 1d having the same number of elements.
-    density : 1d-array
-        1d-array containing the density of each prism in kg / m³.
+    density : 1d or 2d-array
+        Array containing the density of each prism in kg / m³. If it is a
+        P x K 2d-array, each column defines a density model and the fields
+        of all K models are computed with the same kernels.
     field : str
         Gravitational field to be computed.
         The available fields are:
@@ -48,133 +59,547 @@ def grav(coordinates, prisms, density, field, scale=True):
         "constants.GRAVITATIONAL_CONST" (Gravitational constant),
         "constants.SI2MGAL" (constant tranforming from m / s² to mGal) or
         "constants.SI2EOTVOS" (constant tranforming from 1 / s² to Eötvos)
+    tile_shape : None or tuple of ints
+        If not None, it defines the maximum number of computation points and prisms,
+        respectively, forming each tile processed at once. Default is None.
+    max_memory : None, int or float
+        If not None, it defines the maximum memory (in bytes) used by the temporary
+        arrays of each tile. The tile shape is then computed with function
+        'tile_shape_from_memory'. It cannot be used together with 'tile_shape'.
+        If both 'tile_shape' and 'max_memory' are None, all computation points and
+        prisms are processed at once. Default is None.
 
     Returns
     -------
     result : array
         Gravitational field generated by the prisms at the computation points.
+        It is a D x K 2d-array if density is a P x K 2d-array.
 
     """
 
     # Verify the input parameters
     D = check.are_coordinates(coordinates)  # D = total number of data points
     P = check.are_rectangular_prisms(prisms)  # P = total number of prisms
-    check.is_array(density, ndim=1, shape=(P,))
+    _check_properties([density], P)
+    tile_shape = _tile_shape(D, P, tile_shape, max_memory)
 
     # Verify the field
     if field not in kernels:
         raise ValueError("Gravitational field {} not recognized".format(field))
 
     # compute the contribution of each vertex
-    result = iterate_over_vertices(coordinates, prisms, density, kernels[field])
+    result = iterate_over_vertices(
+        coordinates, prisms, density, kernels[field], tile_shape
+    )
 
     # multiply the computed field by the corresponding scale factors
     if scale is True:
-        result *= cts.GRAVITATIONAL_CONST
-        # Convert from m/s^2 to mGal
-        if field in ["x", "y", "z"]:
-            result *= cts.SI2miliGAL
-        # Convert from 1/s^2 to Eötvös
-        if field in ["xx", "xy", "xz", "yy", "yz", "zz"]:
-            result *= cts.SI2EOTVOS
+        result *= _grav_scale_factor(field)
+
+    return result
+
+
+def grav_fields(
+    coordinates,
+    prisms,
+    density,
+    fields,
+    scale=True,
+    tile_shape=None,
+    max_memory=None,
+):
+    """
+    Compute several gravitational fields produced by right-rectangular prisms
+    in Cartesian coordinates with a single sweep over the prisms vertices.
+    The coordinates differences, distances, logarithms and arctangents computed
+    at each vertex are shared by all fields.
+    All values are referred to a topocentric Cartesian system with axes
+    x, y and z pointing to north, east and down, respectively.
+
+    Parameters
+    ----------
+    coordinates : dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+        All coordinates should be in meters.
+    prisms : dictionary
+        Dictionary containing the x, y and z coordinates of the corners of each prism in prisms.
+        The corners south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2) of each
+        prism are arranged in the keys 'x1', 'x2', 'y1', 'y2', 'z1' and 'z2', respectively.
+        Each key is a numpy array 1d having the same number of elements.
+    density : 1d or 2d-array
+        Array containing the density of each prism in kg / m³. If it is a
+        P x K 2d-array, each column defines a density model and the fields
+        of all K models are computed with the same kernels.
+    fields : list of strings
+        Gravitational fields to be computed. The available fields are those
+        defined in function 'grav'.
+    scale : boolean
+        Defines if the resultant fields will be multiplied by the scale factors
+        defined in function 'grav'.
+    tile_shape : None or tuple of ints
+        See function 'grav'.
+    max_memory : None, int or float
+        See function 'grav'.
+
+    Returns
+    -------
+    result : dictionary
+        Dictionary containing the gravitational fields generated by the prisms
+        at the computation points. The keys are the elements of 'fields'.
+        Each field is a D x K 2d-array if density is a P x K 2d-array.
+
+    """
+
+    # Verify the input parameters
+    D = check.are_coordinates(coordinates)  # D = total number of data points
+    P = check.are_rectangular_prisms(prisms)  # P = total number of prisms
+    _check_properties([density], P)
+    tile_shape = _tile_shape(D, P, tile_shape, max_memory)
+
+    # Verify the fields
+    if type(fields) != list:
+        raise ValueError("fields must be a list")
+    if len(fields) == 0:
+        raise ValueError("fields must have at least one element")
+    for field in fields:
+        if field not in kernels:
+            raise ValueError(
+                "Gravitational field {} not recognized".format(field)
+            )
+
+    # compute the contribution of each vertex
+    result = iterate_over_vertices_fields(
+        coordinates, prisms, density, fields, tile_shape
+    )
+
+    # multiply the computed fields by the corresponding scale factors
+    if scale is True:
+        for field in fields:
+            result[field] *= _grav_scale_factor(field)
+
+    return result
+
+
+def grav_sensitivity(
+    coordinates,
+    prisms,
+    field,
+    scale=True,
+    tile_shape=None,
+    max_memory=None,
+    filename=None,
+):
+    """
+    Sensitivity matrix of the gravitational potential, first or second
+    derivatives produced by right-rectangular prisms in Cartesian coordinates.
+    The element ij of the sensitivity matrix is the field produced at the i-th
+    computation point by the j-th prism with unit density. Hence, the product
+    of this matrix and a density vector is equal to the field computed by
+    function 'grav'.
+    All values are referred to a topocentric Cartesian system with axes
+    x, y and z pointing to north, east and down, respectively.
+
+    Parameters
+    ----------
+    coordinates : dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+        All coordinates should be in meters.
+    prisms : dictionary
+        Dictionary containing the x, y and z coordinates of the corners of each prism in prisms.
+        The corners south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2) of each
+        prism are arranged in the keys 'x1', 'x2', 'y1', 'y2', 'z1' and 'z2', respectively.
+        Each key is a numpy array 1d having the same number of elements.
+    field : str
+        Gravitational field to be computed. The available fields are those
+        defined in function 'grav'.
+    scale : boolean
+        Defines if the sensitivity matrix will be multiplied by the scale factors
+        defined in function 'grav'.
+    tile_shape : None or tuple of ints
+        See function 'grav'. The sensitivity matrix is filled tile by tile.
+    max_memory : None, int or float
+        See function 'grav'.
+    filename : None or str
+        If not None, the sensitivity matrix is written into a 'numpy.memmap'
+        stored in the file 'filename', which is created or overwritten.
+        Combined with 'tile_shape' or 'max_memory', it allows computing
+        sensitivity matrices that do not fit in memory. The file can be
+        reopened later with
+        numpy.memmap(filename, dtype="float64", mode="r", shape=(D, P)).
+        Default is None.
+
+    Returns
+    -------
+    G : 2d-array or numpy.memmap
+        D x P sensitivity matrix, where D is the number of computation points
+        and P is the number of prisms.
+
+    """
+
+    # Verify the input parameters
+    D = check.are_coordinates(coordinates)  # D = total number of data points
+    P = check.are_rectangular_prisms(prisms)  # P = total number of prisms
+    tile_shape = _tile_shape(D, P, tile_shape, max_memory)
+    if tile_shape is None:
+        tile_shape = (D, P)
+    if (filename is not None) and (type(filename) != str):
+        raise ValueError("filename must be None or a string")
+
+    # Verify the field
+    if field not in kernels:
+        raise ValueError("Gravitational field {} not recognized".format(field))
+
+    if filename is None:
+        G = np.empty((D, P), dtype="float64")
+    else:
+        G = np.memmap(filename, dtype="float64", mode="w+", shape=(D, P))
+
+    if scale is True:
+        factor = _grav_scale_factor(field)
+    else:
+        factor = 1.0
+
+    # fill the sensitivity matrix tile by tile
+    for data_slice, prisms_slice in _tiles(D, P, tile_shape):
+        G[data_slice, prisms_slice] = factor * _kernel_matrix(
+            coordinates=_slice_dict(coordinates, data_slice),
+            prisms=_slice_dict(prisms, prisms_slice),
+            kernel=kernels[field],
+        )
+
+    if filename is not None:
+        G.flush()
+
+    return G
+
+
+class IncrementalGrav:
+    """
+    Gravitational field produced by right-rectangular prisms whose densities
+    are updated incrementally. The field is computed once at the creation of
+    the object by using function 'grav'. Then, each call of method 'update'
+    recomputes only the contribution of the prisms whose densities change,
+    so that the cost of an update is proportional to the number of modified
+    prisms instead of the total number of prisms.
+
+    Parameters
+    ----------
+    coordinates : dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+        All coordinates should be in meters.
+    prisms : dictionary
+        Dictionary containing the x, y and z coordinates of the corners of each prism in prisms.
+        The corners south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2) of each
+        prism are arranged in the keys 'x1', 'x2', 'y1', 'y2', 'z1' and 'z2', respectively.
+        Each key is a numpy array 1d having the same number of elements.
+    density : 1d or 2d-array
+        See function 'grav'. It is copied, so that the input array is not
+        modified by the updates.
+    field : str
+        Gravitational field to be computed. The available fields are those
+        defined in function 'grav'.
+    scale : boolean
+        Defines if the resultant field will be multiplied by the scale factors
+        defined in function 'grav'.
+    tile_shape : None or tuple of ints
+        See function 'grav'. It is also used by method 'update'.
+    max_memory : None, int or float
+        See function 'grav'. It is also used by method 'update'.
+
+    Attributes
+    ----------
+    density : 1d or 2d-array
+        Current density of each prism.
+    result : array
+        Gravitational field produced by the prisms with the current densities.
+    """
+
+    def __init__(
+        self,
+        coordinates,
+        prisms,
+        density,
+        field,
+        scale=True,
+        tile_shape=None,
+        max_memory=None,
+    ):
+        self.coordinates = coordinates
+        self.prisms = prisms
+        self.field = field
+        self.scale = scale
+        self.tile_shape = tile_shape
+        self.max_memory = max_memory
+        # the input is verified by function 'grav'
+        self.result = grav(
+            coordinates, prisms, density, field, scale, tile_shape, max_memory
+        )
+        self.density = np.array(density, dtype="float")
+
+    def update(self, indices, delta_density):
+        """
+        Add 'delta_density' to the densities of the prisms defined by
+        'indices' and update the gravitational field.
+
+        Parameters
+        ----------
+        indices : 1d-array of ints
+            Indices of the prisms whose densities change. Repeated indices
+            accumulate their density changes.
+        delta_density : 1d or 2d-array
+            Density changes in kg / m³. Its first dimension must be equal
+            to the number of indices and the remaining ones must be equal
+            to those of the current density.
+
+        Returns
+        -------
+        result : array
+            Updated gravitational field.
+        """
+        D = self.result.shape[0]
+        P = self.density.shape[0]
+        check.is_array(indices, ndim=1)
+        if np.issubdtype(indices.dtype, np.integer) is False:
+            raise ValueError("indices must be an array of ints")
+        if np.any(indices < -P) or np.any(indices >= P):
+            raise ValueError(
+                "indices must be between {} and {}".format(-P, P - 1)
+            )
+        check.is_array(
+            delta_density,
+            ndim=self.density.ndim,
+            shape=(indices.size,) + self.density.shape[1:],
+        )
+        if indices.size == 0:
+            return self.result
+
+        # compute the contribution of the modified prisms only
+        prisms = _slice_dict(self.prisms, indices)
+        tile_shape = _tile_shape(
+            D, indices.size, self.tile_shape, self.max_memory
+        )
+        delta_result = iterate_over_vertices(
+            self.coordinates,
+            prisms,
+            delta_density,
+            kernels[self.field],
+            tile_shape,
+        )
+        if self.scale is True:
+            delta_result *= _grav_scale_factor(self.field)
+
+        self.result += delta_result
+        np.add.at(self.density, indices, delta_density)
+
+        return self.result
+
+
+def grav_mesh(
+    coordinates,
+    prisms,
+    density,
+    field,
+    scale=True,
+    tile_shape=None,
+    max_memory=None,
+):
+    """
+    Gravitational potential, first and second derivatives
+    produced by right-rectangular prisms forming a contiguous mesh
+    (e.g., a voxel model), in Cartesian coordinates.
+    All values are referred to a topocentric Cartesian system with axes
+    x, y and z pointing to north, east and down, respectively.
+
+    It produces the same result as function 'grav', but the kernel is evaluated
+    only once per unique vertex and computation point, with the densities of
+    all prisms sharing a vertex combined into a signed weight
+    (see function 'mesh_vertices'). For dense 3D meshes, this reduces the
+    number of kernel evaluations by up to 8 times.
+
+    Parameters
+    ----------
+    coordinates : dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+        All coordinates should be in meters.
+    prisms : dictionary
+        Dictionary containing the x, y and z coordinates of the corners of each prism in prisms.
+        The corners south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2) of each
+        prism are arranged in the keys 'x1', 'x2', 'y1', 'y2', 'z1' and 'z2', respectively.
+        Each key is a numpy array 1d having the same number of elements.
+    density : 1d or 2d-array
+        Array containing the density of each prism in kg / m³. If it is a
+        P x K 2d-array, each column defines a density model and the fields
+        of all K models are computed with the same kernels.
+    field : str
+        Gravitational field to be computed. The available fields are those
+        defined in function 'grav'.
+    scale : boolean
+        Defines if the resultant field will be multiplied by the scale factors
+        defined in function 'grav'.
+    tile_shape : None or tuple of ints
+        If not None, it defines the maximum number of computation points and
+        unique vertices, respectively, forming each tile processed at once.
+        Default is None.
+    max_memory : None, int or float
+        See function 'grav'.
+
+    Returns
+    -------
+    result : array
+        Gravitational field generated by the prisms at the computation points.
+        It is a D x K 2d-array if density is a P x K 2d-array.
+
+    """
+
+    # Verify the input parameters
+    D = check.are_coordinates(coordinates)  # D = total number of data points
+    P = check.are_rectangular_prisms(prisms)  # P = total number of prisms
+    _check_properties([density], P)
+
+    # Verify the field
+    if field not in kernels:
+        raise ValueError("Gravitational field {} not recognized".format(field))
+
+    # unique vertices and their weights
+    vertices, (weights,) = mesh_vertices(prisms, [density])
+    U = vertices["x"].size  # U = total number of unique vertices
+    tile_shape = _tile_shape(D, max(U, 1), tile_shape, max_memory)
+
+    # compute the contribution of each unique vertex
+    result = iterate_over_unique_vertices(
+        coordinates, vertices, weights, kernels[field], tile_shape
+    )
+
+    # multiply the computed field by the corresponding scale factors
+    if scale is True:
+        result *= _grav_scale_factor(field)
+
+    return result
+
+
+def _check_properties(sigmas, P):
+    """
+    Check if the physical properties in the list 'sigmas' are 1d-arrays with P
+    elements or P x K 2d-arrays, all of them having the same shape.
+    """
+    for sigma in sigmas:
+        check.is_array(sigma)
+        if sigma.ndim not in [1, 2]:
+            raise ValueError("physical properties must be 1d or 2d-arrays")
+        if sigma.shape[0] != P:
+            raise ValueError("physical properties must have {} rows".format(P))
+        if sigma.shape != sigmas[0].shape:
+            raise ValueError("physical properties must have the same shape")
+
+
+def _grav_scale_factor(field):
+    """
+    Factor transforming the gravitational field computed in SI units
+    (without the gravitational constant) into the units used by 'grav'.
+    """
+    factor = cts.GRAVITATIONAL_CONST
+    # Convert from m/s^2 to mGal
+    if field in ["x", "y", "z"]:
+        factor *= cts.SI2miliGAL
+    # Convert from 1/s^2 to Eötvös
+    if field in ["xx", "xy", "xz", "yy", "yz", "zz"]:
+        factor *= cts.SI2EOTVOS
+    return factor
+
+
+def grav_BTTB(
+    data_grid, delta_z, thickness, density, field, ordering="xy", scale=True
+):
+    """
+    Gravitational potential, first and second derivatives
+    produced by layers of right-rectangular prisms in Cartesian coordinates.
+    All values are referred to a topocentric Cartesian system with axes
+    x, y and z pointing to north, east and down, respectively.
+
+    This function considers that both data points and prisms rely on planar
+    grids. These grids are aligned, so that each data point is located above the
+    center of a single prism in each layer. All prisms in a layer have the same
+    horizontal dimensions (equal to the grid spacing) and thickness. In this case,
+    the kernel matrix of each layer is a Block Toeplitz formed by Toeplitz Blocks
+    (BTTB) and its product with the density vector is computed by using the
+    Fast Fourier Transform (Takahashi et al., 2020, 2022).
+
+    Parameters
+    ----------
+    data_grid : dictionary
+        Dictionary containing the x, y and z coordinates of the grid points (or nodes)
+        at the keys 'x', 'y' and 'z', respectively, and the scheme for indexing the
+        points at the key 'ordering'. See function 'data_structures.grid_xy'.
+    delta_z : float, int or list
+        Positive scalar defining the constant vertical distance between the data and
+        the top of the prisms. It can be a list defining one distance per layer.
+    thickness : float, int or list
+        Positive scalar defining the constant thickness of the prisms. It can be a
+        list defining one thickness per layer.
+    density : 1d-array or list of 1d-arrays
+        1d-array containing the density of each prism in kg / m³. It can be a list
+        of 1d-arrays, one per layer. The prisms are ordered as the data points
+        (see parameter 'ordering').
+    field : str
+        Gravitational field to be computed. The available fields are those
+        defined in function 'grav'.
+    ordering : string
+        Defines how the points are ordered after the first point (min x, min y).
+        If 'xy', the points vary first along x and then along y.
+        If 'yx', the points vary first along y and then along x.
+        Default is 'xy'.
+    scale : boolean
+        Defines if the resultant field will be multiplied by the scale factors
+        defined in function 'grav'.
+
+    Returns
+    -------
+    result : array
+        Gravitational field generated by the prisms at the computation points.
+
+    """
+
+    # Verify the input parameters
+    D = check.is_grid_xy(grid=data_grid)  # D = total number of data points
+    check.is_ordering(ordering)
+    delta_z, thickness, (density,) = _layers(delta_z, thickness, [density], D)
+
+    # Verify the field
+    if field not in kernels:
+        raise ValueError("Gravitational field {} not recognized".format(field))
+
+    # compute the contribution of each layer
+    result = np.zeros(D, dtype="float")
+    for delta_z_layer, thickness_layer, density_layer in zip(
+        delta_z, thickness, density
+    ):
+        BTTB = _layer_BTTB(
+            data_grid, delta_z_layer, thickness_layer, field, ordering
+        )
+        result += _product_BTTB_vector(BTTB, density_layer)
+
+    # multiply the computed field by the corresponding scale factors
+    if scale is True:
+        result *= _grav_scale_factor(field)
 
     return result
 
 
-# def grav_BTTB(data_grid, delta_z, thickness, density, field, scale=True):
-#     """
-#     Gravitational potential, first and second derivatives
-#     produced by right-rectangular prisms in Cartesian coordinates.
-#     All values are referred to a topocentric Cartesian system with axes
-#     x, y and z pointing to north, east and down, respectively.
-
-#     This function considers that the both data points and prisms rely on planar 
-#     grids. These grids are alignes, so that each data point is located above the 
-#     center of a single prism. 
-
-#     Parameters
-#     ----------
-#     data_grid : dictionary
-#         Dictionary containing the x, y and z coordinates of the grid points (or nodes)
-#         at the keys 'x', 'y' and 'z', respectively, and the scheme for indexing the
-#         points at the key 'ordering'. See function 'data_structures.regular_grid_xy'.
-#     delta_z : float or int
-#         Positive scalar defining the constant vertical distance between the data and
-#         the top of the prisms.
-#     thickness : positive scalar
-#         Constant thickness of the prisms.
-#     density : 1d-array
-#         1d-array containing the density of each prism in kg / m³.
-#     field : str
-#         Gravitational field to be computed.
-#         The available fields are:
-#         - Gravitational potential: ``potential`` (in m² / s²)
-#         - z-component of acceleration: ``z`` (in mGal)
-#         - y-component of acceleration: ``y`` (in mGal)
-#         - x-component of acceleration: ``x`` (in mGal)
-#         - zz-component of acceleration: ``zz`` (in Eötvös)
-#         - yz-component of acceleration: ``yz`` (in Eötvös)
-#         - xz-component of acceleration: ``xz`` (in Eötvös)
-#         - yy-component of acceleration: ``yy`` (in Eötvös)
-#         - xy-component of acceleration: ``xy`` (in Eötvös)
-#         - xx-component of acceleration: ``xx`` (in Eötvös)
-#      scale : boolean
-#         Defines if the resultant field will be multiplied by scale factors
-#         "constants.GRAVITATIONAL_CONST" (Gravitational constant),
-#         "constants.SI2MGAL" (constant tranforming from m / s² to mGal) or
-#         "constants.SI2EOTVOS" (constant tranforming from 1 / s² to Eötvos)
-
-#     Returns
-#     -------
-#     result : array
-#         Gravitational field generated by the prisms at the computation points.
-
-#     """
-
-#     # Verify the input parameters
-#     D = check.is_grid_xy(grid=data_grid)  # D = total number of data points
-#     P = D  # P = total number of prisms
-#     check.is_array(density, ndim=1, shape=(P,))
-#     check.is_scalar(x=delta_z, positive=True)
-#     check.is_scalar(x=thickness, positive=True)
-
-#     # Verify the field
-#     if field not in kernels:
-#         raise ValueError("Gravitational field {} not recognized".format(field))
-
-#     # get grid horizontal spacing
-#     dx, dy = data_structures.grid_xy_spacing(
-#         area=data_grid['area'], shape=data_grid['shape'], check_input=False
-#         )
-
-#     # create a prism with center at (x min, y min) and side lenghts
-#     # dx, dy and thickness along the x, y and z direction, respectively
-#     prism = {
-#         'x1' : np.array([data_grid['x'][0] - 0.5*dx]),
-#         'x2' : np.array([data_grid['x'][0] + 0.5*dx]),
-#         'y1' : np.array([data_grid['y'][0] - 0.5*dy]),
-#         'y2' : np.array([data_grid['y'][0] + 0.5*dy]),
-#         'z1' : np.array([data_grid['z'] + delta_z]),
-#         'z2' : np.array([data_grid['z'] + delta_z + thickness])
-#     }
-
-#     # compute the contribution of each vertex
-#     result = iterate_over_vertices(coordinates, prisms, density, kernels[field])
-
-#     # multiply the computed field by the corresponding scale factors
-#     if scale is True:
-#         result *= cts.GRAVITATIONAL_CONST
-#         # Convert from m/s^2 to mGal
-#         if field in ["x", "y", "z"]:
-#             result *= cts.SI2miliGAL
-#         # Convert from 1/s^2 to Eötvös
-#         if field in ["xx", "xy", "xz", "yy", "yz", "zz"]:
-#             result *= cts.SI2EOTVOS
-
-#     return result
-
-
-def mag(coordinates, prisms, mx, my, mz, field, scale=True):
+def mag(
+    coordinates,
+    prisms,
+    mx,
+    my,
+    mz,
+    field,
+    scale=True,
+    tile_shape=None,
+    max_memory=None,
+):
     """
     Magnetic scalar potential and magnetic induction field produced by
     uniformly-magnetized and right-rectangular prisms in Cartesian coordinates.
@@ -192,8 +617,10 @@ def mag(coordinates, prisms, mx, my, mz, field, scale=True):
         The corners south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2) of each
         prism are arranged in the keys 'x1', 'x2', 'y1', 'y2', 'z1' and 'z2', respectively.
         Each key is a numpy array 1d having the same number of elements.
-    mx, my, mz : 1d-arrays
-        1d-arrays containing the x, y and z total-magnetization components of the prisms in A / m.
+    mx, my, mz : 1d or 2d-arrays
+        Arrays containing the x, y and z total-magnetization components of the prisms
+        in A / m. If they are P x K 2d-arrays, each column defines a magnetization
+        model and the fields of all K models are computed with the same kernels.
     field : str
         Magnetic field to be computed.
         The available fields are:
@@ -206,20 +633,29 @@ def mag(coordinates, prisms, mx, my, mz, field, scale=True):
         "constants.CM" (Magnetic constant),
         "constants.T2MT" (constant tranforming from Tesla to microtesla) or
         "constants.T2NT" (constant tranforming from Tesla to nanotesla)
+    tile_shape : None or tuple of ints
+        If not None, it defines the maximum number of computation points and prisms,
+        respectively, forming each tile processed at once. Default is None.
+    max_memory : None, int or float
+        If not None, it defines the maximum memory (in bytes) used by the temporary
+        arrays of each tile. The tile shape is then computed with function
+        'tile_shape_from_memory'. It cannot be used together with 'tile_shape'.
+        If both 'tile_shape' and 'max_memory' are None, all computation points and
+        prisms are processed at once. Default is None.
 
     Returns
     -------
     result : array
         Magnetic field generated by the prisms at the computation points.
+        It is a D x K 2d-array if mx, my and mz are P x K 2d-arrays.
 
     """
 
     # Verify the input parameters
     D = check.are_coordinates(coordinates)  # D = total number of data points
     P = check.are_rectangular_prisms(prisms)  # P = total number of prisms
-    check.is_array(mx, ndim=1, shape=(P,))
-    check.is_array(my, ndim=1, shape=(P,))
-    check.is_array(mz, ndim=1, shape=(P,))
+    _check_properties([mx, my, mz], P)
+    tile_shape = _tile_shape(D, P, tile_shape, max_memory)
 
     # Available kernels
     kernels = {
@@ -235,13 +671,13 @@ def mag(coordinates, prisms, mx, my, mz, field, scale=True):
 
     # compute the contribution of each vertex
     resultx = iterate_over_vertices(
-        coordinates, prisms, mx, kernels[field]["x"]
+        coordinates, prisms, mx, kernels[field]["x"], tile_shape
     )
     resulty = iterate_over_vertices(
-        coordinates, prisms, my, kernels[field]["y"]
+        coordinates, prisms, my, kernels[field]["y"], tile_shape
     )
     resultz = iterate_over_vertices(
-        coordinates, prisms, mz, kernels[field]["z"]
+        coordinates, prisms, mz, kernels[field]["z"], tile_shape
     )
     result = resultx + resulty + resultz
 
@@ -258,15 +694,638 @@ def mag(coordinates, prisms, mx, my, mz, field, scale=True):
     return result
 
 
+def mag_BTTB(
+    data_grid, delta_z, thickness, mx, my, mz, field, ordering="xy", scale=True
+):
+    """
+    Magnetic scalar potential and magnetic induction field produced by
+    layers of uniformly-magnetized and right-rectangular prisms in Cartesian
+    coordinates. All values are referred to a topocentric Cartesian system with
+    axes x, y and z pointing to north, east and down, respectively.
+
+    The data points and prisms are defined as in function 'grav_BTTB'.
+
+    Parameters
+    ----------
+    data_grid : dictionary
+        Dictionary containing the x, y and z coordinates of the grid points (or nodes)
+        at the keys 'x', 'y' and 'z', respectively, and the scheme for indexing the
+        points at the key 'ordering'. See function 'data_structures.grid_xy'.
+    delta_z : float, int or list
+        See function 'grav_BTTB'.
+    thickness : float, int or list
+        See function 'grav_BTTB'.
+    mx, my, mz : 1d-arrays or lists of 1d-arrays
+        1d-arrays containing the x, y and z total-magnetization components of the
+        prisms in A / m. They can be lists of 1d-arrays, one per layer. The prisms
+        are ordered as the data points (see parameter 'ordering').
+    field : str
+        Magnetic field to be computed. The available fields are those
+        defined in function 'mag'.
+    ordering : string
+        See function 'grav_BTTB'.
+    scale : boolean
+        Defines if the resultant field will be multiplied by the scale factors
+        defined in function 'mag'.
+
+    Returns
+    -------
+    result : array
+        Magnetic field generated by the prisms at the computation points.
+
+    """
+
+    # Verify the input parameters
+    D = check.is_grid_xy(grid=data_grid)  # D = total number of data points
+    check.is_ordering(ordering)
+    delta_z, thickness, (mx, my, mz) = _layers(
+        delta_z, thickness, [mx, my, mz], D
+    )
+
+    # Verify the field
+    if field not in _mag_components:
+        raise ValueError("Magnetic field {} not recognized".format(field))
+
+    # compute the contribution of each layer
+    result = np.zeros(D, dtype="float")
+    for delta_z_layer, thickness_layer, mx_layer, my_layer, mz_layer in zip(
+        delta_z, thickness, mx, my, mz
+    ):
+        for sigma, component in zip(
+            [mx_layer, my_layer, mz_layer], _mag_components[field]
+        ):
+            BTTB = _layer_BTTB(
+                data_grid, delta_z_layer, thickness_layer, component, ordering
+            )
+            result += _product_BTTB_vector(BTTB, sigma)
+
+    # multiply the computed field by the corresponding scale factors
+    if scale is True:
+        result *= cts.CM
+        # Convert from T to nT
+        if field in ["x", "y", "z"]:
+            result *= cts.T2nanoT
+        # Convert from T to uT and change sign
+        if field == "potential":
+            result *= -cts.T2microT
+
+    return result
+
+
+def _layers(delta_z, thickness, sigmas, D):
+    """
+    Check the parameters defining the layers of prisms used by functions
+    'grav_BTTB' and 'mag_BTTB' and return them as lists with one element
+    per layer.
+    """
+    if type(delta_z) != list:
+        delta_z = [delta_z]
+        thickness = [thickness]
+        sigmas = [[sigma] for sigma in sigmas]
+    nlayers = len(delta_z)
+    if nlayers == 0:
+        raise ValueError("there must be at least one layer")
+    if type(thickness) != list or len(thickness) != nlayers:
+        raise ValueError("thickness must have one element per layer")
+    for sigma in sigmas:
+        if type(sigma) != list or len(sigma) != nlayers:
+            raise ValueError(
+                "physical properties must have one element per layer"
+            )
+    for layer in range(nlayers):
+        check.is_scalar(x=delta_z[layer], positive=True)
+        check.is_scalar(x=thickness[layer], positive=True)
+        for sigma in sigmas:
+            check.is_array(sigma[layer], ndim=1, shape=(D,))
+    return delta_z, thickness, sigmas
+
+
+# parity of each field with respect to the horizontal coordinate
+# differences x and y between computation points and prism centers
+_parities = {
+    "potential": ("symm", "symm"),
+    "x": ("skew", "symm"),
+    "y": ("symm", "skew"),
+    "z": ("symm", "symm"),
+    "xx": ("symm", "symm"),
+    "xy": ("skew", "skew"),
+    "xz": ("skew", "symm"),
+    "yy": ("symm", "symm"),
+    "yz": ("symm", "skew"),
+    "zz": ("symm", "symm"),
+}
+
+
+def _layer_BTTB(data_grid, delta_z, thickness, field, ordering):
+    """
+    Compute the metadata of the BTTB kernel matrix (see function
+    'check.BTTB_metadata') associated with the gravitational field 'field'
+    produced by a layer of prisms centered below the data points.
+    """
+    # get grid horizontal spacing
+    dx, dy = data_structures.grid_xy_spacing(
+        area=data_grid["area"], shape=data_grid["shape"], check_input=False
+    )
+
+    # create a prism with center at (x min, y min) and side lengths
+    # dx, dy and thickness along the x, y and z direction, respectively
+    prism = {
+        "x1": np.array([data_grid["x"][0] - 0.5 * dx]),
+        "x2": np.array([data_grid["x"][0] + 0.5 * dx]),
+        "y1": np.array([data_grid["y"][0] - 0.5 * dy]),
+        "y2": np.array([data_grid["y"][0] + 0.5 * dy]),
+        "z1": np.array([data_grid["z"] + delta_z]),
+        "z2": np.array([data_grid["z"] + delta_z + thickness]),
+    }
+
+    # the first column of the kernel matrix is the field produced by
+    # this prism at all data points
+    coordinates = data_structures.grid_xy_to_full_flatten(
+        grid=data_grid, ordering=ordering, check_input=False
+    )
+    column = _kernel_matrix(coordinates, prism, kernels[field])[:, 0]
+
+    # the blocks are associated with the slow-varying coordinate and
+    # the elements within each block with the fast-varying coordinate
+    parity_x, parity_y = _parities[field]
+    if ordering == "xy":
+        # shape (Ny, Nx)
+        shape = data_grid["shape"][::-1]
+        symmetries = (parity_y, parity_x)
+    else:  # ordering == "yx"
+        # shape (Nx, Ny)
+        shape = data_grid["shape"]
+        symmetries = (parity_x, parity_y)
+
+    # dictionary containing metadata associated with the full BTTB
+    BTTB = {
+        "ordering": ordering,
+        "symmetry_structure": symmetries[0],
+        "symmetry_blocks": symmetries[1],
+        "nblocks": shape[0],
+        "columns": np.reshape(column, shape),
+        "rows": None,
+    }
+
+    return BTTB
+
+
+def _product_BTTB_vector(BTTB, v):
+    """
+    Compute the product of the BTTB matrix defined by its metadata and
+    the vector v by using its embedding BCCB matrix.
+    """
+    L = convolve.eigenvalues_BCCB(BTTB, ordering="row", check_input=False)
+    return convolve.product_BCCB_vector(L, "row", v, check_input=False)
+
+
+def grav_approximate(
+    coordinates,
+    prisms,
+    density,
+    field,
+    tolerance,
+    scale=True,
+    tile_shape=None,
+    max_memory=None,
+):
+    """
+    Gravitational potential, first and second derivatives
+    produced by right-rectangular prisms in Cartesian coordinates, by
+    replacing distant prisms with point masses.
+    All values are referred to a topocentric Cartesian system with axes
+    x, y and z pointing to north, east and down, respectively.
+
+    The field produced by a prism at a computation point is computed with the
+    point-mass formula (located at the prism center and having the prism
+    volume) if the estimated relative error
+
+        e = (m + 1) * (m + 2) * theta² / (6 * (1 - theta)^(m + 3))
+
+    does not exceed 'tolerance', where theta < 1 is the ratio between the
+    half-diagonal of the prism and the distance from the computation point to
+    the prism center and m is the order of the derivative (0 for the
+    potential). Otherwise, it is computed with the closed-form formulas used
+    by function 'grav'. The estimate is derived from the remainder of the
+    second-order Taylor expansion about the prism center and is conservative,
+    so that the actual errors are usually much smaller than 'tolerance'.
+
+    Parameters
+    ----------
+    coordinates : dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+        All coordinates should be in meters.
+    prisms : dictionary
+        Dictionary containing the x, y and z coordinates of the corners of each prism in prisms.
+        The corners south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2) of each
+        prism are arranged in the keys 'x1', 'x2', 'y1', 'y2', 'z1' and 'z2', respectively.
+        Each key is a numpy array 1d having the same number of elements.
+    density : 1d or 2d-array
+        See function 'grav'.
+    field : str
+        Gravitational field to be computed. The available fields are those
+        defined in function 'grav'.
+    tolerance : float or int
+        Positive scalar defining the maximum estimated relative error allowed
+        for replacing a prism with a point mass.
+    scale : boolean
+        Defines if the resultant field will be multiplied by the scale factors
+        defined in function 'grav'.
+    tile_shape : None or tuple of ints
+        See function 'grav'.
+    max_memory : None, int or float
+        See function 'grav'.
+
+    Returns
+    -------
+    result : array
+        Gravitational field generated by the prisms at the computation points.
+    error_bound : array
+        Upper bound for the absolute error of 'result' at each computation
+        point, given by the sum of
+
+            |density| * volume * (m + 2)! * a² / (6 * (r - a)^(m + 3))
+
+        over the prisms replaced with point masses, where a is the
+        half-diagonal of the prism and r is the distance from the computation
+        point to the prism center. It has the same shape and units as 'result'.
+
+    """
+
+    # Verify the input parameters
+    D = check.are_coordinates(coordinates)  # D = total number of data points
+    P = check.are_rectangular_prisms(prisms)  # P = total number of prisms
+    _check_properties([density], P)
+    check.is_scalar(x=tolerance, positive=True)
+    tile_shape = _tile_shape(D, P, tile_shape, max_memory)
+
+    # Verify the field
+    if field not in kernels:
+        raise ValueError("Gravitational field {} not recognized".format(field))
+
+    # compute the field with point masses for distant prisms
+    result, error_bound = iterate_over_vertices_approximate(
+        coordinates, prisms, density, field, tolerance, tile_shape
+    )
+
+    # multiply the computed field by the corresponding scale factors
+    if scale is True:
+        factor = _grav_scale_factor(field)
+        result *= factor
+        error_bound *= np.abs(factor)
+
+    return result, error_bound
+
+
+def mag_approximate(
+    coordinates,
+    prisms,
+    mx,
+    my,
+    mz,
+    field,
+    tolerance,
+    scale=True,
+    tile_shape=None,
+    max_memory=None,
+):
+    """
+    Magnetic scalar potential and magnetic induction field produced by
+    uniformly-magnetized and right-rectangular prisms in Cartesian coordinates,
+    by replacing distant prisms with dipoles.
+    All values are referred to a topocentric Cartesian system with axes
+    x, y and z pointing to north, east and down, respectively.
+
+    The criterion for replacing a prism with a dipole (located at the prism
+    center and having the prism volume) is the same used by function
+    'grav_approximate', with m = 1 for the potential and m = 2 for the
+    induction components.
+
+    Parameters
+    ----------
+    coordinates : dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+        All coordinates should be in meters.
+    prisms : dictionary
+        Dictionary containing the x, y and z coordinates of the corners of each prism in prisms.
+        The corners south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2) of each
+        prism are arranged in the keys 'x1', 'x2', 'y1', 'y2', 'z1' and 'z2', respectively.
+        Each key is a numpy array 1d having the same number of elements.
+    mx, my, mz : 1d or 2d-arrays
+        See function 'mag'.
+    field : str
+        Magnetic field to be computed. The available fields are those
+        defined in function 'mag'.
+    tolerance : float or int
+        Positive scalar defining the maximum estimated relative error allowed
+        for replacing a prism with a dipole.
+    scale : boolean
+        Defines if the resultant field will be multiplied by the scale factors
+        defined in function 'mag'.
+    tile_shape : None or tuple of ints
+        See function 'grav'.
+    max_memory : None, int or float
+        See function 'grav'.
+
+    Returns
+    -------
+    result : array
+        Magnetic field generated by the prisms at the computation points.
+    error_bound : array
+        Upper bound for the absolute error of 'result' at each computation
+        point. It is computed as in function 'grav_approximate', with the
+        absolute values of the three magnetization components.
+
+    """
+
+    # Verify the input parameters
+    D = check.are_coordinates(coordinates)  # D = total number of data points
+    P = check.are_rectangular_prisms(prisms)  # P = total number of prisms
+    _check_properties([mx, my, mz], P)
+    check.is_scalar(x=tolerance, positive=True)
+    tile_shape = _tile_shape(D, P, tile_shape, max_memory)
+
+    # Verify the field
+    if field not in _mag_components:
+        raise ValueError("Magnetic field {} not recognized".format(field))
+
+    # compute the field with dipoles for distant prisms
+    result = 0
+    error_bound = 0
+    for sigma, component in zip([mx, my, mz], _mag_components[field]):
+        result_m, error_bound_m = iterate_over_vertices_approximate(
+            coordinates, prisms, sigma, component, tolerance, tile_shape
+        )
+        result = result + result_m
+        error_bound = error_bound + error_bound_m
+
+    # multiply the computed field by the corresponding scale factors
+    if scale is True:
+        factor = cts.CM
+        # Convert from T to nT
+        if field in ["x", "y", "z"]:
+            factor *= cts.T2nanoT
+        # Convert from T to uT and change sign
+        if field == "potential":
+            factor *= -cts.T2microT
+        result *= factor
+        error_bound *= np.abs(factor)
+
+    return result, error_bound
+
+
+# Gravitational fields combined with the x, y and z magnetization components
+# to compute each magnetic field (see the kernels used by function 'mag')
+_mag_components = {
+    "potential": ["x", "y", "z"],
+    "z": ["xz", "yz", "zz"],
+    "y": ["xy", "yy", "yz"],
+    "x": ["xx", "xy", "xz"],
+}
+
+
 # iterate over vertices
-def iterate_over_vertices(coordinates, prisms, sigma, kernel):
+def iterate_over_vertices(coordinates, prisms, sigma, kernel, tile_shape=None):
+    """
+    Function for iterating over the vertices of the rectangular prisms
+    by using numpy with broadcasting.
+
+    The computation points and prisms are split into tiles containing at most
+    tile_shape[0] points and tile_shape[1] prisms. The kernel matrix of each
+    tile is contracted with the corresponding elements of 'sigma' right away,
+    so that the full D x P kernel matrix is never stored. If tile_shape is None,
+    there is a single tile containing all points and prisms.
+    """
+    D = coordinates["x"].size
+    P = prisms["x1"].size
+    if tile_shape is None:
+        tile_shape = (D, P)
+    predicted_field = np.zeros((D,) + sigma.shape[1:], dtype="float")
+    # iterate over tiles
+    for data_slice, prisms_slice in _tiles(D, P, tile_shape):
+        # kernel matrix of the current tile
+        G = _kernel_matrix(
+            coordinates=_slice_dict(coordinates, data_slice),
+            prisms=_slice_dict(prisms, prisms_slice),
+            kernel=kernel,
+        )
+        predicted_field[data_slice] += G @ sigma[prisms_slice]
+
+    return predicted_field
+
+
+def iterate_over_vertices_fields(
+    coordinates, prisms, sigma, fields, tile_shape=None
+):
     """
     Function for iterating over the vertices of the rectangular prisms
-    by using numpy with broadcasting
+    by using numpy with broadcasting and computing several fields at once.
+    It works like 'iterate_over_vertices', but the logarithms and arctangents
+    computed at each vertex are shared by all fields (see 'kernel_fields').
+    """
+    D = coordinates["x"].size
+    P = prisms["x1"].size
+    if tile_shape is None:
+        tile_shape = (D, P)
+    predicted_fields = dict()
+    for field in fields:
+        predicted_fields[field] = np.zeros(
+            (D,) + sigma.shape[1:], dtype="float"
+        )
+    # iterate over tiles
+    for data_slice, prisms_slice in _tiles(D, P, tile_shape):
+        # kernel matrices of the current tile
+        G = _kernel_matrices(
+            coordinates=_slice_dict(coordinates, data_slice),
+            prisms=_slice_dict(prisms, prisms_slice),
+            fields=fields,
+        )
+        for field in fields:
+            predicted_fields[field][data_slice] += (
+                G[field] @ sigma[prisms_slice]
+            )
+
+    return predicted_fields
+
+
+def iterate_over_vertices_approximate(
+    coordinates, prisms, sigma, field, tolerance, tile_shape=None
+):
+    """
+    Function for computing the gravitational field 'field' produced by the
+    rectangular prisms by replacing the distant prisms with point masses
+    (see function 'grav_approximate'). It works like 'iterate_over_vertices',
+    but it also returns the error bound at each computation point.
+    """
+    D = coordinates["x"].size
+    P = prisms["x1"].size
+    if tile_shape is None:
+        tile_shape = (D, P)
+    predicted_field = np.zeros((D,) + sigma.shape[1:], dtype="float")
+    error_bound = np.zeros((D,) + sigma.shape[1:], dtype="float")
+    # iterate over tiles
+    for data_slice, prisms_slice in _tiles(D, P, tile_shape):
+        # approximated kernel matrix of the current tile and its error bounds
+        G, B = _approximate_kernel_matrix(
+            coordinates=_slice_dict(coordinates, data_slice),
+            prisms=_slice_dict(prisms, prisms_slice),
+            field=field,
+            tolerance=tolerance,
+        )
+        predicted_field[data_slice] += G @ sigma[prisms_slice]
+        error_bound[data_slice] += B @ np.abs(sigma[prisms_slice])
+
+    return predicted_field, error_bound
+
+
+def _approximate_kernel_matrix(coordinates, prisms, field, tolerance):
     """
-    predicted_field = np.zeros(
-        (coordinates["x"].size, prisms["x1"].size), dtype="float"
+    Compute the kernel matrix of the gravitational field 'field' by using the
+    point-mass formula for the prism-point pairs satisfying the criterion
+    defined in function 'grav_approximate' and the closed-form formulas for
+    the remaining pairs. It also computes the matrix of error bounds per
+    unit physical property.
+    """
+    # order of the derivative
+    m = 0 if field == "potential" else len(field)
+    # centers, volumes and half-diagonals of the prisms
+    dx = prisms["x2"] - prisms["x1"]
+    dy = prisms["y2"] - prisms["y1"]
+    dz = prisms["z2"] - prisms["z1"]
+    centers = {
+        "x": prisms["x1"] + 0.5 * dx,
+        "y": prisms["y1"] + 0.5 * dy,
+        "z": prisms["z1"] + 0.5 * dz,
+    }
+    volume = dx * dy * dz
+    a = 0.5 * np.sqrt(dx**2 + dy**2 + dz**2)
+
+    # Squared Euclidean Distance Matrix (SEDM) between points and centers
+    SEDM = idist.sedm(
+        data_points=coordinates, source_points=centers, check_input=False
     )
+    r = np.sqrt(SEDM)
+    # ratio between half-diagonal and distance (inf at the prism centers)
+    theta = np.full(r.shape, np.inf)
+    np.divide(a, r, out=theta, where=(r > 0))
+    far = theta < 1
+    far[far] = (
+        (m + 1) * (m + 2) * theta[far] ** 2 / (6 * (1 - theta[far]) ** (m + 3))
+    ) <= tolerance
+
+    G = np.zeros(r.shape, dtype="float")
+    B = np.zeros(r.shape, dtype="float")
+    rows, cols = np.nonzero(far)
+    if rows.size > 0:
+        # point masses for distant prisms
+        G[rows, cols] = volume[cols] * _point_kernel(
+            _slice_dict(coordinates, rows),
+            _slice_dict(centers, cols),
+            SEDM[rows, cols],
+            field,
+        )
+        B[rows, cols] = (
+            volume[cols]
+            * math.factorial(m + 2)
+            * a[cols] ** 2
+            / (6 * (r[rows, cols] - a[cols]) ** (m + 3))
+        )
+    rows, cols = np.nonzero(~far)
+    if rows.size > 0:
+        # closed-form formulas for the remaining prisms
+        G[rows, cols] = _pairs_kernel(
+            _slice_dict(coordinates, rows),
+            _slice_dict(prisms, cols),
+            kernels[field],
+        )
+
+    return G, B
+
+
+def _point_kernel(coordinates, points, SEDM, field):
+    """
+    Compute the gravitational field 'field' (without the gravitational
+    constant) produced by point masses with unit mass at the pairs
+    formed by the i-th computation point and the i-th point.
+    """
+    # the inverse distance functions compute the differences between the
+    # computation points (as a column) and the points, which are then handled
+    # as an N x 1 matrix to obtain the differences between pairs only
+    points = _slice_dict(points, (slice(None), np.newaxis))
+    SEDM = SEDM[:, np.newaxis]
+    if field == "potential":
+        result = 1 / np.sqrt(SEDM)
+    elif field in ["x", "y", "z"]:
+        result = idist.grad(
+            coordinates, points, SEDM, components=[field], check_input=False
+        )[field]
+    else:
+        result = idist.grad_tensor(
+            coordinates, points, SEDM, components=[field], check_input=False
+        )[field]
+    return result[:, 0]
+
+
+def _pairs_kernel(coordinates, prisms, kernel):
+    """
+    Compute the contribution of all vertices of the i-th prism
+    at the i-th computation point.
+    """
+    result = np.zeros(coordinates["x"].size, dtype="float")
+    # iterate over vertices
+    for i in [1, 2]:
+        for j in [1, 2]:
+            for k in [1, 2]:
+                sign = (-1) ** (i + j + k)
+                # N x 1 matrices
+                X = (prisms["x{}".format(i)] - coordinates["x"])[:, np.newaxis]
+                Y = (prisms["y{}".format(j)] - coordinates["y"])[:, np.newaxis]
+                Z = (prisms["z{}".format(k)] - coordinates["z"])[:, np.newaxis]
+                R = np.sqrt(X**2 + Y**2 + Z**2)
+                result += sign * kernel(X, Y, Z, R)[:, 0]
+
+    return result
+
+
+def _kernel_matrix(coordinates, prisms, kernel):
+    """
+    Compute the matrix formed by the contribution of all vertices of each
+    prism (columns) at each computation point (rows).
+    """
+    G = np.zeros((coordinates["x"].size, prisms["x1"].size), dtype="float")
+    for sign, X, Y, Z, R in _vertices(coordinates, prisms):
+        # compute contribution of the current vertex
+        G[:] += sign * kernel(X, Y, Z, R)
+
+    return G
+
+
+def _kernel_matrices(coordinates, prisms, fields):
+    """
+    Compute the matrices formed by the contribution of all vertices of each
+    prism (columns) at each computation point (rows) for several fields.
+    """
+    G = dict()
+    for field in fields:
+        G[field] = np.zeros(
+            (coordinates["x"].size, prisms["x1"].size), dtype="float"
+        )
+    for sign, X, Y, Z, R in _vertices(coordinates, prisms):
+        # compute contribution of the current vertex
+        values = kernel_fields(X, Y, Z, R, fields)
+        for field in fields:
+            G[field][:] += sign * values[field]
+
+    return G
+
+
+def _vertices(coordinates, prisms):
+    """
+    Generate the sign and the arrays X, Y, Z and R associated with
+    each vertex of the rectangular prisms.
+    """
     # iterate over vertices
     for i in [1, 2]:
         for j in [1, 2]:
@@ -280,37 +1339,215 @@ def iterate_over_vertices(coordinates, prisms, sigma, kernel):
                     "y": prisms[vertex_y],
                     "z": prisms[vertex_z],
                 }
-                # Squared Euclidean Distance Matrix (SEDM)
-
-                #PAREI AQUI
-
-                R = np.sqrt(
-                    idist.sedm(
-                        data_points=coordinates,
-                        source_points=vertex,
-                        check_input=False,
-                    )
-                )
-                X = (
-                    -coordinates["x"][:, np.newaxis]
-                    + vertex["x"][np.newaxis, :]
-                )
-                Y = (
-                    -coordinates["y"][:, np.newaxis]
-                    + vertex["y"][np.newaxis, :]
-                )
-                Z = (
-                    -coordinates["z"][:, np.newaxis]
-                    + vertex["z"][np.newaxis, :]
-                )
-                # compute contribution of the current vertex
-                predicted_field[:] += sign * kernel(X, Y, Z, R)
-
-    predicted_field = np.sum(a=predicted_field * sigma[np.newaxis, :], axis=1)
+                X, Y, Z, R = _differences(coordinates, vertex)
+                yield sign, X, Y, Z, R
+
+
+def _differences(coordinates, points):
+    """
+    Compute the arrays X, Y, Z and R formed by the coordinate differences and
+    distances between the 'points' (columns) and computation points (rows).
+    """
+    # Squared Euclidean Distance Matrix (SEDM)
+    R = np.sqrt(
+        idist.sedm(
+            data_points=coordinates,
+            source_points=points,
+            check_input=False,
+        )
+    )
+    X = -coordinates["x"][:, np.newaxis] + points["x"][np.newaxis, :]
+    Y = -coordinates["y"][:, np.newaxis] + points["y"][np.newaxis, :]
+    Z = -coordinates["z"][:, np.newaxis] + points["z"][np.newaxis, :]
+    return X, Y, Z, R
+
+
+def mesh_vertices(prisms, sigmas):
+    """
+    Find the unique vertices of a set of rectangular prisms and compute the
+    signed weights combining the properties of all prisms sharing each vertex.
+
+    The field produced by the prisms is the sum of the kernel evaluated at
+    each vertex, multiplied by the sign of the vertex and by the physical
+    property of the prism. In contiguous meshes, neighbouring prisms share
+    vertices and their contributions can be grouped into a single weight per
+    unique vertex. Vertices are considered to be shared only if their
+    coordinates are exactly equal. Vertices having null weights for all
+    properties (e.g., interior vertices of homogeneous regions) are removed.
+
+    Parameters
+    ----------
+    prisms : dictionary
+        Dictionary containing the x, y and z coordinates of the corners of each prism in prisms.
+        The corners south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2) of each
+        prism are arranged in the keys 'x1', 'x2', 'y1', 'y2', 'z1' and 'z2', respectively.
+        Each key is a numpy array 1d having the same number of elements.
+    sigmas : list of arrays
+        List of 1d or 2d-arrays containing the physical properties of the prisms
+        (e.g., density or magnetization components). The first dimension of each
+        array must be equal to the number of prisms.
+
+    Returns
+    -------
+    vertices : dictionary
+        Dictionary containing the x, y and z coordinates of the unique vertices
+        at the keys 'x', 'y' and 'z', respectively.
+    weights : list of arrays
+        List of arrays containing the signed weights of the unique vertices
+        associated with each element of 'sigmas'. The first dimension of each
+        array is equal to the number of unique vertices.
+    """
+    P = prisms["x1"].size
+    # coordinates and signs of the 8 vertices of all prisms
+    points = np.empty((8 * P, 3), dtype="float64")
+    signs = np.empty(8 * P, dtype="float64")
+    for index, (i, j, k) in enumerate(
+        [(i, j, k) for i in [1, 2] for j in [1, 2] for k in [1, 2]]
+    ):
+        rows = slice(index * P, (index + 1) * P)
+        points[rows, 0] = prisms["x{}".format(i)]
+        points[rows, 1] = prisms["y{}".format(j)]
+        points[rows, 2] = prisms["z{}".format(k)]
+        signs[rows] = (-1) ** (i + j + k)
+    # unique vertices
+    unique_points, inverse = np.unique(points, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    U = unique_points.shape[0]
+    # signed weights of the unique vertices
+    weights = []
+    for sigma in sigmas:
+        # signed properties of the 8 vertices of all prisms
+        values = np.concatenate(8 * [sigma]) * signs.reshape(
+            (8 * P,) + (1,) * (sigma.ndim - 1)
+        )
+        values = values.reshape(8 * P, -1)
+        weight = np.stack(
+            [
+                np.bincount(inverse, weights=values[:, k], minlength=U)
+                for k in range(values.shape[1])
+            ],
+            axis=1,
+        )
+        weights.append(weight.reshape((U,) + sigma.shape[1:]))
+    # remove vertices with null weights
+    keep = np.zeros(U, dtype=bool)
+    for weight in weights:
+        keep |= np.any(weight.reshape(U, -1) != 0, axis=1)
+    vertices = {
+        "x": unique_points[keep, 0],
+        "y": unique_points[keep, 1],
+        "z": unique_points[keep, 2],
+    }
+    weights = [weight[keep] for weight in weights]
+    return vertices, weights
+
+
+def iterate_over_unique_vertices(
+    coordinates, vertices, weights, kernel, tile_shape=None
+):
+    """
+    Function for computing the field produced by prisms sharing vertices by
+    using numpy with broadcasting. The kernel is evaluated only once per unique
+    vertex (see function 'mesh_vertices') and computation point.
+
+    The computation points and vertices are split into tiles containing at most
+    tile_shape[0] points and tile_shape[1] vertices. If tile_shape is None,
+    there is a single tile containing all points and vertices.
+    """
+    D = coordinates["x"].size
+    U = vertices["x"].size
+    if tile_shape is None:
+        # the tiles must not be empty even if there are no vertices
+        tile_shape = (max(D, 1), max(U, 1))
+    predicted_field = np.zeros((D,) + weights.shape[1:], dtype="float")
+    # iterate over tiles
+    for data_slice, vertices_slice in _tiles(D, U, tile_shape):
+        X, Y, Z, R = _differences(
+            _slice_dict(coordinates, data_slice),
+            _slice_dict(vertices, vertices_slice),
+        )
+        predicted_field[data_slice] += (
+            kernel(X, Y, Z, R) @ weights[vertices_slice]
+        )
 
     return predicted_field
 
 
+def _tiles(D, P, tile_shape):
+    """
+    Generate the pairs of slices defining the tiles of computation points
+    and prisms.
+    """
+    for d0 in range(0, D, tile_shape[0]):
+        for p0 in range(0, P, tile_shape[1]):
+            yield (
+                slice(d0, min(d0 + tile_shape[0], D)),
+                slice(p0, min(p0 + tile_shape[1], P)),
+            )
+
+
+def _slice_dict(points, index):
+    """
+    Return a dictionary having the same keys as 'points' and values given by
+    the elements of the corresponding arrays defined by 'index'.
+    """
+    return {key: value[index] for key, value in points.items()}
+
+
+# Estimated number of bytes required by each element of a tile. It considers
+# the kernel matrix, the arrays X, Y, Z and R, the auxiliary arrays used to
+# compute the SEDM and the temporary arrays created by the kernels
+# (all of them with 8-byte floats).
+_BYTES_PER_TILE_ELEMENT = 16 * 8
+
+
+def tile_shape_from_memory(D, P, max_memory):
+    """
+    Define the shape of the tiles used by 'iterate_over_vertices' so that the
+    memory required by the temporary arrays of a single tile does not exceed
+    a given budget.
+
+    Parameters
+    ----------
+    D, P : ints
+        Total number of computation points and prisms, respectively.
+    max_memory : int or float
+        Maximum memory (in bytes) available for the temporary arrays.
+
+    Returns
+    -------
+    tile_shape : tuple of ints
+        Maximum number of computation points and prisms per tile.
+    """
+    check.is_integer(x=D, positive=True)
+    check.is_integer(x=P, positive=True)
+    check.is_scalar(x=max_memory, positive=True)
+    # maximum number of elements of a single tile
+    size = max(int(max_memory // _BYTES_PER_TILE_ELEMENT), 1)
+    # use all prisms per tile whenever possible
+    nprisms = min(P, size)
+    ndata = min(D, max(size // nprisms, 1))
+    return (ndata, nprisms)
+
+
+def _tile_shape(D, P, tile_shape, max_memory):
+    """
+    Define the tile shape from the parameters 'tile_shape' and 'max_memory' of
+    functions 'grav' and 'mag'.
+    """
+    if (tile_shape is not None) and (max_memory is not None):
+        raise ValueError("tile_shape and max_memory cannot be both defined")
+    if tile_shape is not None:
+        if (type(tile_shape) != tuple) or (len(tile_shape) != 2):
+            raise ValueError("tile_shape must be a tuple of 2 elements")
+        check.is_integer(x=tile_shape[0], positive=True)
+        check.is_integer(x=tile_shape[1], positive=True)
+        return tile_shape
+    if max_memory is not None:
+        return tile_shape_from_memory(D, P, max_memory)
+    return None
+
+
 # kernels
 def kernel_potential_grav(X, Y, Z, R):
     """
@@ -433,4 +1670,68 @@ kernels = {
     "yy": kernel_yy,
     "yz": kernel_yz,
     "zz": kernel_zz,
-}
\ No newline at end of file
+}
+
+
+# logarithms and arctangents required by each kernel
+kernels_terms = {
+    "potential": ["log_x", "log_y", "log_z", "atan_x", "atan_y", "atan_z"],
+    "x": ["log_y", "log_z", "atan_x"],
+    "y": ["log_x", "log_z", "atan_y"],
+    "z": ["log_x", "log_y", "atan_z"],
+    "xx": ["atan_x"],
+    "xy": ["log_z"],
+    "xz": ["log_y"],
+    "yy": ["atan_y"],
+    "yz": ["log_x"],
+    "zz": ["atan_z"],
+}
+
+
+def kernel_fields(X, Y, Z, R, fields):
+    """
+    Function for computing several kernels for a rectangular prism at once.
+    The logarithms and arctangents are computed only once and shared by
+    all kernels defined in 'fields'.
+    """
+    # define the terms required by all fields
+    terms = set()
+    for field in fields:
+        terms.update(kernels_terms[field])
+    log_x = utils.safe_log(X + R) if "log_x" in terms else None
+    log_y = utils.safe_log(Y + R) if "log_y" in terms else None
+    log_z = utils.safe_log(Z + R) if "log_z" in terms else None
+    atan_x = utils.safe_atan2(Y * Z, X * R) if "atan_x" in terms else None
+    atan_y = utils.safe_atan2(X * Z, Y * R) if "atan_y" in terms else None
+    atan_z = utils.safe_atan2(Y * X, Z * R) if "atan_z" in terms else None
+
+    result = dict()
+    for field in fields:
+        if field == "potential":
+            result[field] = (
+                X * Y * log_z
+                + X * Z * log_y
+                + Y * Z * log_x
+                - 0.5 * Y**2 * atan_y
+                - 0.5 * X**2 * atan_x
+                - 0.5 * Z**2 * atan_z
+            )
+        elif field == "x":
+            result[field] = -(Y * log_z + Z * log_y - X * atan_x)
+        elif field == "y":
+            result[field] = -(X * log_z + Z * log_x - Y * atan_y)
+        elif field == "z":
+            result[field] = -(Y * log_x + X * log_y - Z * atan_z)
+        elif field == "xx":
+            result[field] = -atan_x
+        elif field == "xy":
+            result[field] = log_z
+        elif field == "xz":
+            result[field] = log_y
+        elif field == "yy":
+            result[field] = -atan_y
+        elif field == "yz":
+            result[field] = log_x
+        else:  # field == "zz"
+            result[field] = -atan_z
+    return result
@@ -7,14 +7,25 @@ functions proposed by Fukushima (2020) for dealing with singularities at some co
 """
 
 import numpy as np
-from numba import njit
+import numba
+from numba import njit, prange
 from .. import check
 from .. import utils
 from .. import constants as cts
 from .. import inverse_distance as idist
+from . import octree
+from . import rectangular_prism as rp
 
 
-def grav(coordinates, prisms, density, field, scale=True):
+def grav(
+    coordinates,
+    prisms,
+    density,
+    field,
+    scale=True,
+    parallel=False,
+    nthreads=None,
+):
     """
     Gravitational potential, first and second derivatives
     produced by right-rectangular prisms in Cartesian coordinates.
@@ -52,6 +63,14 @@ def grav(coordinates, prisms, density, field, scale=True):
         "constants.GRAVITATIONAL_CONST" (Gravitational constant),
         "constants.SI2MGAL" (constant tranforming from m/s² to mGal) or
         "constants.SI2EOTVOS" (constant tranforming from 1/s² to Eötvos)
+    parallel : boolean
+        If True, the computation points are distributed among multiple threads.
+        Each thread computes the field at its own computation points, so that
+        the result does not depend on the number of threads. Default is False.
+    nthreads : None or int
+        Number of threads used if 'parallel' is True. If None, it uses the
+        number of threads defined by numba (see 'numba.get_num_threads').
+        Default is None.
 
     Returns
     -------
@@ -64,46 +83,139 @@ def grav(coordinates, prisms, density, field, scale=True):
     D = check.are_coordinates(coordinates)  # D = total number of data points
     P = check.are_rectangular_prisms(prisms)  # P = total number of prisms
     check.is_array(density, ndim=1, shape=(P,))
-
-    # Available fields
-    fields = {
-        "potential": kernel_inverse_r,
-        "x": kernel_dx,
-        "y": kernel_dy,
-        "z": kernel_dz,
-        "xx": kernel_dxx,
-        "xy": kernel_dxy,
-        "xz": kernel_dxz,
-        "yy": kernel_dyy,
-        "yz": kernel_dyz,
-        "zz": kernel_dzz,
-    }
+    _check_threads(parallel, nthreads)
 
     # Verify the field
-    if field not in fields:
+    if field not in FIELDS:
         raise ValueError("Gravitational field {} not recognized".format(field))
 
     # create the array to store the result
     result = np.zeros(D, dtype="float64")
 
     # Compute gravitational field
-
-    jit_grav(coordinates, prisms, density, fields[field], result)
+    _run(
+        jit_grav_parallel if parallel is True else jit_grav,
+        nthreads,
+        _pack_coordinates(coordinates),
+        _pack_prisms(prisms),
+        density.astype("float64"),
+        FIELDS.index(field),
+        result,
+    )
 
     # multiply the computed field by the corresponding scale factors
     if scale is True:
-        result *= cts.GRAVITATIONAL_CONST
-        # Convert from m/s^2 to mGal
-        if field in ["x", "y", "z"]:
-            result *= cts.SI2MGAL
-        # Convert from 1/s^2 to Eötvös
-        if field in ["xx", "xy", "xz", "yy", "yz", "zz"]:
-            result *= cts.SI2EOTVOS
+        result *= rp._grav_scale_factor(field)
 
     return result
 
 
-def mag(coordinates, prisms, mx, my, mz, field, scale=True):
+def grav_fields(
+    coordinates,
+    prisms,
+    density,
+    fields,
+    scale=True,
+    parallel=False,
+    nthreads=None,
+):
+    """
+    Compute several gravitational fields produced by right-rectangular prisms
+    in Cartesian coordinates with a single sweep over the prisms vertices.
+    The coordinates differences, distances, logarithms and arctangents computed
+    at each vertex are shared by all fields.
+    All values are referred to a topocentric Cartesian system with axes
+    x, y and z pointing to north, east and down, respectively.
+
+    Parameters
+    ----------
+    coordinates : dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+        All coordinates should be in meters.
+    prisms : dictionary
+        Dictionary containing the x, y and z coordinates of the corners of each prism in prisms.
+        The corners south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2) of each
+        prism are arranged in the keys 'x1', 'x2', 'y1', 'y2', 'z1' and 'z2', respectively.
+        Each key is a numpy array 1d having the same number of elements.
+    density : 1d-array
+        1d-array containing the density of each prism in kg/m^3.
+    fields : list of strings
+        Gravitational fields to be computed. The available fields are those
+        defined in function 'grav'.
+    scale : boolean
+        Defines if the resultant fields will be multiplied by the scale factors
+        defined in function 'grav'.
+    parallel : boolean
+        See function 'grav'.
+    nthreads : None or int
+        See function 'grav'.
+
+    Returns
+    -------
+    result : dictionary
+        Dictionary containing the gravitational fields generated by the prisms
+        at the computation points. The keys are the elements of 'fields'.
+
+    """
+
+    # Verify the input parameters
+    D = check.are_coordinates(coordinates)  # D = total number of data points
+    P = check.are_rectangular_prisms(prisms)  # P = total number of prisms
+    check.is_array(density, ndim=1, shape=(P,))
+    _check_threads(parallel, nthreads)
+
+    # Verify the fields
+    if type(fields) != list:
+        raise ValueError("fields must be a list")
+    if len(fields) == 0:
+        raise ValueError("fields must have at least one element")
+    for field in fields:
+        if field not in FIELDS:
+            raise ValueError(
+                "Gravitational field {} not recognized".format(field)
+            )
+
+    # integer codes of the fields and terms required to compute them
+    codes = np.array([FIELDS.index(field) for field in fields])
+    terms = _required_terms(fields)
+
+    # create the array to store the result
+    result = np.zeros((len(fields), D), dtype="float64")
+
+    # Compute gravitational fields
+    _run(
+        jit_grav_fields_parallel if parallel is True else jit_grav_fields,
+        nthreads,
+        _pack_coordinates(coordinates),
+        _pack_prisms(prisms),
+        density.astype("float64"),
+        codes,
+        terms,
+        result,
+    )
+
+    # multiply the computed fields by the corresponding scale factors
+    results = dict()
+    for field, values in zip(fields, result):
+        if scale is True:
+            values *= rp._grav_scale_factor(field)
+        results[field] = values
+
+    return results
+
+
+def mag(
+    coordinates,
+    prisms,
+    mx,
+    my,
+    mz,
+    field,
+    scale=True,
+    parallel=False,
+    nthreads=None,
+):
     """
     Magnetic scalar potential and magnetic induction components
     produced by right-rectangular prisms in Cartesian coordinates.
@@ -135,6 +247,10 @@ def mag(coordinates, prisms, mx, my, mz, field, scale=True):
        "constants.CM" (Magnetic constant),
        "constants.T2MT" (constant tranforming from Tesla to microtesla) or
        "constants.T2NT" (constant tranforming from Tesla to nanotesla)
+    parallel : boolean
+        See function 'grav'.
+    nthreads : None or int
+        See function 'grav'.
 
     Returns
     -------
@@ -149,125 +265,1213 @@ def mag(coordinates, prisms, mx, my, mz, field, scale=True):
     check.is_array(mx, ndim=1, shape=(P,))
     check.is_array(my, ndim=1, shape=(P,))
     check.is_array(mz, ndim=1, shape=(P,))
-
-    # Available fields
-    fields = {
-        "potential": {"x": kernel_dx, "y": kernel_dy, "z": kernel_dz},
-        "z": {"x": kernel_dxz, "y": kernel_dyz, "z": kernel_dzz},
-        "y": {"x": kernel_dxy, "y": kernel_dyy, "z": kernel_dyz},
-        "x": {"x": kernel_dxx, "y": kernel_dxy, "z": kernel_dxz},
-    }
+    _check_threads(parallel, nthreads)
 
     # Verify the field
-    if field not in fields:
+    if field not in MAG_FIELDS:
         raise ValueError("Magnetic field {} not recognized".format(field))
 
     # create the array to store the result
     result = np.zeros(D, dtype="float64")
 
     # Compute magnetic field
-    fieldx = fields[field]["x"]
-    fieldy = fields[field]["y"]
-    fieldz = fields[field]["z"]
-    jit_mag(coordinates, prisms, mx, my, mz, fieldx, fieldy, fieldz, result)
+    fieldx, fieldy, fieldz = [FIELDS.index(f) for f in MAG_FIELDS[field]]
+    _run(
+        jit_mag_parallel if parallel is True else jit_mag,
+        nthreads,
+        _pack_coordinates(coordinates),
+        _pack_prisms(prisms),
+        mx.astype("float64"),
+        my.astype("float64"),
+        mz.astype("float64"),
+        fieldx,
+        fieldy,
+        fieldz,
+        result,
+    )
 
     # multiply the computed field by the corresponding scale factors
     if scale is True:
         result *= cts.CM
         # Convert from T to nT
         if field in ["x", "y", "z"]:
-            result *= cts.T2NT
+            result *= cts.T2nanoT
         # Convert from T to uT and change sign
         if field == "potential":
-            result *= -cts.T2MT
+            result *= -cts.T2microT
+
+    return result
+
+
+def mag_tfa(
+    coordinates,
+    prisms,
+    mx,
+    my,
+    mz,
+    inc,
+    dec,
+    scale=True,
+    parallel=False,
+    nthreads=None,
+):
+    """
+    Total-field anomaly produced by right-rectangular prisms in Cartesian
+    coordinates. It is approximated by the projection of the magnetic
+    induction onto the direction of the main geomagnetic field.
+    All values are referred to a topocentric Cartesian system with axes
+    x, y and z pointing to north, east and down, respectively.
+
+    The projected induction is a combination of the six second derivatives of
+    the inverse distance kernel, with coefficients depending on the
+    magnetization of each prism and on the main-field direction. This
+    combination is computed by a single fused kernel that evaluates the three
+    logarithms and three arctangents only once per vertex, instead of
+    computing the x, y and z components separately with function 'mag'.
+
+    Parameters
+    ----------
+    coordinates : dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+        All coordinates should be in meters.
+    prisms : dictionary
+        Dictionary containing the x, y and z coordinates of the corners of each prism in prisms.
+        The corners south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2) of each
+        prism are arranged in the keys 'x1', 'x2', 'y1', 'y2', 'z1' and 'z2', respectively.
+        Each key is a numpy array 1d having the same number of elements.
+    mx, my, mz : numpy arrays 1d
+        Numpy arrays 1d containing the x, y and z total-magnetization components of the prisms in A/m.
+    inc, dec : scalars
+        Inclination and declination of the main geomagnetic field (in degrees).
+    scale : boolean
+       Defines if the resultant field will be multiplied by scale factors
+       "constants.CM" (Magnetic constant) and
+       "constants.T2NT" (constant tranforming from Tesla to nanotesla)
+    parallel : boolean
+        See function 'grav'.
+    nthreads : None or int
+        See function 'grav'.
+
+    Returns
+    -------
+    result : array
+        Total-field anomaly (in nT) generated by the prisms at the computation points.
+
+    """
+
+    # Verify the input parameters
+    D = check.are_coordinates(coordinates)  # D = total number of data points
+    P = check.are_rectangular_prisms(prisms)  # P = total number of prisms
+    check.is_array(mx, ndim=1, shape=(P,))
+    check.is_array(my, ndim=1, shape=(P,))
+    check.is_array(mz, ndim=1, shape=(P,))
+    check.is_scalar(x=inc, positive=False)
+    check.is_scalar(x=dec, positive=False)
+    _check_threads(parallel, nthreads)
+
+    # unit vector with the main-field direction
+    Fx, Fy, Fz = utils.unit_vector(inc, dec, check_input=False)
+
+    # coefficients of the second derivatives xx, xy, xz, yy, yz and zz
+    coefficients = np.stack(
+        [
+            Fx * mx,
+            Fx * my + Fy * mx,
+            Fx * mz + Fz * mx,
+            Fy * my,
+            Fy * mz + Fz * my,
+            Fz * mz,
+        ],
+        axis=1,
+    ).astype("float64")
+
+    # create the array to store the result
+    result = np.zeros(D, dtype="float64")
+
+    # Compute total-field anomaly
+    _run(
+        jit_mag_tfa_parallel if parallel is True else jit_mag_tfa,
+        nthreads,
+        _pack_coordinates(coordinates),
+        _pack_prisms(prisms),
+        coefficients,
+        result,
+    )
+
+    # multiply the computed field by the corresponding scale factors
+    if scale is True:
+        result *= cts.CM * cts.T2nanoT
 
     return result
 
 
-@njit
+def grav_tree(
+    coordinates,
+    prisms,
+    density,
+    field,
+    theta=0.5,
+    leaf_size=32,
+    scale=True,
+    parallel=False,
+    nthreads=None,
+):
+    """
+    Gravitational potential, first and second derivatives produced by
+    right-rectangular prisms in Cartesian coordinates computed with a
+    hierarchical (Barnes-Hut) algorithm.
+    All values are referred to a topocentric Cartesian system with axes
+    x, y and z pointing to north, east and down, respectively.
+
+    The prisms are grouped into the nodes of an octree (see module 'octree').
+    At each computation point, the tree is traversed from the root. A node
+    whose enclosing sphere has radius 'a' and whose centre lies at a distance
+    'r' from the computation point is accepted if a < theta r. In this case,
+    the effect of its prisms is approximated by the multipole expansion
+    (up to the quadrupole moments) of the inverse distance about the node
+    centre. Otherwise, the children of the node are visited. The prisms of the leaves that are not
+    accepted are computed with the closed-form formulas used by 'grav'.
+    The cost grows with D x log(P) instead of D x P for a fixed 'theta'.
+
+    Parameters
+    ----------
+    coordinates, prisms, density, field :
+        See function 'grav'.
+    theta : scalar
+        Accuracy parameter in the interval [0, 1). The relative error of the
+        multipole expansion of a node is of the order of theta³. Small
+        values increase the accuracy and the computation time. If theta is
+        zero, all prisms are computed with the closed-form formulas.
+        Default is 0.5.
+    leaf_size : int
+        Maximum number of prisms in the leaves of the octree. Default is 32.
+    scale, parallel, nthreads :
+        See function 'grav'.
+
+    Returns
+    -------
+    result : array
+        Gravitational field generated by the prisms at the computation points.
+
+    """
+
+    # Verify the input parameters
+    check.are_coordinates(coordinates)
+    P = check.are_rectangular_prisms(prisms)  # P = total number of prisms
+    check.is_array(density, ndim=1, shape=(P,))
+    _check_threads(parallel, nthreads)
+
+    # Verify the field
+    if field not in FIELDS:
+        raise ValueError("Gravitational field {} not recognized".format(field))
+
+    return PrismModel(prisms).grav_tree(
+        _pack_coordinates(coordinates),
+        density,
+        field,
+        theta=theta,
+        leaf_size=leaf_size,
+        scale=scale,
+        parallel=parallel,
+        nthreads=nthreads,
+    )
+
+
+# Gravitational fields in the order used to define their integer codes
+FIELDS = ["potential", "x", "y", "z", "xx", "xy", "xz", "yy", "yz", "zz"]
+
+# Gravitational fields combined with the x, y and z magnetization components
+# to compute each magnetic field
+MAG_FIELDS = {
+    "potential": ["x", "y", "z"],
+    "z": ["xz", "yz", "zz"],
+    "y": ["xy", "yy", "yz"],
+    "x": ["xx", "xy", "xz"],
+}
+
+# Logarithms and arctangents computed by function 'kernel_terms', in the
+# order of its output
+TERMS = ["log_x", "log_y", "log_z", "atan_x", "atan_y", "atan_z"]
+
+# Positions in TERMS of the logarithms and arctangents required by each
+# field, defined by the terms used by the numpy engine
+FIELDS_TERMS = {
+    field: [TERMS.index(term) for term in terms]
+    for field, terms in rp.kernels_terms.items()
+}
+
+
+class PrismModel:
+    """
+    Right-rectangular prisms validated and packed once for repeated
+    computations of gravitational and magnetic fields. The corners of the
+    prisms are stored in a C-contiguous float64 array, so that the methods
+    'grav' and 'mag' call the jitted functions without converting the model.
+    All values are referred to a topocentric Cartesian system with axes
+    x, y and z pointing to north, east and down, respectively.
+
+    Parameters
+    ----------
+    prisms : dictionary
+        Dictionary containing the x, y and z coordinates of the corners of each prism in prisms.
+        The corners south (x1), north (x2), west (y1), east (y2), top (z1) and bottom (z2) of each
+        prism are arranged in the keys 'x1', 'x2', 'y1', 'y2', 'z1' and 'z2', respectively.
+        Each key is a numpy array 1d having the same number of elements.
+
+    Attributes
+    ----------
+    prisms : numpy array 2d
+        P x 6 C-contiguous array whose columns are x1, x2, y1, y2, z1 and z2.
+    size : int
+        Total number of prisms P.
+    volumes : numpy array 1d
+        Volume of each prism in m³.
+    bounds : numpy array 1d
+        Bounding box of the model given by min x, max x, min y, max y,
+        min z and max z.
+    """
+
+    def __init__(self, prisms):
+        self.size = check.are_rectangular_prisms(prisms)
+        self.prisms = _pack_prisms(prisms)
+        self.volumes = (
+            (self.prisms[:, 1] - self.prisms[:, 0])
+            * (self.prisms[:, 3] - self.prisms[:, 2])
+            * (self.prisms[:, 5] - self.prisms[:, 4])
+        )
+        self.bounds = np.array(
+            [
+                self.prisms[:, 0].min(),
+                self.prisms[:, 1].max(),
+                self.prisms[:, 2].min(),
+                self.prisms[:, 3].max(),
+                self.prisms[:, 4].min(),
+                self.prisms[:, 5].max(),
+            ]
+        )
+        # octrees built by 'grav_tree' for each leaf size
+        self._trees = dict()
+
+    def grav(
+        self,
+        coordinates,
+        density,
+        field,
+        scale=True,
+        parallel=False,
+        nthreads=None,
+    ):
+        """
+        Gravitational potential, first and second derivatives produced
+        by the prisms. See function 'grav'.
+
+        Parameters
+        ----------
+        coordinates : numpy array 2d or dictionary
+            3 x D array (see function 'pack_coordinates') or dictionary
+            (see function 'grav') containing the coordinates of the
+            computation points. Arrays with C-contiguous float64 elements
+            are used without copies.
+        density : numpy array 1d
+            Density of each prism in kg / m³.
+        field, scale, parallel, nthreads :
+            See function 'grav'.
+
+        Returns
+        -------
+        result : array
+            Gravitational field generated by the prisms at the computation points.
+        """
+        coordinates = self._coordinates(coordinates)
+        density = self._property(density)
+        if field not in FIELDS:
+            raise ValueError(
+                "Gravitational field {} not recognized".format(field)
+            )
+        _check_threads(parallel, nthreads)
+
+        result = np.zeros(coordinates.shape[1], dtype="float64")
+        _run(
+            jit_grav_parallel if parallel is True else jit_grav,
+            nthreads,
+            coordinates,
+            self.prisms,
+            density,
+            FIELDS.index(field),
+            result,
+        )
+
+        if scale is True:
+            result *= rp._grav_scale_factor(field)
+
+        return result
+
+    def mag(
+        self,
+        coordinates,
+        mx,
+        my,
+        mz,
+        field,
+        scale=True,
+        parallel=False,
+        nthreads=None,
+    ):
+        """
+        Magnetic scalar potential and magnetic induction components produced
+        by the prisms. See function 'mag'.
+
+        Parameters
+        ----------
+        coordinates : numpy array 2d or dictionary
+            See method 'grav'.
+        mx, my, mz : numpy arrays 1d
+            x, y and z total-magnetization components of the prisms in A/m.
+        field, scale, parallel, nthreads :
+            See function 'mag'.
+
+        Returns
+        -------
+        result : array
+            Magnetic field generated by the prisms at the computation points.
+        """
+        coordinates = self._coordinates(coordinates)
+        mx = self._property(mx)
+        my = self._property(my)
+        mz = self._property(mz)
+        if field not in MAG_FIELDS:
+            raise ValueError("Magnetic field {} not recognized".format(field))
+        _check_threads(parallel, nthreads)
+
+        result = np.zeros(coordinates.shape[1], dtype="float64")
+        fieldx, fieldy, fieldz = [FIELDS.index(f) for f in MAG_FIELDS[field]]
+        _run(
+            jit_mag_parallel if parallel is True else jit_mag,
+            nthreads,
+            coordinates,
+            self.prisms,
+            mx,
+            my,
+            mz,
+            fieldx,
+            fieldy,
+            fieldz,
+            result,
+        )
+
+        if scale is True:
+            result *= cts.CM
+            # Convert from T to nT
+            if field in ["x", "y", "z"]:
+                result *= cts.T2nanoT
+            # Convert from T to uT and change sign
+            if field == "potential":
+                result *= -cts.T2microT
+
+        return result
+
+    def grav_tree(
+        self,
+        coordinates,
+        density,
+        field,
+        theta=0.5,
+        leaf_size=32,
+        scale=True,
+        parallel=False,
+        nthreads=None,
+    ):
+        """
+        Gravitational potential, first and second derivatives produced
+        by the prisms computed with a hierarchical (Barnes-Hut) algorithm.
+        See function 'grav_tree'. The octree is built at the first call
+        with a given 'leaf_size' and reused by the subsequent calls.
+
+        Parameters
+        ----------
+        coordinates, density :
+            See method 'grav'.
+        field, theta, leaf_size, scale, parallel, nthreads :
+            See function 'grav_tree'.
+
+        Returns
+        -------
+        result : array
+            Gravitational field generated by the prisms at the computation points.
+        """
+        coordinates = self._coordinates(coordinates)
+        density = self._property(density)
+        if field not in FIELDS:
+            raise ValueError(
+                "Gravitational field {} not recognized".format(field)
+            )
+        check.is_scalar(x=theta, positive=False)
+        if (theta < 0) or (theta >= 1):
+            raise ValueError("theta must be in the interval [0, 1)")
+        _check_threads(parallel, nthreads)
+
+        tree, prisms = self._tree(leaf_size)
+        # mass and second moments of each prism about its centre
+        masses = density * self.volumes
+        sides = self.prisms[:, 1::2] - self.prisms[:, 0::2]
+        source_moments = np.zeros((self.size, 10))
+        source_moments[:, 0] = masses
+        source_moments[:, [4, 7, 9]] = masses[:, np.newaxis] * sides**2 / 12
+        moments = octree.moments(tree, self._centers(), source_moments)
+
+        result = np.zeros(coordinates.shape[1], dtype="float64")
+        _run(
+            jit_grav_tree_parallel if parallel is True else jit_grav_tree,
+            nthreads,
+            coordinates,
+            prisms,
+            np.ascontiguousarray(density[tree["order"]]),
+            FIELDS.index(field),
+            tree["children"],
+            tree["start"],
+            tree["end"],
+            tree["center"],
+            tree["radius"],
+            moments,
+            float(theta),
+            7 * tree["depth"] + 1,
+            result,
+        )
+
+        if scale is True:
+            result *= rp._grav_scale_factor(field)
+
+        return result
+
+    def _tree(self, leaf_size):
+        """
+        Return the octree with leaves of size 'leaf_size' and the prisms
+        sorted according to it.
+        """
+        check.is_integer(x=leaf_size, positive=True)
+        if leaf_size not in self._trees:
+            prisms = self.prisms
+            radii = 0.5 * np.sqrt(
+                (prisms[:, 1] - prisms[:, 0]) ** 2
+                + (prisms[:, 3] - prisms[:, 2]) ** 2
+                + (prisms[:, 5] - prisms[:, 4]) ** 2
+            )
+            tree = octree.build(self._centers(), radii, leaf_size)
+            self._trees[leaf_size] = (
+                tree,
+                np.ascontiguousarray(prisms[tree["order"]]),
+            )
+        return self._trees[leaf_size]
+
+    def _centers(self):
+        """
+        Return the P x 3 array containing the centres of the prisms.
+        """
+        return 0.5 * (self.prisms[:, 0::2] + self.prisms[:, 1::2])
+
+    def _coordinates(self, coordinates):
+        """
+        Return the coordinates as a 3 x D C-contiguous float64 array.
+        """
+        if type(coordinates) == dict:
+            return pack_coordinates(coordinates)
+        check.is_array(coordinates, ndim=2)
+        if coordinates.shape[0] != 3:
+            raise ValueError("coordinates must have 3 rows")
+        return np.ascontiguousarray(coordinates, dtype="float64")
+
+    def _property(self, sigma):
+        """
+        Return the physical property as a C-contiguous float64 array.
+        """
+        check.is_array(sigma, ndim=1, shape=(self.size,))
+        return np.ascontiguousarray(sigma, dtype="float64")
+
+
+def pack_coordinates(coordinates):
+    """
+    Validate the coordinates of the computation points and pack them into
+    the array used by the jitted functions.
+
+    Parameters
+    ----------
+    coordinates : dictionary
+        Dictionary containing the x, y and z coordinates at the keys 'x', 'y' and 'z',
+        respectively. Each key is a numpy array 1d having the same number of elements.
+
+    Returns
+    -------
+    coordinates : numpy array 2d
+        3 x D C-contiguous float64 array whose rows contain the x, y and z
+        coordinates.
+    """
+    check.are_coordinates(coordinates)
+    return _pack_coordinates(coordinates)
+
+
+def warmup(parallel=True):
+    """
+    Compile all jitted functions used by 'grav', 'grav_fields', 'mag',
+    'mag_tfa' and 'grav_tree' with the explicit signatures defined in '_signatures'.
+
+    All jitted functions are defined with 'cache=True', so that the compiled
+    code is stored on disk (in the '__pycache__' directory of this module or,
+    if it is not writable, in the directory defined by the environment variable
+    'NUMBA_CACHE_DIR') and loaded by new processes instead of being
+    recompiled. Hence, calling this function once (e.g., after installing
+    the package, with 'make cache') removes the compilation time from the
+    first call of the functions above in all subsequent processes.
+
+    Parameters
+    ----------
+    parallel : boolean
+        If True, also compile the functions used when 'parallel' is True.
+        Default is True.
+    """
+    if parallel not in [True, False]:
+        raise ValueError("invalid parameter parallel ({})".format(parallel))
+    for function, signature in _signatures(parallel):
+        function.compile(signature)
+
+
+def _signatures(parallel=True):
+    """
+    Return the pairs of jitted functions and signatures compiled by 'warmup'.
+    The arrays follow the layout created by '_pack_coordinates' and
+    '_pack_prisms'.
+    """
+    f8 = "float64"
+    vertices = "float64, float64, float64"
+    coordinates = "float64[:, ::1]"
+    prisms = "float64[:, ::1]"
+    vector = "float64[::1]"
+    matrix = "float64[:, ::1]"
+    grav = "void({}, {}, {}, int64, {})".format(
+        coordinates, prisms, vector, vector
+    )
+    mag = "void({0}, {1}, {2}, {2}, {2}, int64, int64, int64, {2})".format(
+        coordinates, prisms, vector
+    )
+    mag_tfa = "void({}, {}, {}, {})".format(coordinates, prisms, matrix, vector)
+    grav_fields = "void({}, {}, {}, int64[::1], boolean[::1], {})".format(
+        coordinates, prisms, vector, matrix
+    )
+    grav_tree = (
+        "void({0}, {1}, {2}, int64, int64[:, ::1], int64[::1], int64[::1], "
+        "{3}, {2}, {3}, float64, int64, {2})"
+    ).format(coordinates, prisms, vector, matrix)
+    signatures = [
+        (utils.safe_log_entrywise, "{0}({0})".format(f8)),
+        (utils.safe_atan2_entrywise, "{0}({0}, {0})".format(f8)),
+        (kernel_inverse_r, "{}({})".format(f8, vertices)),
+        (kernel_dx, "{}({})".format(f8, vertices)),
+        (kernel_dy, "{}({})".format(f8, vertices)),
+        (kernel_dz, "{}({})".format(f8, vertices)),
+        (kernel_dxx, "{}({})".format(f8, vertices)),
+        (kernel_dxy, "{}({})".format(f8, vertices)),
+        (kernel_dxz, "{}({})".format(f8, vertices)),
+        (kernel_dyy, "{}({})".format(f8, vertices)),
+        (kernel_dyz, "{}({})".format(f8, vertices)),
+        (kernel_dzz, "{}({})".format(f8, vertices)),
+        (kernel, "{}(int64, {})".format(f8, vertices)),
+        (prism_sum, "{0}(int64, {0}, {0}, {0}, {0}, {0}, {0})".format(f8)),
+        (
+            kernel_tfa,
+            "{0}({1}, {0}, {0}, {0}, {0}, {0}, {0})".format(f8, vertices),
+        ),
+        (
+            kernel_terms,
+            "UniTuple({}, 6)({}, boolean[::1])".format(f8, vertices),
+        ),
+        (
+            kernel_from_terms,
+            "{0}(int64, {1}, {0}, {0}, {0}, {0}, {0}, {0})".format(
+                f8, vertices
+            ),
+        ),
+        (jit_grav, grav),
+        (jit_mag, mag),
+        (jit_mag_tfa, mag_tfa),
+        (jit_grav_fields, grav_fields),
+        (
+            octree.kernel_multipole,
+            "{}(int64, {}, {}[::1])".format(f8, vertices, f8),
+        ),
+        (jit_grav_tree, grav_tree),
+    ]
+    if parallel is True:
+        signatures += [
+            (jit_grav_parallel, grav),
+            (jit_mag_parallel, mag),
+            (jit_mag_tfa_parallel, mag_tfa),
+            (jit_grav_fields_parallel, grav_fields),
+            (jit_grav_tree_parallel, grav_tree),
+        ]
+    return signatures
+
+
+def _required_terms(fields):
+    """
+    Boolean array defining the logarithms and arctangents required
+    to compute all fields.
+    """
+    terms = np.zeros(6, dtype=np.bool_)
+    for field in fields:
+        terms[FIELDS_TERMS[field]] = True
+    return terms
+
+
+def _check_threads(parallel, nthreads):
+    """
+    Check the parameters controlling the parallel computation.
+    """
+    if parallel not in [True, False]:
+        raise ValueError("invalid parameter parallel ({})".format(parallel))
+    if nthreads is not None:
+        check.is_integer(x=nthreads, positive=True)
+        if nthreads > numba.config.NUMBA_NUM_THREADS:
+            raise ValueError(
+                "nthreads ({}) must not exceed the number of threads "
+                "available to numba ({})".format(
+                    nthreads, numba.config.NUMBA_NUM_THREADS
+                )
+            )
+
+
+def _run(jit_function, nthreads, *args):
+    """
+    Call a jitted function with the given arguments by using 'nthreads' threads.
+    The number of threads previously set in numba is restored at the end.
+    """
+    if nthreads is None:
+        jit_function(*args)
+    else:
+        previous_nthreads = numba.get_num_threads()
+        numba.set_num_threads(nthreads)
+        try:
+            jit_function(*args)
+        finally:
+            numba.set_num_threads(previous_nthreads)
+
+
+def _pack_coordinates(coordinates):
+    """
+    Arrange the coordinates of the computation points along
+    the rows of a C-contiguous 2d-array with shape (3, D).
+    """
+    return np.ascontiguousarray(
+        np.vstack([coordinates["x"], coordinates["y"], coordinates["z"]]),
+        dtype="float64",
+    )
+
+
+def _pack_prisms(prisms):
+    """
+    Arrange the corners of the prisms along the columns of a
+    C-contiguous 2d-array with shape (P, 6).
+    """
+    return np.ascontiguousarray(
+        np.stack(
+            [
+                prisms["x1"],
+                prisms["x2"],
+                prisms["y1"],
+                prisms["y2"],
+                prisms["z1"],
+                prisms["z2"],
+            ],
+            axis=1,
+        ),
+        dtype="float64",
+    )
+
+
+@njit(cache=True)
 def jit_grav(coordinates, prisms, density, field, out):
     """
     Compute the gravitational field at the points in 'coordinates'
     """
     # Iterate over computation points
     for l in range(coordinates[0].size):
-        # Iterate over prisms
-        for p in range(prisms.shape[0]):
-            # Change coordinates
-            X1 = prisms[p, 0] - coordinates[0, l]
-            X2 = prisms[p, 1] - coordinates[0, l]
-            Y1 = prisms[p, 2] - coordinates[1, l]
-            Y2 = prisms[p, 3] - coordinates[1, l]
-            Z1 = prisms[p, 4] - coordinates[2, l]
-            Z2 = prisms[p, 5] - coordinates[2, l]
-            # Compute the field
-            out[l] += density[p] * (
-                field(X2, Y2, Z2)
-                - field(X2, Y2, Z1)
-                - field(X1, Y2, Z2)
-                + field(X1, Y2, Z1)
-                - field(X2, Y1, Z2)
-                + field(X2, Y1, Z1)
-                + field(X1, Y1, Z2)
-                - field(X1, Y1, Z1)
-            )
+        _grav_point(l, coordinates, prisms, density, field, out)
+
+
+@njit(parallel=True, cache=True)
+def jit_grav_parallel(coordinates, prisms, density, field, out):
+    """
+    Compute the gravitational field at the points in 'coordinates'
+    by distributing the computation points among multiple threads
+    """
+    # Iterate over computation points
+    for l in prange(coordinates[0].size):
+        _grav_point(l, coordinates, prisms, density, field, out)
 
 
-@njit
+@njit(cache=True)
+def _grav_point(l, coordinates, prisms, density, field, out):
+    """
+    Compute the gravitational field at the l-th computation point
+    """
+    # Iterate over prisms
+    for p in range(prisms.shape[0]):
+        # Change coordinates
+        X1 = prisms[p, 0] - coordinates[0, l]
+        X2 = prisms[p, 1] - coordinates[0, l]
+        Y1 = prisms[p, 2] - coordinates[1, l]
+        Y2 = prisms[p, 3] - coordinates[1, l]
+        Z1 = prisms[p, 4] - coordinates[2, l]
+        Z2 = prisms[p, 5] - coordinates[2, l]
+        # Compute the field
+        out[l] += density[p] * prism_sum(field, X1, X2, Y1, Y2, Z1, Z2)
+
+
+@njit(cache=True)
 def jit_mag(coordinates, prisms, mx, my, mz, fieldx, fieldy, fieldz, out):
     """
     Compute the magnetic field at the points in 'coordinates'
     """
     # Iterate over computation points
     for l in range(coordinates[0].size):
-        # Iterate over prisms
-        for p in range(prisms.shape[0]):
-            # Change coordinates
-            X1 = prisms[p, 0] - coordinates[0, l]
-            X2 = prisms[p, 1] - coordinates[0, l]
-            Y1 = prisms[p, 2] - coordinates[1, l]
-            Y2 = prisms[p, 3] - coordinates[1, l]
-            Z1 = prisms[p, 4] - coordinates[2, l]
-            Z2 = prisms[p, 5] - coordinates[2, l]
-            # Compute the field component x
-            out[l] += mx[p] * (
-                fieldx(X2, Y2, Z2)
-                - fieldx(X2, Y2, Z1)
-                - fieldx(X1, Y2, Z2)
-                + fieldx(X1, Y2, Z1)
-                - fieldx(X2, Y1, Z2)
-                + fieldx(X2, Y1, Z1)
-                + fieldx(X1, Y1, Z2)
-                - fieldx(X1, Y1, Z1)
-            )
-            # Compute the field component y
-            out[l] += my[p] * (
-                fieldy(X2, Y2, Z2)
-                - fieldy(X2, Y2, Z1)
-                - fieldy(X1, Y2, Z2)
-                + fieldy(X1, Y2, Z1)
-                - fieldy(X2, Y1, Z2)
-                + fieldy(X2, Y1, Z1)
-                + fieldy(X1, Y1, Z2)
-                - fieldy(X1, Y1, Z1)
-            )
-            # Compute the field component z
-            out[l] += mz[p] * (
-                fieldz(X2, Y2, Z2)
-                - fieldz(X2, Y2, Z1)
-                - fieldz(X1, Y2, Z2)
-                + fieldz(X1, Y2, Z1)
-                - fieldz(X2, Y1, Z2)
-                + fieldz(X2, Y1, Z1)
-                + fieldz(X1, Y1, Z2)
-                - fieldz(X1, Y1, Z1)
+        _mag_point(
+            l, coordinates, prisms, mx, my, mz, fieldx, fieldy, fieldz, out
+        )
+
+
+@njit(parallel=True, cache=True)
+def jit_mag_parallel(
+    coordinates, prisms, mx, my, mz, fieldx, fieldy, fieldz, out
+):
+    """
+    Compute the magnetic field at the points in 'coordinates'
+    by distributing the computation points among multiple threads
+    """
+    # Iterate over computation points
+    for l in prange(coordinates[0].size):
+        _mag_point(
+            l, coordinates, prisms, mx, my, mz, fieldx, fieldy, fieldz, out
+        )
+
+
+@njit(cache=True)
+def _mag_point(l, coordinates, prisms, mx, my, mz, fieldx, fieldy, fieldz, out):
+    """
+    Compute the magnetic field at the l-th computation point
+    """
+    # Iterate over prisms
+    for p in range(prisms.shape[0]):
+        # Change coordinates
+        X1 = prisms[p, 0] - coordinates[0, l]
+        X2 = prisms[p, 1] - coordinates[0, l]
+        Y1 = prisms[p, 2] - coordinates[1, l]
+        Y2 = prisms[p, 3] - coordinates[1, l]
+        Z1 = prisms[p, 4] - coordinates[2, l]
+        Z2 = prisms[p, 5] - coordinates[2, l]
+        # Compute the field component x
+        out[l] += mx[p] * prism_sum(fieldx, X1, X2, Y1, Y2, Z1, Z2)
+        # Compute the field component y
+        out[l] += my[p] * prism_sum(fieldy, X1, X2, Y1, Y2, Z1, Z2)
+        # Compute the field component z
+        out[l] += mz[p] * prism_sum(fieldz, X1, X2, Y1, Y2, Z1, Z2)
+
+
+@njit(cache=True)
+def jit_mag_tfa(coordinates, prisms, coefficients, out):
+    """
+    Compute the total-field anomaly at the points in 'coordinates'
+    """
+    # Iterate over computation points
+    for l in range(coordinates[0].size):
+        _mag_tfa_point(l, coordinates, prisms, coefficients, out)
+
+
+@njit(parallel=True, cache=True)
+def jit_mag_tfa_parallel(coordinates, prisms, coefficients, out):
+    """
+    Compute the total-field anomaly at the points in 'coordinates'
+    by distributing the computation points among multiple threads
+    """
+    # Iterate over computation points
+    for l in prange(coordinates[0].size):
+        _mag_tfa_point(l, coordinates, prisms, coefficients, out)
+
+
+@njit(cache=True)
+def _mag_tfa_point(l, coordinates, prisms, coefficients, out):
+    """
+    Compute the total-field anomaly at the l-th computation point
+    """
+    # Iterate over prisms
+    for p in range(prisms.shape[0]):
+        # Iterate over vertices
+        for i in range(2):
+            X = prisms[p, i] - coordinates[0, l]
+            for j in range(2):
+                Y = prisms[p, 2 + j] - coordinates[1, l]
+                for k in range(2):
+                    Z = prisms[p, 4 + k] - coordinates[2, l]
+                    # vertex (X2, Y2, Z2) has positive sign
+                    if (i + j + k) % 2 == 1:
+                        sign = 1.0
+                    else:
+                        sign = -1.0
+                    out[l] += sign * kernel_tfa(
+                        X,
+                        Y,
+                        Z,
+                        coefficients[p, 0],
+                        coefficients[p, 1],
+                        coefficients[p, 2],
+                        coefficients[p, 3],
+                        coefficients[p, 4],
+                        coefficients[p, 5],
+                    )
+
+
+@njit(cache=True)
+def jit_grav_tree(
+    coordinates,
+    prisms,
+    density,
+    field,
+    children,
+    start,
+    end,
+    center,
+    radius,
+    moments,
+    theta,
+    stack_size,
+    out,
+):
+    """
+    Compute the gravitational field at the points in 'coordinates'
+    by traversing the octree of the prisms
+    """
+    # Iterate over computation points
+    for l in range(coordinates[0].size):
+        _grav_tree_point(
+            l,
+            coordinates,
+            prisms,
+            density,
+            field,
+            children,
+            start,
+            end,
+            center,
+            radius,
+            moments,
+            theta,
+            stack_size,
+            out,
+        )
+
+
+@njit(parallel=True, cache=True)
+def jit_grav_tree_parallel(
+    coordinates,
+    prisms,
+    density,
+    field,
+    children,
+    start,
+    end,
+    center,
+    radius,
+    moments,
+    theta,
+    stack_size,
+    out,
+):
+    """
+    Compute the gravitational field at the points in 'coordinates'
+    by traversing the octree of the prisms and distributing the
+    computation points among multiple threads
+    """
+    # Iterate over computation points
+    for l in prange(coordinates[0].size):
+        _grav_tree_point(
+            l,
+            coordinates,
+            prisms,
+            density,
+            field,
+            children,
+            start,
+            end,
+            center,
+            radius,
+            moments,
+            theta,
+            stack_size,
+            out,
+        )
+
+
+@njit(cache=True)
+def _grav_tree_point(
+    l,
+    coordinates,
+    prisms,
+    density,
+    field,
+    children,
+    start,
+    end,
+    center,
+    radius,
+    moments,
+    theta,
+    stack_size,
+    out,
+):
+    """
+    Compute the gravitational field at the l-th computation point
+    by traversing the octree of the prisms
+    """
+    x = coordinates[0, l]
+    y = coordinates[1, l]
+    z = coordinates[2, l]
+    # nodes to be visited, starting at the root
+    stack = np.empty(stack_size, dtype=np.int64)
+    stack[0] = 0
+    top = 1
+    while top > 0:
+        top -= 1
+        node = stack[top]
+        distance2 = (
+            (center[node, 0] - x) ** 2
+            + (center[node, 1] - y) ** 2
+            + (center[node, 2] - z) ** 2
+        )
+        if radius[node] ** 2 < theta**2 * distance2:
+            # far node: multipole expansion about its centre
+            out[l] += octree.kernel_multipole(
+                field,
+                center[node, 0] - x,
+                center[node, 1] - y,
+                center[node, 2] - z,
+                moments[node],
             )
+        elif children[node, 0] == -1:
+            # near leaf: closed-form formulas
+            for p in range(start[node], end[node]):
+                out[l] += density[p] * prism_sum(
+                    field,
+                    prisms[p, 0] - x,
+                    prisms[p, 1] - x,
+                    prisms[p, 2] - y,
+                    prisms[p, 3] - y,
+                    prisms[p, 4] - z,
+                    prisms[p, 5] - z,
+                )
+        else:
+            for k in range(8):
+                if children[node, k] == -1:
+                    break
+                stack[top] = children[node, k]
+                top += 1
+
+
+@njit(cache=True)
+def prism_sum(field, X1, X2, Y1, Y2, Z1, Z2):
+    """
+    Sum of the kernel defined by the integer 'field' (see 'FIELDS')
+    evaluated at the vertices of a prism
+    """
+    result = (
+        kernel(field, X2, Y2, Z2)
+        - kernel(field, X2, Y2, Z1)
+        - kernel(field, X1, Y2, Z2)
+        + kernel(field, X1, Y2, Z1)
+        - kernel(field, X2, Y1, Z2)
+        + kernel(field, X2, Y1, Z1)
+        + kernel(field, X1, Y1, Z2)
+        - kernel(field, X1, Y1, Z1)
+    )
+    return result
+
+
+@njit(cache=True)
+def jit_grav_fields(coordinates, prisms, density, codes, terms, out):
+    """
+    Compute several gravitational fields at the points in 'coordinates'
+    by sharing the logarithms and arctangents computed at each vertex
+    """
+    # auxiliary array storing the contribution of a single prism
+    aux = np.zeros(codes.size)
+    # Iterate over computation points
+    for l in range(coordinates[0].size):
+        _grav_fields_point(
+            l, coordinates, prisms, density, codes, terms, out, aux
+        )
+
+
+@njit(parallel=True, cache=True)
+def jit_grav_fields_parallel(coordinates, prisms, density, codes, terms, out):
+    """
+    Compute several gravitational fields at the points in 'coordinates'
+    by sharing the logarithms and arctangents computed at each vertex and
+    distributing the computation points among multiple threads
+    """
+    # Iterate over computation points
+    for l in prange(coordinates[0].size):
+        # auxiliary array storing the contribution of a single prism
+        aux = np.zeros(codes.size)
+        _grav_fields_point(
+            l, coordinates, prisms, density, codes, terms, out, aux
+        )
+
+
+@njit(cache=True)
+def _grav_fields_point(l, coordinates, prisms, density, codes, terms, out, aux):
+    """
+    Compute several gravitational fields at the l-th computation point
+    """
+    nfields = codes.size
+    # Iterate over prisms
+    for p in range(prisms.shape[0]):
+        aux[:] = 0.0
+        # Iterate over vertices
+        for i in range(2):
+            X = prisms[p, i] - coordinates[0, l]
+            for j in range(2):
+                Y = prisms[p, 2 + j] - coordinates[1, l]
+                for k in range(2):
+                    Z = prisms[p, 4 + k] - coordinates[2, l]
+                    # vertex (X2, Y2, Z2) has positive sign
+                    if (i + j + k) % 2 == 1:
+                        sign = 1.0
+                    else:
+                        sign = -1.0
+                    log_x, log_y, log_z, atan_x, atan_y, atan_z = kernel_terms(
+                        X, Y, Z, terms
+                    )
+                    for f in range(nfields):
+                        aux[f] += sign * kernel_from_terms(
+                            codes[f],
+                            X,
+                            Y,
+                            Z,
+                            log_x,
+                            log_y,
+                            log_z,
+                            atan_x,
+                            atan_y,
+                            atan_z,
+                        )
+        for f in range(nfields):
+            out[f, l] += density[p] * aux[f]
 
 
 # kernels
 
 
-@njit
+@njit(cache=True)
+def kernel_terms(X, Y, Z, terms):
+    """
+    Function for computing the logarithms and arctangents shared by the kernels.
+    Only the terms flagged in the boolean array 'terms' are computed; the
+    remaining ones are set to zero.
+    """
+    R = np.sqrt(X**2 + Y**2 + Z**2)
+    log_x = utils.safe_log_entrywise(X + R) if terms[0] else 0.0
+    log_y = utils.safe_log_entrywise(Y + R) if terms[1] else 0.0
+    log_z = utils.safe_log_entrywise(Z + R) if terms[2] else 0.0
+    atan_x = utils.safe_atan2_entrywise(Y * Z, X * R) if terms[3] else 0.0
+    atan_y = utils.safe_atan2_entrywise(X * Z, Y * R) if terms[4] else 0.0
+    atan_z = utils.safe_atan2_entrywise(Y * X, Z * R) if terms[5] else 0.0
+    return log_x, log_y, log_z, atan_x, atan_y, atan_z
+
+
+@njit(cache=True)
+def kernel_from_terms(
+    code, X, Y, Z, log_x, log_y, log_z, atan_x, atan_y, atan_z
+):
+    """
+    Function for computing the kernel defined by the integer 'code'
+    (see 'FIELDS') from the logarithms and arctangents computed
+    with 'kernel_terms'.
+    """
+    if code == 0:  # potential
+        result = (
+            Y * X * log_z
+            + X * Z * log_y
+            + Y * Z * log_x
+            - 0.5 * Y**2 * atan_y
+            - 0.5 * X**2 * atan_x
+            - 0.5 * Z**2 * atan_z
+        )
+    elif code == 1:  # x
+        result = -(Y * log_z + Z * log_y - X * atan_x)
+    elif code == 2:  # y
+        result = -(X * log_z + Z * log_x - Y * atan_y)
+    elif code == 3:  # z
+        result = -(Y * log_x + X * log_y - Z * atan_z)
+    elif code == 4:  # xx
+        result = -atan_x
+    elif code == 5:  # xy
+        result = log_z
+    elif code == 6:  # xz
+        result = log_y
+    elif code == 7:  # yy
+        result = -atan_y
+    elif code == 8:  # yz
+        result = log_x
+    else:  # zz
+        result = -atan_z
+    return result
+
+
+@njit(cache=True)
+def kernel_tfa(X, Y, Z, cxx, cxy, cxz, cyy, cyz, czz):
+    """
+    Function for computing the combination of the second derivatives of
+    inverse distance kernel with coefficients cxx, cxy, cxz, cyy, cyz and czz
+    """
+    R = np.sqrt(X**2 + Y**2 + Z**2)
+    result = (
+        -cxx * utils.safe_atan2_entrywise(Y * Z, X * R)
+        + cxy * utils.safe_log_entrywise(Z + R)
+        + cxz * utils.safe_log_entrywise(Y + R)
+        - cyy * utils.safe_atan2_entrywise(X * Z, Y * R)
+        + cyz * utils.safe_log_entrywise(X + R)
+        - czz * utils.safe_atan2_entrywise(Y * X, Z * R)
+    )
+    return result
+
+
+@njit(cache=True)
+def kernel(code, X, Y, Z):
+    """
+    Function for computing the kernel defined by the integer 'code'
+    (see 'FIELDS')
+    """
+    if code == 0:  # potential
+        result = kernel_inverse_r(X, Y, Z)
+    elif code == 1:  # x
+        result = kernel_dx(X, Y, Z)
+    elif code == 2:  # y
+        result = kernel_dy(X, Y, Z)
+    elif code == 3:  # z
+        result = kernel_dz(X, Y, Z)
+    elif code == 4:  # xx
+        result = kernel_dxx(X, Y, Z)
+    elif code == 5:  # xy
+        result = kernel_dxy(X, Y, Z)
+    elif code == 6:  # xz
+        result = kernel_dxz(X, Y, Z)
+    elif code == 7:  # yy
+        result = kernel_dyy(X, Y, Z)
+    elif code == 8:  # yz
+        result = kernel_dyz(X, Y, Z)
+    else:  # zz
+        result = kernel_dzz(X, Y, Z)
+    return result
+
+
+@njit(cache=True)
 def kernel_inverse_r(X, Y, Z):
     """
     Function for computing the inverse distance kernel
@@ -284,7 +1488,7 @@ def kernel_inverse_r(X, Y, Z):
     return result
 
 
-@njit
+@njit(cache=True)
 def kernel_dz(X, Y, Z):
     """
     Function for computing the z-derivative of inverse distance kernel
@@ -298,7 +1502,7 @@ def kernel_dz(X, Y, Z):
     return result
 
 
-@njit
+@njit(cache=True)
 def kernel_dy(X, Y, Z):
     """
     Function for computing the y-derivative of inverse distance kernel
@@ -312,7 +1516,7 @@ def kernel_dy(X, Y, Z):
     return result
 
 
-@njit
+@njit(cache=True)
 def kernel_dx(X, Y, Z):
     """
     Function for computing the x-derivative of inverse distance kernel
@@ -326,7 +1530,7 @@ def kernel_dx(X, Y, Z):
     return result
 
 
-@njit
+@njit(cache=True)
 def kernel_dzz(X, Y, Z):
     """
     Function for computing the zz-derivative of inverse distance kernel
@@ -336,7 +1540,7 @@ def kernel_dzz(X, Y, Z):
     return result
 
 
-@njit
+@njit(cache=True)
 def kernel_dyz(X, Y, Z):
     """
     Function for computing the yz-derivative of inverse distance kernel
@@ -346,7 +1550,7 @@ def kernel_dyz(X, Y, Z):
     return result
 
 
-@njit
+@njit(cache=True)
 def kernel_dxz(X, Y, Z):
     """
     Function for computing the xz-derivative of inverse distance kernel
@@ -356,7 +1560,7 @@ def kernel_dxz(X, Y, Z):
     return result
 
 
-@njit
+@njit(cache=True)
 def kernel_dyy(X, Y, Z):
     """
     Function for computing the yy-derivative of inverse distance kernel
@@ -366,7 +1570,7 @@ def kernel_dyy(X, Y, Z):
     return result
 
 
-@njit
+@njit(cache=True)
 def kernel_dxy(X, Y, Z):
     """
     Function for computing the xy-derivative of inverse distance kernel
@@ -376,7 +1580,7 @@ def kernel_dxy(X, Y, Z):
     return result
 
 
-@njit
+@njit(cache=True)
 def kernel_dxx(X, Y, Z):
     """
     Function for computing the xx-derivative of inverse distance kernel
@@ -384,3 +1588,8 @@ def kernel_dxx(X, Y, Z):
     R = np.sqrt(X**2 + Y**2 + Z**2)
     result = -utils.safe_atan2_entrywise(Y * Z, X * R)
     return result
+
+
+if __name__ == "__main__":
+    # build the on-disk cache of compiled functions
+    warmup()
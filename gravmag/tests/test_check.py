@@ -616,6 +616,18 @@ def test_array_wrong_ndim_shape():
         check.is_array(x=y, ndim=2, shape=(2, 2))
 
 
+def test_array_tuple_of_ndims():
+    "Check that ndim may be a tuple of allowed dimensions"
+    check.is_array(x=np.ones(3), ndim=(1, 2))
+    check.is_array(x=np.ones((3, 2)), ndim=(1, 2), shape=(3, 2))
+    # wrong ndim
+    with pytest.raises(ValueError):
+        check.is_array(x=np.ones((3, 2, 2)), ndim=(1, 2))
+    # wrong shape
+    with pytest.raises(ValueError):
+        check.is_array(x=np.ones((3, 2)), ndim=(1, 2), shape=(3,))
+
+
 ##### is_area
 
 
@@ -1314,3 +1314,255 @@ def test_product_BCCB_vector_compare_transposed():
         eigenvalues=np.conj(L), ordering="column", v=v
     )
     aae(w_conv_col, w_matvec, decimal=12)
+
+
+def _generic_BTTB():
+    "metadata of a generic BTTB with 6 blocks of 5 x 5 elements"
+    np.random.seed(11)
+    BTTB = {
+        "ordering": "xy",
+        "symmetry_structure": "gene",
+        "symmetry_blocks": "gene",
+        "nblocks": 6,
+        "columns": np.random.rand(11, 5),
+        "rows": np.random.rand(11, 4),
+    }
+    return BTTB
+
+
+def test_eigenvalues_BCCB_rfft_half_spectrum():
+    "verify that rfft=True returns the first half columns of the eigenvalues"
+    BTTB = _generic_BTTB()
+    for ordering in ["row", "column"]:
+        L = cv.eigenvalues_BCCB(BTTB_metadata=BTTB, ordering=ordering)
+        L_half = cv.eigenvalues_BCCB(
+            BTTB_metadata=BTTB, ordering=ordering, rfft=True
+        )
+        ae(L_half.shape, (L.shape[0], L.shape[1] // 2 + 1))
+        aae(L_half, L[:, : L.shape[1] // 2 + 1], decimal=12)
+    with raises(ValueError):
+        cv.eigenvalues_BCCB(BTTB_metadata=BTTB, rfft="True")
+
+
+def test_product_BCCB_vector_rfft_compare_matrix_vector():
+    "compare the rfft products with the BTTB and transposed BTTB products"
+    BTTB = _generic_BTTB()
+    BTTB_matrix = cv.BTTB_from_metadata(BTTB_metadata=BTTB)
+    np.random.seed(3)
+    v = np.random.rand(30)
+    for ordering in ["row", "column"]:
+        L = cv.eigenvalues_BCCB(
+            BTTB_metadata=BTTB, ordering=ordering, rfft=True
+        )
+        w = cv.product_BCCB_vector(
+            eigenvalues=L, ordering=ordering, v=v, rfft=True
+        )
+        aae(w, BTTB_matrix @ v, decimal=12)
+        w = cv.product_BCCB_vector(
+            eigenvalues=np.conj(L), ordering=ordering, v=v, rfft=True
+        )
+        aae(w, BTTB_matrix.T @ v, decimal=12)
+    # full spectrum used as half spectrum
+    L = cv.eigenvalues_BCCB(BTTB_metadata=BTTB, ordering="row")
+    with raises(ValueError):
+        cv.product_BCCB_vector(eigenvalues=L, ordering="row", v=v, rfft=True)
+    with raises(ValueError):
+        cv.product_BCCB_vector(eigenvalues=L, ordering="row", v=v, rfft=1)
+
+
+##### ProductBCCB
+
+
+def test_ProductBCCB_compare_product_BCCB_vector():
+    "compare the reusable products with the BTTB and transposed BTTB products"
+    BTTB = _generic_BTTB()
+    BTTB_matrix = cv.BTTB_from_metadata(BTTB_metadata=BTTB)
+    np.random.seed(8)
+    for ordering in ["row", "column"]:
+        for rfft in [False, True]:
+            L = cv.eigenvalues_BCCB(
+                BTTB_metadata=BTTB, ordering=ordering, rfft=rfft
+            )
+            product = cv.ProductBCCB(
+                eigenvalues=L, ordering=ordering, rfft=rfft, workers=2
+            )
+            out = np.empty(30)
+            # repeated products reuse the workspace
+            for repeat in range(3):
+                v = np.random.rand(30)
+                w = product(v, out=out)
+                assert w is out
+                aae(w, BTTB_matrix @ v, decimal=12)
+                aae(
+                    w,
+                    cv.product_BCCB_vector(L, ordering, v, rfft=rfft),
+                    decimal=12,
+                )
+                aae(product(v, transpose=True), BTTB_matrix.T @ v, decimal=12)
+
+
+def test_ProductBCCB_invalid_input():
+    "must raise ValueError for invalid parameters"
+    L = np.ones((8, 6), dtype=complex)
+    for ordering in ["invalid-ordering", "ROW"]:
+        with raises(ValueError):
+            cv.ProductBCCB(eigenvalues=L, ordering=ordering)
+    with raises(ValueError):
+        cv.ProductBCCB(eigenvalues=np.ones(48), ordering="row")
+    with raises(ValueError):
+        cv.ProductBCCB(eigenvalues=L, ordering="row", rfft="no")
+    for workers in [0, 2.0]:
+        with raises(ValueError):
+            cv.ProductBCCB(eigenvalues=L, ordering="row", workers=workers)
+    product = cv.ProductBCCB(eigenvalues=L, ordering="row")
+    for v in [np.ones(13), np.ones((4, 3)), 3.0]:
+        with raises(ValueError):
+            product(v)
+    for out in [np.ones(13), np.ones(12, dtype=int), np.ones((4, 3))]:
+        with raises(ValueError):
+            product(np.ones(12), out=out)
+    with raises(ValueError):
+        product(np.ones(12), transpose="yes")
+
+
+def test_product_BCCB_vector_batched():
+    "compare the batched products with the products computed one at a time"
+    BTTB = _generic_BTTB()
+    BTTB_matrix = cv.BTTB_from_metadata(BTTB_metadata=BTTB)
+    BTTB_2 = _generic_BTTB()
+    BTTB_2["columns"] = BTTB_2["columns"][::-1].copy()
+    BTTB_matrix_2 = cv.BTTB_from_metadata(BTTB_metadata=BTTB_2)
+    np.random.seed(21)
+    V = np.random.rand(30, 2)
+    for ordering in ["row", "column"]:
+        for rfft in [False, True]:
+            L = cv.eigenvalues_BCCB(BTTB, ordering=ordering, rfft=rfft)
+            L_2 = cv.eigenvalues_BCCB(BTTB_2, ordering=ordering, rfft=rfft)
+            # several vectors
+            W = cv.product_BCCB_vector(L, ordering, V, rfft=rfft, workers=2)
+            ae(W.shape, (30, 2))
+            aae(W, BTTB_matrix @ V, decimal=12)
+            # stack of eigenvalues and single vector
+            W = cv.product_BCCB_vector(
+                np.stack([L, L_2]), ordering, V[:, 0], rfft=rfft
+            )
+            aae(W[:, 0], BTTB_matrix @ V[:, 0], decimal=12)
+            aae(W[:, 1], BTTB_matrix_2 @ V[:, 0], decimal=12)
+            # stack of eigenvalues and several vectors
+            W = cv.product_BCCB_vector(
+                np.stack([L, np.conj(L_2)]), ordering, V, rfft=rfft
+            )
+            aae(W[:, 0], BTTB_matrix @ V[:, 0], decimal=12)
+            aae(W[:, 1], BTTB_matrix_2.T @ V[:, 1], decimal=12)
+    # number of eigenvalues matrices different from the number of vectors
+    with raises(ValueError):
+        cv.product_BCCB_vector(
+            np.stack([L, L_2, L]), "row", V, check_input=True
+        )
+    # v with more than two dimensions
+    with raises(ValueError):
+        cv.product_BCCB_vector(L, "row", np.ones((30, 2, 1)))
+
+
+##### fast embedding
+
+
+def test_embedding_shape():
+    "verify the FFT-friendly dimensions of the embedding BCCB"
+    ae(cv.embedding_shape(1009, 7), (2018, 14))
+    ae(cv.embedding_shape(1009, 7, fast=True), (2048, 16))
+    ae(cv.embedding_shape(101, 100, fast=True), (216, 200))
+    for nblocks, npoints in [(0, 3), (3, 2.0)]:
+        with raises(ValueError):
+            cv.embedding_shape(nblocks, npoints)
+    with raises(ValueError):
+        cv.embedding_shape(3, 3, fast="yes")
+
+
+def test_embedding_BCCB_fast_contains_BTTB():
+    "verify that the padded BCCB embeds the BTTB for all symmetries"
+    np.random.seed(4)
+    Q = 7
+    P = 13
+    Q_C, P_C = cv.embedding_shape(Q, P, fast=True)
+    for symmetry_structure in ["symm", "skew", "gene"]:
+        for symmetry_blocks in ["symm", "skew", "gene"]:
+            nrows = 2 * Q - 1 if symmetry_structure == "gene" else Q
+            BTTB = {
+                "ordering": "xy",
+                "symmetry_structure": symmetry_structure,
+                "symmetry_blocks": symmetry_blocks,
+                "nblocks": Q,
+                "columns": np.random.rand(nrows, P),
+                "rows": (
+                    np.random.rand(nrows, P - 1)
+                    if symmetry_blocks == "gene"
+                    else None
+                ),
+            }
+            BCCB = cv.embedding_BCCB(BTTB, full=True, fast=True)
+            ae(BCCB.shape, (Q_C * P_C, Q_C * P_C))
+            BTTB_matrix = cv.BTTB_from_metadata(BTTB)
+            aae(
+                BCCB.reshape(Q_C, P_C, Q_C, P_C)[:Q, :P, :Q, :P].reshape(
+                    Q * P, Q * P
+                ),
+                BTTB_matrix,
+                decimal=15,
+            )
+            # first column
+            aae(
+                cv.embedding_BCCB(BTTB, fast=True),
+                BCCB[:, 0],
+                decimal=15,
+            )
+
+
+def test_product_BCCB_vector_fast_embedding():
+    "compare the products computed with padded BCCB and the BTTB products"
+    # 7 blocks with 11 points are embedded into 16 blocks with 24 points
+    np.random.seed(17)
+    BTTB = {
+        "ordering": "xy",
+        "symmetry_structure": "gene",
+        "symmetry_blocks": "gene",
+        "nblocks": 7,
+        "columns": np.random.rand(13, 11),
+        "rows": np.random.rand(13, 10),
+    }
+    BTTB_matrix = cv.BTTB_from_metadata(BTTB_metadata=BTTB)
+    v = np.random.rand(77)
+    V = np.random.rand(77, 3)
+    for ordering in ["row", "column"]:
+        for rfft in [False, True]:
+            L = cv.eigenvalues_BCCB(
+                BTTB, ordering=ordering, rfft=rfft, fast=True
+            )
+            aae(
+                cv.product_BCCB_vector(L, ordering, v, rfft=rfft, nblocks=7),
+                BTTB_matrix @ v,
+                decimal=12,
+            )
+            aae(
+                cv.product_BCCB_vector(L, ordering, V, rfft=rfft, nblocks=7),
+                BTTB_matrix @ V,
+                decimal=12,
+            )
+            product = cv.ProductBCCB(
+                L, ordering, rfft=rfft, nblocks=7, size=77
+            )
+            aae(product(v), BTTB_matrix @ v, decimal=12)
+            aae(product(v, transpose=True), BTTB_matrix.T @ v, decimal=12)
+    # L computed with fast=True requires nblocks
+    L = cv.eigenvalues_BCCB(BTTB, ordering="row", fast=True)
+    ae(L.shape, (16, 24))
+    with raises(ValueError):
+        cv.product_BCCB_vector(L, "row", v)
+    # v size must be a multiple of nblocks
+    with raises(ValueError):
+        cv.product_BCCB_vector(L, "row", v, nblocks=6)
+    # L too small for the given nblocks
+    with raises(ValueError):
+        cv.product_BCCB_vector(L, "row", np.ones(99), nblocks=9)
+    with raises(ValueError):
+        cv.ProductBCCB(L, "row", nblocks=7)
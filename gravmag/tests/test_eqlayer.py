@@ -1,9 +1,11 @@
 import numpy as np
 from scipy.linalg import toeplitz, circulant, hankel
+from scipy.sparse.linalg import aslinearoperator
 from numpy.testing import assert_almost_equal as aae
 from numpy.testing import assert_equal as ae
 from pytest import raises
 from .. import eqlayer
+from .. import convolve
 
 
 # #### kernel_matrix_monopoles
@@ -401,6 +403,109 @@ def test_method_CGLS_true_parameter_vector():
     aae(parameters, parameters_true, decimal=10)
 
 
+def test_method_CGLS_linear_operators():
+    "Check if passing linear operators reproduces the result with matrices"
+    eps = 1e-3
+    ITMAX = 10
+    matrices = [
+        toeplitz(np.arange(1, 6)),
+        circulant(np.linspace(3.1, 11.0, 5)),
+        hankel([2, 3.5, 7.0, 1, 9.3]),
+    ]
+    data = []
+    parameters_true = np.array([2.0, 3.1, 7.0, 1.0, 4.5])
+    for G in matrices:
+        data.append(G @ parameters_true)
+    delta_list, parameters = eqlayer.method_CGLS(
+        sensitivity_matrices=[aslinearoperator(G) for G in matrices],
+        data_vectors=data,
+        epsilon=eps,
+        ITMAX=ITMAX,
+        check_input=True,
+    )
+    aae(parameters, parameters_true, decimal=10)
+    # operator with wrong number of rows
+    with raises(ValueError):
+        eqlayer.method_CGLS(
+            sensitivity_matrices=[aslinearoperator(np.ones((4, 5)))],
+            data_vectors=[np.ones(5)],
+            epsilon=eps,
+            ITMAX=ITMAX,
+            check_input=True,
+        )
+
+
+#### method_iterative_deconvolution_TOB20
+
+
+def test_method_iterative_deconvolution_TOB20_rfft():
+    "Check if the half spectra reproduce the result obtained with the full spectra"
+    np.random.seed(7)
+    BTTB = {
+        "ordering": "xy",
+        "symmetry_structure": "symm",
+        "symmetry_blocks": "symm",
+        "nblocks": 4,
+        "columns": 1.0
+        / (1.0 + np.arange(4)[:, np.newaxis] ** 2 + np.arange(5) ** 2) ** 2,
+        "rows": None,
+    }
+    data = [convolve.BTTB_from_metadata(BTTB) @ np.random.rand(20)]
+    L = [convolve.eigenvalues_BCCB(BTTB, ordering="row")]
+    L_half = [convolve.eigenvalues_BCCB(BTTB, ordering="row", rfft=True)]
+    deltas, parameters = eqlayer.method_iterative_deconvolution_TOB20(
+        L, data, epsilon=1e-10, ITMAX=8
+    )
+    deltas_half, parameters_half = eqlayer.method_iterative_deconvolution_TOB20(
+        L_half, data, epsilon=1e-10, ITMAX=8, rfft=True
+    )
+    aae(deltas_half, deltas, decimal=12)
+    aae(parameters_half, parameters, decimal=10)
+    # multithreaded FFTs
+    deltas_workers, parameters_workers = (
+        eqlayer.method_iterative_deconvolution_TOB20(
+            L_half, data, epsilon=1e-10, ITMAX=8, rfft=True, workers=2
+        )
+    )
+    aae(deltas_workers, deltas, decimal=12)
+    aae(parameters_workers, parameters, decimal=10)
+    # full spectra used as half spectra
+    with raises(ValueError):
+        eqlayer.method_iterative_deconvolution_TOB20(
+            L, data, epsilon=1e-10, ITMAX=20, rfft=True
+        )
+
+
+def test_method_iterative_deconvolution_TOB20_fast_embedding():
+    "Check if the padded BCCB reproduces the result obtained with the default embedding"
+    np.random.seed(9)
+    BTTB = {
+        "ordering": "xy",
+        "symmetry_structure": "symm",
+        "symmetry_blocks": "symm",
+        "nblocks": 7,
+        "columns": 1.0
+        / (1.0 + np.arange(7)[:, np.newaxis] ** 2 + np.arange(11) ** 2) ** 2,
+        "rows": None,
+    }
+    data = [convolve.BTTB_from_metadata(BTTB) @ np.random.rand(77)]
+    L = [convolve.eigenvalues_BCCB(BTTB, ordering="row")]
+    L_fast = [convolve.eigenvalues_BCCB(BTTB, ordering="row", fast=True)]
+    deltas, parameters = eqlayer.method_iterative_deconvolution_TOB20(
+        L, data, epsilon=1e-10, ITMAX=8
+    )
+    deltas_fast, parameters_fast = eqlayer.method_iterative_deconvolution_TOB20(
+        L_fast, data, epsilon=1e-10, ITMAX=8, nblocks=7
+    )
+    aae(deltas_fast, deltas, decimal=12)
+    aae(parameters_fast, parameters, decimal=10)
+    # padded BCCB without nblocks
+    with raises(ValueError):
+        eqlayer.method_iterative_deconvolution_TOB20(
+            L_fast, data, epsilon=1e-10, ITMAX=8
+        )
+
+
 #### method_column_action_C92
 
 
@@ -0,0 +1,191 @@
+import numpy as np
+from numpy.testing import assert_almost_equal as aae
+from numpy.testing import assert_equal as ae
+from pytest import raises
+from .. import hmatrix
+from .. import eqlayer
+from .. import inverse_distance as idist
+
+
+def _survey(N, seed=3):
+    "scattered data points above an equivalent layer"
+    rng = np.random.default_rng(seed)
+    data_points = {
+        "x": rng.uniform(0, 10000, N),
+        "y": rng.uniform(0, 10000, N),
+        "z": rng.uniform(-150, -100, N),
+    }
+    source_points = {
+        "x": data_points["x"] + rng.uniform(-10, 10, N),
+        "y": data_points["y"] + rng.uniform(-10, 10, N),
+        "z": np.full(N, 300.0),
+    }
+    return data_points, source_points, rng
+
+
+##### cluster_tree
+
+
+def test_cluster_tree_clusters():
+    "verify that the clusters partition the points and contain their boxes"
+    data_points, source_points, rng = _survey(500)
+    tree = hmatrix.cluster_tree(data_points, leaf_size=20)
+    ae(np.sort(tree["order"]), np.arange(500))
+    ae(tree["start"][0], 0)
+    ae(tree["end"][0], 500)
+    coordinates = np.column_stack(
+        [data_points["x"], data_points["y"], data_points["z"]]
+    )
+    for cluster in range(tree["start"].size):
+        indices = tree["order"][tree["start"][cluster] : tree["end"][cluster]]
+        aae(coordinates[indices].min(axis=0), tree["lower"][cluster])
+        aae(coordinates[indices].max(axis=0), tree["upper"][cluster])
+        if tree["children"][cluster, 0] == -1:
+            assert indices.size <= 20
+        else:
+            first, second = tree["children"][cluster]
+            ae(tree["start"][first], tree["start"][cluster])
+            ae(tree["end"][first], tree["start"][second])
+            ae(tree["end"][second], tree["end"][cluster])
+
+
+def test_cluster_tree_coincident_points():
+    "verify that coincident points are not split"
+    points = {
+        "x": np.ones(10),
+        "y": np.ones(10),
+        "z": np.ones(10),
+    }
+    tree = hmatrix.cluster_tree(points, leaf_size=2)
+    ae(tree["start"].size, 1)
+
+
+##### aca
+
+
+def test_aca_low_rank_matrix():
+    "verify that ACA retrieves a matrix with rank 3 with three crosses"
+    rng = np.random.default_rng(1)
+    A = rng.normal(size=(30, 3)) @ rng.normal(size=(3, 40))
+    U, V, error = hmatrix.aca(
+        row=lambda i: A[i],
+        column=lambda j: A[:, j],
+        shape=A.shape,
+        tolerance=1e-10,
+    )
+    assert U.shape[1] <= 4
+    aae(U @ V, A, decimal=10)
+    assert error <= 1e-10
+
+
+##### HMatrix
+
+
+def test_HMatrix_compare_dense():
+    "verify that the products reproduce those computed with the dense matrix"
+    data_points, source_points, rng = _survey(1500)
+    factors = {"z": 1.0}
+    K = idist.grad_combination(data_points, source_points, factors)
+    v = rng.normal(size=1500)
+    V = rng.normal(size=(1500, 3))
+    for tolerance in [1e-4, 1e-8]:
+        H = hmatrix.HMatrix(
+            data_points,
+            source_points,
+            factors,
+            tolerance=tolerance,
+            leaf_size=32,
+        )
+        ae(H.shape, (1500, 1500))
+        assert len(H.low_rank_blocks) > 0
+        assert H.compression_ratio > 1
+        error = np.linalg.norm(H @ np.eye(1500) - K) / np.linalg.norm(K)
+        assert error < 10 * tolerance
+        assert H.achieved_tolerance < 10 * tolerance
+        assert error < 10 * H.achieved_tolerance
+        for product, reference in [
+            (H @ v, K @ v),
+            (H.T @ v, K.T @ v),
+            (H @ V, K @ V),
+            (H.rmatvec(v), K.T @ v),
+        ]:
+            assert np.linalg.norm(product - reference) < 10 * tolerance * (
+                np.linalg.norm(reference)
+            )
+
+
+def test_HMatrix_achieved_tolerance_compare_dense():
+    "verify that the achieved tolerance is the error of the dense matrix"
+    data_points, source_points, rng = _survey(600)
+    factors = {"xx": 1.0, "zz": -1.0, "xz": 0.5}
+    K = idist.grad_combination(data_points, source_points, factors)
+    for tolerance in [1e-3, 1e-5]:
+        # all rows and columns of the low-rank blocks are sampled
+        H = hmatrix.HMatrix(
+            data_points,
+            source_points,
+            factors,
+            tolerance=tolerance,
+            leaf_size=32,
+            nsamples=600,
+        )
+        assert len(H.low_rank_blocks) > 0
+        error = np.linalg.norm(H @ np.eye(600) - K) / np.linalg.norm(K)
+        assert error > 0
+        aae(H.achieved_tolerance / error, 1.0, decimal=8)
+        # few sampled rows and columns
+        H = hmatrix.HMatrix(
+            data_points,
+            source_points,
+            factors,
+            tolerance=tolerance,
+            leaf_size=32,
+        )
+        assert 0.75 * error < H.achieved_tolerance < 1.25 * error
+
+
+def test_HMatrix_method_CGLS():
+    "verify that the CGLS with an HMatrix retrieves the dense solution"
+    data_points, source_points, rng = _survey(600)
+    factors = {"z": 1.0}
+    K = idist.grad_combination(data_points, source_points, factors)
+    H = hmatrix.HMatrix(
+        data_points, source_points, factors, tolerance=1e-8, leaf_size=32
+    )
+    data = K @ rng.normal(size=600)
+    deltas_dense, parameters_dense = eqlayer.method_CGLS(
+        [K], [data], epsilon=1e-12, ITMAX=20
+    )
+    deltas, parameters = eqlayer.method_CGLS(
+        [H], [data], epsilon=1e-12, ITMAX=20
+    )
+    aae(
+        parameters / np.max(np.abs(parameters_dense)),
+        parameters_dense / np.max(np.abs(parameters_dense)),
+        decimal=5,
+    )
+
+
+def test_HMatrix_invalid_input():
+    "check if passing invalid parameters raises an error"
+    data_points, source_points, rng = _survey(10)
+    for tolerance in [0.0, -1e-3, "1e-3"]:
+        with raises(ValueError):
+            hmatrix.HMatrix(
+                data_points, source_points, {"z": 1.0}, tolerance=tolerance
+            )
+    for eta in [0.0, -1.0]:
+        with raises(ValueError):
+            hmatrix.HMatrix(data_points, source_points, {"z": 1.0}, eta=eta)
+    for leaf_size in [0, 10.0]:
+        with raises(ValueError):
+            hmatrix.HMatrix(
+                data_points, source_points, {"z": 1.0}, leaf_size=leaf_size
+            )
+    for nsamples in [0, 8.0]:
+        with raises(ValueError):
+            hmatrix.HMatrix(
+                data_points, source_points, {"z": 1.0}, nsamples=nsamples
+            )
+    with raises(ValueError):
+        hmatrix.HMatrix(data_points, source_points, {"potential": 1.0})
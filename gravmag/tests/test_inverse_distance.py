@@ -692,6 +692,78 @@ def test_grad_tensor_known_points():
     aae(Tensor["yz"], Vyz_ref, decimal=15)
 
 
+##### grad tensor sparse
+
+
+def test_grad_tensor_sparse_compare_dense():
+    "verify that the sparse matrices contain the elements within the cutoff"
+    rng = np.random.default_rng(5)
+    data_points = {
+        "x": rng.uniform(-1000, 1000, 40),
+        "y": rng.uniform(-1000, 1000, 40),
+        "z": np.zeros(40),
+    }
+    source_points = {
+        "x": rng.uniform(-1000, 1000, 50),
+        "y": rng.uniform(-1000, 1000, 50),
+        "z": np.full(50, 100.0),
+    }
+    SEDM = idist.sedm(data_points, source_points)
+    Kab = idist.grad_tensor(data_points, source_points, SEDM)
+    # large cutoff retrieves the full matrices
+    Kab_sparse = idist.grad_tensor_sparse(data_points, source_points, 1e4)
+    for component in ["xx", "xy", "xz", "yy", "yz", "zz"]:
+        aae(Kab_sparse[component].toarray(), Kab[component], decimal=15)
+        aae(Kab_sparse["truncation_error"][component], 0.0, decimal=12)
+    # small cutoff neglects the elements of distant pairs
+    inside = SEDM <= 500.0**2
+    Kab_sparse = idist.grad_tensor_sparse(
+        data_points, source_points, 500.0, components=["xy", "zz"]
+    )
+    assert "xx" not in Kab_sparse
+    for component in ["xy", "zz"]:
+        ae(Kab_sparse[component].nnz, np.sum(inside))
+        aae(
+            Kab_sparse[component].toarray(),
+            np.where(inside, Kab[component], 0.0),
+            decimal=15,
+        )
+        # all rows are sampled and the estimate is exact
+        neglected = np.sum(np.abs(np.where(inside, 0.0, Kab[component])), axis=1)
+        full = np.sum(np.abs(Kab[component]), axis=1)
+        aae(
+            Kab_sparse["truncation_error"][component],
+            np.max(neglected / full),
+            decimal=12,
+        )
+
+
+def test_grad_tensor_sparse_invalid_input():
+    "check if passing invalid cutoff, components or nsamples raises an error"
+    data_points = {
+        "x": np.zeros(3),
+        "y": np.zeros(3),
+        "z": np.zeros(3),
+    }
+    source_points = {
+        "x": np.ones(4),
+        "y": np.ones(4),
+        "z": np.ones(4),
+    }
+    for cutoff in [0.0, -1.0, "10", np.array([10.0])]:
+        with raises(ValueError):
+            idist.grad_tensor_sparse(data_points, source_points, cutoff)
+    with raises(ValueError):
+        idist.grad_tensor_sparse(
+            data_points, source_points, 10.0, components=["xx", "x"]
+        )
+    for nsamples in [0, 2.0]:
+        with raises(ValueError):
+            idist.grad_tensor_sparse(
+                data_points, source_points, 10.0, nsamples=nsamples
+            )
+
+
 ##### grad tensor BTTB
 
 
@@ -1242,3 +1314,252 @@ def test__delta_zz_known_points():
     reference = 3 * 100
     symmetries, shape, delta = idist._delta_zz(grid, Dz, "yx")
     aae(reference, delta)
+
+
+##### fused combination
+
+
+def _random_points(N, M, seed=9):
+    "random data points above random source points"
+    rng = np.random.default_rng(seed)
+    data_points = {
+        "x": rng.uniform(-100, 100, N),
+        "y": rng.uniform(-100, 100, N),
+        "z": rng.uniform(-20, 0, N),
+    }
+    source_points = {
+        "x": rng.uniform(-100, 100, M),
+        "y": rng.uniform(-100, 100, M),
+        "z": rng.uniform(10, 50, M),
+    }
+    return data_points, source_points, rng
+
+
+def test_grad_combination_compare_grad_and_grad_tensor():
+    "verify that the combination reproduces the components of grad and grad_tensor"
+    data_points, source_points, rng = _random_points(13, 17)
+    R2 = idist.sedm(data_points, source_points)
+    Ka = idist.grad(data_points, source_points, R2)
+    Kab = idist.grad_tensor(
+        data_points,
+        source_points,
+        R2,
+        components=["xx", "xy", "xz", "yy", "yz", "zz"],
+    )
+    factors = dict()
+    reference = np.zeros((13, 17))
+    for component in idist.COMPONENTS:
+        K = Ka[component] if len(component) == 1 else Kab[component]
+        aae(
+            idist.grad_combination(
+                data_points, source_points, {component: 1.0}
+            ),
+            K,
+            decimal=12,
+        )
+        factors[component] = rng.uniform(-2, 2)
+        reference += factors[component] * K
+    aae(
+        idist.grad_combination(data_points, source_points, factors),
+        reference,
+        decimal=12,
+    )
+
+
+def test_grad_combination_compare_directional():
+    "verify that the combination reproduces the directional derivatives"
+    data_points, source_points, rng = _random_points(11, 7)
+    R2 = idist.sedm(data_points, source_points)
+    t = idist.utils.unit_vector(inc=35.0, dec=-12.0)
+    u = idist.utils.unit_vector(inc=-60.0, dec=40.0)
+    Kt = idist.directional_1st_order(
+        data_points, source_points, R2, inc=35.0, dec=-12.0
+    )
+    aae(
+        idist.grad_combination(
+            data_points, source_points, {"x": t[0], "y": t[1], "z": t[2]}
+        ),
+        Kt["tx"] + Kt["ty"] + Kt["tz"],
+        decimal=12,
+    )
+    Ktu = idist.directional_2nd_order(
+        data_points, source_points, R2, inc0=-60.0, dec0=40.0, inc=35.0, dec=-12.0
+    )
+    aae(
+        idist.grad_combination(
+            data_points, source_points, idist.utils.directional_factors(t, u)
+        ),
+        Ktu["xx"] + Ktu["xy"] + Ktu["xz"] + Ktu["yy"] + Ktu["yz"],
+        decimal=12,
+    )
+
+
+def test_grad_combination_out_and_Laplace():
+    "verify the output buffer and the Laplace equation"
+    data_points, source_points, rng = _random_points(5, 8)
+    out = np.full((5, 8), np.nan)
+    K = idist.grad_combination(
+        data_points, source_points, {"xx": 1.0, "yy": 1.0, "zz": 1.0}, out=out
+    )
+    assert K is out
+    Kzz = idist.grad_combination(data_points, source_points, {"zz": 1.0})
+    aae(out / np.max(np.abs(Kzz)), np.zeros((5, 8)), decimal=12)
+
+
+def test_grad_combination_invalid_input():
+    "check if passing invalid factors and buffers raises an error"
+    data_points, source_points, rng = _random_points(5, 8)
+    for factors in [{"potential": 1.0}, {"x": "1"}, {}, [("x", 1.0)]]:
+        with raises(ValueError):
+            idist.grad_combination(data_points, source_points, factors)
+    for out in [np.zeros((8, 5)), np.zeros((5, 8), dtype=int), np.zeros(40)]:
+        with raises(ValueError):
+            idist.grad_combination(
+                data_points, source_points, {"x": 1.0}, out=out
+            )
+
+
+##### directional_2nd_order_combined
+
+
+def test_directional_2nd_order_combined_compare_components():
+    "verify that the result is the sum of the components of directional_2nd_order"
+    data_points, source_points, rng = _random_points(17, 12)
+    R2 = idist.sedm(data_points, source_points)
+    Ktu = idist.directional_2nd_order(
+        data_points, source_points, R2, inc0=-60.0, dec0=40.0, inc=35.0, dec=-12.0
+    )
+    reference = Ktu["xx"] + Ktu["xy"] + Ktu["xz"] + Ktu["yy"] + Ktu["yz"]
+    for chunk_size in [None, 1, 5, 17, 100]:
+        aae(
+            idist.directional_2nd_order_combined(
+                data_points,
+                source_points,
+                inc0=-60.0,
+                dec0=40.0,
+                inc=35.0,
+                dec=-12.0,
+                chunk_size=chunk_size,
+            ),
+            reference,
+            decimal=12,
+        )
+    # output buffer
+    out = np.full((17, 12), np.nan)
+    Ktu = idist.directional_2nd_order_combined(
+        data_points,
+        source_points,
+        -60.0,
+        40.0,
+        35.0,
+        -12.0,
+        out=out,
+        chunk_size=4,
+    )
+    assert Ktu is out
+    aae(out, reference, decimal=12)
+
+
+def test_directional_2nd_order_combined_invalid_input():
+    "check if passing invalid buffers and chunk sizes raises an error"
+    data_points, source_points, rng = _random_points(5, 8)
+    for out in [
+        np.zeros((8, 5)),
+        np.zeros((5, 8), dtype=int),
+        np.zeros((8, 5)).T,
+        np.zeros(40),
+        [[0.0] * 8] * 5,
+    ]:
+        with raises(ValueError):
+            idist.directional_2nd_order_combined(
+                data_points, source_points, 10.0, 20.0, 30.0, 40.0, out=out
+            )
+    for chunk_size in [0, 2.0]:
+        with raises(ValueError):
+            idist.directional_2nd_order_combined(
+                data_points,
+                source_points,
+                10.0,
+                20.0,
+                30.0,
+                40.0,
+                chunk_size=chunk_size,
+            )
+    with raises(ValueError):
+        idist.directional_2nd_order_combined(
+            data_points, source_points, "10", 20.0, 30.0, 40.0
+        )
+
+
+##### KernelOperator
+
+
+def test_KernelOperator_compare_dense():
+    "verify that the products reproduce those computed with the dense matrix"
+    data_points, source_points, rng = _random_points(23, 31)
+    factors = {"z": 0.3, "xz": -1.2, "zz": 2.0}
+    K = idist.grad_combination(data_points, source_points, factors)
+    v = rng.normal(size=31)
+    r = rng.normal(size=23)
+    V = rng.normal(size=(31, 4))
+    for tile_shape in [(1, 1), (5, 7), (23, 31), (100, 100)]:
+        for cache_memory in [0, 3000, None]:
+            if cache_memory is None:
+                cache_memory = K.nbytes
+            operator = idist.KernelOperator(
+                data_points,
+                source_points,
+                factors,
+                tile_shape=tile_shape,
+                cache_memory=cache_memory,
+            )
+            ae(operator.shape, (23, 31))
+            for repeat in range(2):
+                aae(operator @ v, K @ v, decimal=12)
+                aae(operator.matvec(v), K @ v, decimal=12)
+                aae(operator.rmatvec(r), K.T @ r, decimal=12)
+                aae(operator.T @ r, K.T @ r, decimal=12)
+                aae(operator @ V, K @ V, decimal=12)
+                aae(operator.matmat(V), K @ V, decimal=12)
+            assert operator.cached_bytes() <= cache_memory
+
+
+def test_KernelOperator_cache():
+    "verify that the cache stores the tiles up to the given memory"
+    data_points, source_points, rng = _random_points(20, 20)
+    operator = idist.KernelOperator(
+        data_points, source_points, {"z": 1.0}, tile_shape=(10, 10)
+    )
+    operator @ np.ones(20)
+    ae(len(operator.cache), 0)
+    # room for three tiles of 10 x 10 elements
+    operator = idist.KernelOperator(
+        data_points,
+        source_points,
+        {"z": 1.0},
+        tile_shape=(10, 10),
+        cache_memory=3 * 800 + 10,
+    )
+    operator @ np.ones(20)
+    ae(len(operator.cache), 3)
+    ae(operator.cached_bytes(), 3 * 800)
+
+
+def test_KernelOperator_invalid_input():
+    "check if passing invalid tile shapes and cache sizes raises an error"
+    data_points, source_points, rng = _random_points(5, 8)
+    for tile_shape in [(0, 4), (3.0, 4), [3, 4], (3, 4, 5), 3]:
+        with raises(ValueError):
+            idist.KernelOperator(
+                data_points, source_points, {"z": 1.0}, tile_shape=tile_shape
+            )
+    for cache_memory in [-1, "1", None]:
+        with raises(ValueError):
+            idist.KernelOperator(
+                data_points,
+                source_points,
+                {"z": 1.0},
+                cache_memory=cache_memory,
+            )
+    with raises(ValueError):
+        idist.KernelOperator(data_points, source_points, {"potential": 1.0})
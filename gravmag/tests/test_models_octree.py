@@ -0,0 +1,101 @@
+import numpy as np
+from numpy.testing import assert_almost_equal as aae
+from numpy.testing import assert_equal as ae
+import pytest
+from ..models import octree
+
+
+def test_build_nodes():
+    "verify that the nodes partition the points and contain their spheres"
+    rng = np.random.default_rng(3)
+    points = rng.uniform(-100.0, 100.0, (500, 3))
+    radii = rng.uniform(0.0, 5.0, 500)
+    tree = octree.build(points, radii, leaf_size=10)
+    ae(np.sort(tree["order"]), np.arange(500))
+    ae(tree["start"][0], 0)
+    ae(tree["end"][0], 500)
+    leaves = tree["children"][:, 0] == -1
+    # leaves cover all points without overlapping
+    ae(np.sum(tree["end"][leaves] - tree["start"][leaves]), 500)
+    assert np.all(tree["end"][leaves] - tree["start"][leaves] <= 10)
+    for node in range(tree["start"].size):
+        indices = tree["order"][tree["start"][node] : tree["end"][node]]
+        distances = np.sqrt(
+            np.sum((points[indices] - tree["center"][node]) ** 2, axis=1)
+        )
+        assert np.all(distances + radii[indices] <= tree["radius"][node] + 1e-10)
+        children = tree["children"][node]
+        children = children[children != -1]
+        assert np.all(children > node)
+        if children.size > 0:
+            ae(
+                np.sum(tree["end"][children] - tree["start"][children]),
+                tree["end"][node] - tree["start"][node],
+            )
+
+
+def test_build_coincident_points():
+    "verify that coincident points are kept in a single leaf"
+    points = np.ones((20, 3))
+    tree = octree.build(points, np.zeros(20), leaf_size=4)
+    ae(tree["start"].size, 1)
+    ae(tree["depth"], 0)
+
+
+def test_moments_root():
+    "verify the moments of the root computed with the moments of the children"
+    rng = np.random.default_rng(7)
+    points = rng.uniform(-50.0, 50.0, (300, 3))
+    masses = rng.uniform(-1.0, 1.0, 300)
+    second_moments = rng.uniform(0.0, 2.0, (300, 3))
+    tree = octree.build(points, np.zeros(300), leaf_size=5)
+    source_moments = np.zeros((300, 10))
+    source_moments[:, 0] = masses
+    source_moments[:, [4, 7, 9]] = masses[:, np.newaxis] * second_moments
+    moments = octree.moments(tree, points, source_moments)
+    d = points - tree["center"][0]
+    aae(moments[0, 0], np.sum(masses), decimal=10)
+    aae(moments[0, 1:4], masses @ d, decimal=8)
+    Q = (masses[:, np.newaxis] * d).T @ d + np.diag(masses @ second_moments)
+    aae(moments[0, 4:], Q[[0, 0, 0, 1, 1, 2], [0, 1, 2, 1, 2, 2]], decimal=6)
+
+
+def test_kernel_multipole_convergence():
+    "verify that the error of the multipole expansion decreases with the cube of the distance"
+    rng = np.random.default_rng(1)
+    points = rng.uniform(-1.0, 1.0, (50, 3))
+    masses = rng.uniform(-1.0, 1.0, 50)
+    tree = octree.build(points, np.zeros(50), leaf_size=50)
+    source_moments = np.zeros((50, 10))
+    source_moments[:, 0] = masses
+    moments = octree.moments(tree, points, source_moments)
+    center = tree["center"][0]
+    direction = np.array([0.48, 0.6, 0.64])
+    for code in range(10):
+        errors = []
+        for distance in [20.0, 40.0]:
+            obs = center + distance * direction
+            expansion = octree.kernel_multipole(code, *(center - obs), moments[0])
+            # point masses (null dipole and quadrupole moments)
+            direct = 0.0
+            for point, mass in zip(points, masses):
+                row = np.zeros(10)
+                row[0] = mass
+                direct += octree.kernel_multipole(code, *(point - obs), row)
+            errors.append(np.abs(expansion - direct))
+        # the absolute error decreases with distance^(-4) or faster
+        assert errors[1] < errors[0] / 8
+
+
+def test_invalid_parameters():
+    "Check if passing invalid points, radii and leaf_size raises an error"
+    points = np.zeros((4, 3))
+    with pytest.raises(ValueError):
+        octree.build(points[:, :2], np.zeros(4))
+    with pytest.raises(ValueError):
+        octree.build(points, np.zeros(3))
+    with pytest.raises(ValueError):
+        octree.build(points, np.zeros(4), leaf_size=0)
+    tree = octree.build(points, np.zeros(4))
+    with pytest.raises(ValueError):
+        octree.moments(tree, points, np.zeros((4, 9)))
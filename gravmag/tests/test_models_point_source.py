@@ -0,0 +1,219 @@
+import numpy as np
+from numpy.testing import assert_almost_equal as aae
+from numpy.testing import assert_allclose as aac
+import pytest
+from ..models import point_source as ps
+from ..models import rectangular_prism_numba as rp_nb
+from .. import constants as cts
+
+
+def _sources(M=400, seed=2):
+    "random point sources below the surface"
+    rng = np.random.default_rng(seed)
+    sources = {
+        "x": rng.uniform(0.0, 2000.0, M),
+        "y": rng.uniform(0.0, 2000.0, M),
+        "z": rng.uniform(100.0, 600.0, M),
+    }
+    return sources, rng
+
+
+def _coordinates(N=7):
+    "regular grid of computation points"
+    x, y = np.meshgrid(np.linspace(-200, 2200, N), np.linspace(-200, 2200, N))
+    return {"x": x.ravel(), "y": y.ravel(), "z": np.full(x.size, -10.0)}
+
+
+def test_grav_single_source():
+    "verify the potential and vertical component of a point mass"
+    coordinates = {
+        "x": np.array([0.0, 30.0]),
+        "y": np.array([0.0, -40.0]),
+        "z": np.array([0.0, 0.0]),
+    }
+    sources = {"x": np.array([0.0]), "y": np.array([0.0]), "z": np.array([120.0])}
+    mass = np.array([1e9])
+    r = np.array([120.0, 130.0])
+    potential = ps.grav(coordinates, sources, mass, "potential")
+    aac(potential, cts.GRAVITATIONAL_CONST * 1e9 / r)
+    z = ps.grav(coordinates, sources, mass, "z")
+    aac(z, cts.GRAVITATIONAL_CONST * cts.SI2miliGAL * 1e9 * 120.0 / r**3)
+
+
+def test_grav_mag_compare_prism():
+    "verify that distant small prisms produce the fields of point sources"
+    coordinates = _coordinates(5)
+    sources, rng = _sources(M=5)
+    prisms = {
+        "x1": sources["x"] - 0.5,
+        "x2": sources["x"] + 0.5,
+        "y1": sources["y"] - 0.5,
+        "y2": sources["y"] + 0.5,
+        "z1": sources["z"] - 0.5,
+        "z2": sources["z"] + 0.5,
+    }
+    density = rng.uniform(-1000.0, 1000.0, 5)
+    for field in rp_nb.FIELDS:
+        reference = rp_nb.grav(coordinates, prisms, density, field)
+        aac(
+            ps.grav(coordinates, sources, density, field),
+            reference,
+            atol=1e-4 * np.max(np.abs(reference)),
+        )
+    moment = np.stack(
+        [
+            rng.uniform(1.0, 10.0, 5),
+            rng.uniform(-90.0, 90.0, 5),
+            rng.uniform(-180.0, 180.0, 5),
+        ],
+        axis=1,
+    )
+    inc = np.deg2rad(moment[:, 1])
+    dec = np.deg2rad(moment[:, 2])
+    mx = moment[:, 0] * np.cos(inc) * np.cos(dec)
+    my = moment[:, 0] * np.cos(inc) * np.sin(dec)
+    mz = moment[:, 0] * np.sin(inc)
+    for field in ["potential", "x", "y", "z"]:
+        reference = rp_nb.mag(coordinates, prisms, mx, my, mz, field)
+        aac(
+            ps.mag(coordinates, sources, moment, field),
+            reference,
+            atol=1e-4 * np.max(np.abs(reference)),
+        )
+
+
+def test_grav_tree_compare_direct():
+    "verify grav_tree for theta = 0 and decreasing values of theta"
+    coordinates = _coordinates()
+    sources, rng = _sources()
+    mass = rng.uniform(-1e9, 1e9, 400)
+    for field in rp_nb.FIELDS:
+        reference = ps.grav(coordinates, sources, mass, field)
+        aae(
+            ps.grav_tree(coordinates, sources, mass, field, theta=0),
+            reference,
+            decimal=10,
+        )
+        errors = []
+        for theta in [0.6, 0.2]:
+            computed = ps.grav_tree(
+                coordinates, sources, mass, field, theta=theta, leaf_size=4
+            )
+            errors.append(
+                np.max(np.abs(computed - reference))
+                / np.max(np.abs(reference))
+            )
+        assert errors[1] < errors[0]
+        assert errors[1] < 2e-2
+
+
+def test_mag_tree_compare_direct():
+    "verify mag_tree for theta = 0 and decreasing values of theta"
+    coordinates = _coordinates()
+    sources, rng = _sources()
+    moment = np.stack(
+        [
+            rng.uniform(1.0, 10.0, 400),
+            rng.uniform(-90.0, 90.0, 400),
+            rng.uniform(-180.0, 180.0, 400),
+        ],
+        axis=1,
+    )
+    for field in ["potential", "x", "y", "z"]:
+        reference = ps.mag(coordinates, sources, moment, field)
+        aac(
+            ps.mag_tree(coordinates, sources, moment, field, theta=0),
+            reference,
+            rtol=1e-10,
+        )
+        errors = []
+        for theta in [0.6, 0.2]:
+            computed = ps.mag_tree(
+                coordinates, sources, moment, field, theta=theta, leaf_size=4
+            )
+            errors.append(
+                np.max(np.abs(computed - reference))
+                / np.max(np.abs(reference))
+            )
+        assert errors[1] < errors[0]
+        assert errors[1] < 5e-2
+
+
+def test_tree_parallel():
+    "verify that the parallel treecode produces the same result as the serial one"
+    coordinates = _coordinates()
+    sources, rng = _sources()
+    mass = rng.uniform(-1e9, 1e9, 400)
+    reference = ps.grav_tree(coordinates, sources, mass, "zz", leaf_size=4)
+    computed = ps.grav_tree(
+        coordinates, sources, mass, "zz", leaf_size=4, parallel=True, nthreads=1
+    )
+    np.testing.assert_equal(computed, reference)
+
+
+def test_chunks_and_parallel_compare_dense():
+    "verify that the chunked and parallel evaluations produce the dense result"
+    coordinates = _coordinates()
+    sources, rng = _sources(M=103)
+    mass = rng.uniform(-1e9, 1e9, 103)
+    moment = np.stack(
+        [
+            rng.uniform(1.0, 10.0, 103),
+            rng.uniform(-90.0, 90.0, 103),
+            rng.uniform(-180.0, 180.0, 103),
+        ],
+        axis=1,
+    )
+    for field in rp_nb.FIELDS:
+        reference = ps.grav(coordinates, sources, mass, field)
+        for chunk_size in [1, 10, 103, 500]:
+            aac(
+                ps.grav(coordinates, sources, mass, field, chunk_size=chunk_size),
+                reference,
+                rtol=1e-12,
+            )
+        aac(
+            ps.grav(coordinates, sources, mass, field, parallel=True),
+            reference,
+            rtol=1e-10,
+        )
+    for field in ["potential", "x", "y", "z"]:
+        reference = ps.mag(coordinates, sources, moment, field)
+        aac(
+            ps.mag(coordinates, sources, moment, field, chunk_size=17),
+            reference,
+            rtol=1e-12,
+        )
+        aac(
+            ps.mag(coordinates, sources, moment, field, parallel=True),
+            reference,
+            rtol=1e-10,
+        )
+
+
+def test_invalid_parameters():
+    "Check if passing invalid fields, properties and theta raises an error"
+    coordinates = _coordinates(2)
+    sources, rng = _sources(M=3)
+    mass = np.ones(3)
+    moment = np.ones((3, 3))
+    for function in [ps.grav, ps.grav_tree]:
+        with pytest.raises(ValueError):
+            function(coordinates, sources, mass, "invalid field")
+        with pytest.raises(ValueError):
+            function(coordinates, sources, mass[:2], "z")
+    for function in [ps.mag, ps.mag_tree]:
+        with pytest.raises(ValueError):
+            function(coordinates, sources, moment, "xx")
+        with pytest.raises(ValueError):
+            function(coordinates, sources, moment[:, :2], "z")
+    for theta in [-0.5, 1, "0.5"]:
+        with pytest.raises(ValueError):
+            ps.grav_tree(coordinates, sources, mass, "z", theta=theta)
+    with pytest.raises(ValueError):
+        ps.mag_tree(coordinates, sources, moment, "z", parallel="yes")
+    for chunk_size in [0, 2.0]:
+        with pytest.raises(ValueError):
+            ps.grav(coordinates, sources, mass, "z", chunk_size=chunk_size)
+        with pytest.raises(ValueError):
+            ps.mag(coordinates, sources, moment, "z", chunk_size=chunk_size)
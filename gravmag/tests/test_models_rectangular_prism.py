@@ -5,6 +5,8 @@ import pytest
 from ..models import rectangular_prism_numba as rp_nb
 from ..models import rectangular_prism as rp
 from .. import constants as cts
+from .. import data_structures as ds
+from .. import utils
 
 
 def test_rectangular_prism_invalid_grav_field():
@@ -730,3 +732,957 @@ def test_kernel_zz_numbaXnumpy():
     # compute with numpy
     result_numpy = rp.iterate_over_vertices(coords, model, rho, rp.kernel_zz)
     aae(result_numba, result_numpy, decimal=8)
+
+
+##### tiles
+
+
+def test_grav_tiles_compare_single_tile():
+    "Verify if results obtained with tiles are equal to those obtained without tiles"
+    model = {
+        "x1": np.array([-130.0, 200.0, -40.0, 10.0]),
+        "x2": np.array([100.0, 300.0, 40.0, 90.0]),
+        "y1": np.array([-100.0, -20.0, 100.0, -300.0]),
+        "y2": np.array([100.0, 80.0, 150.0, -200.0]),
+        "z1": np.array([100.0, 50.0, 10.0, 300.0]),
+        "z2": np.array([213.0, 150.0, 90.0, 400.0]),
+    }
+    coords = {
+        "x": np.array([0.0, 30.0, -62.1, 150.0, 320.0]),
+        "y": np.array([0.0, -10.0, 80.0, 40.0, -250.0]),
+        "z": np.array([-1.0, 0.0, -2.0, -10.0, -100.0]),
+    }
+    rho = np.array([1300.0, -200.0, 450.0, 2670.0])
+    for field in ["potential", "z", "xy", "zz"]:
+        reference = rp.grav(coords, model, rho, field=field)
+        for tile_shape in [(1, 1), (2, 3), (5, 1), (3, 4)]:
+            computed = rp.grav(
+                coords, model, rho, field=field, tile_shape=tile_shape
+            )
+            aae(computed, reference, decimal=10)
+
+
+def test_mag_tiles_compare_single_tile():
+    "Verify if results obtained with tiles are equal to those obtained without tiles"
+    model = {
+        "x1": np.array([-130.0, 200.0, -40.0]),
+        "x2": np.array([100.0, 300.0, 40.0]),
+        "y1": np.array([-100.0, -20.0, 100.0]),
+        "y2": np.array([100.0, 80.0, 150.0]),
+        "z1": np.array([100.0, 50.0, 10.0]),
+        "z2": np.array([213.0, 150.0, 90.0]),
+    }
+    coords = {
+        "x": np.array([0.0, 30.0, -62.1, 150.0]),
+        "y": np.array([0.0, -10.0, 80.0, 40.0]),
+        "z": np.array([-1.0, 0.0, -2.0, -10.0]),
+    }
+    mx = np.array([1.2, -0.5, 3.0])
+    my = np.array([0.3, 2.0, -1.0])
+    mz = np.array([-2.0, 0.7, 1.5])
+    for field in ["potential", "x", "y", "z"]:
+        reference = rp.mag(coords, model, mx, my, mz, field=field)
+        computed = rp.mag(
+            coords, model, mx, my, mz, field=field, tile_shape=(3, 2)
+        )
+        aae(computed, reference, decimal=10)
+
+
+def test_grav_max_memory_compare_single_tile():
+    "Verify if results obtained with a memory budget are equal to those obtained without tiles"
+    model = {
+        "x1": np.array([-130.0, 200.0, -40.0]),
+        "x2": np.array([100.0, 300.0, 40.0]),
+        "y1": np.array([-100.0, -20.0, 100.0]),
+        "y2": np.array([100.0, 80.0, 150.0]),
+        "z1": np.array([100.0, 50.0, 10.0]),
+        "z2": np.array([213.0, 150.0, 90.0]),
+    }
+    coords = {
+        "x": np.array([0.0, 30.0, -62.1, 150.0]),
+        "y": np.array([0.0, -10.0, 80.0, 40.0]),
+        "z": np.array([-1.0, 0.0, -2.0, -10.0]),
+    }
+    rho = np.array([1300.0, -200.0, 450.0])
+    reference = rp.grav(coords, model, rho, field="z")
+    computed = rp.grav(coords, model, rho, field="z", max_memory=1000)
+    aae(computed, reference, decimal=10)
+
+
+def test_tile_shape_from_memory():
+    "Verify if the tile shape respects the memory budget"
+    ndata, nprisms = rp.tile_shape_from_memory(D=1000, P=300, max_memory=1e6)
+    assert ndata * nprisms * rp._BYTES_PER_TILE_ELEMENT <= 1e6
+    ae(nprisms, 300)
+    # the budget is large enough to process everything at once
+    ae(rp.tile_shape_from_memory(D=10, P=20, max_memory=1e9), (10, 20))
+    # the budget is smaller than a single element
+    ae(rp.tile_shape_from_memory(D=10, P=20, max_memory=1), (1, 1))
+
+
+def test_grav_invalid_tiles():
+    "Check if passing invalid tile parameters raises an error"
+    model = {
+        "x1": np.array([-130.0]),
+        "x2": np.array([100.0]),
+        "y1": np.array([-100.0]),
+        "y2": np.array([100.0]),
+        "z1": np.array([100.0]),
+        "z2": np.array([213.0]),
+    }
+    coords = {
+        "x": np.array([0.0, 30.0]),
+        "y": np.array([0.0, -10.0]),
+        "z": np.array([-1.0, 0.0]),
+    }
+    rho = np.array([1300.0])
+    with pytest.raises(ValueError):
+        rp.grav(coords, model, rho, field="z", tile_shape=(2,))
+    with pytest.raises(ValueError):
+        rp.grav(coords, model, rho, field="z", tile_shape=(0, 1))
+    with pytest.raises(ValueError):
+        rp.grav(coords, model, rho, field="z", tile_shape=[1, 1])
+    with pytest.raises(ValueError):
+        rp.grav(
+            coords, model, rho, field="z", tile_shape=(1, 1), max_memory=1e6
+        )
+
+
+##### multiple fields
+
+
+def test_fields_numpy_numba_engines():
+    "Verify if the numpy and numba engines define the same fields and terms"
+    ae(rp_nb.FIELDS, list(rp.kernels))
+    ae(sorted(rp_nb.FIELDS_TERMS), sorted(rp.kernels_terms))
+    for field in rp_nb.FIELDS:
+        terms = rp_nb._required_terms([field])
+        names = {rp_nb.TERMS[i] for i in np.flatnonzero(terms)}
+        ae(names, set(rp.kernels_terms[field]))
+
+
+def test_grav_fields_compare_grav():
+    "Verify if fields computed at once are equal to those computed separately"
+    model = {
+        "x1": np.array([-130.0, 200.0, -40.0]),
+        "x2": np.array([100.0, 300.0, 40.0]),
+        "y1": np.array([-100.0, -20.0, 100.0]),
+        "y2": np.array([100.0, 80.0, 150.0]),
+        "z1": np.array([100.0, 50.0, 10.0]),
+        "z2": np.array([213.0, 150.0, 90.0]),
+    }
+    coords = {
+        "x": np.array([0.0, 30.0, -62.1, 150.0, 0.0]),
+        "y": np.array([0.0, -10.0, 80.0, 40.0, 0.0]),
+        "z": np.array([-1.0, 0.0, -2.0, -10.0, 150.0]),
+    }
+    rho = np.array([1300.0, -200.0, 450.0])
+    fields = ["potential", "x", "y", "z", "xx", "xy", "xz", "yy", "yz", "zz"]
+    computed_numpy = rp.grav_fields(coords, model, rho, fields)
+    computed_numba = rp_nb.grav_fields(coords, model, rho, fields)
+    ae(list(computed_numpy.keys()), fields)
+    ae(list(computed_numba.keys()), fields)
+    for field in fields:
+        reference = rp.grav(coords, model, rho, field=field)
+        aae(computed_numpy[field], reference, decimal=10)
+        aae(computed_numba[field], reference, decimal=8)
+    # subset of fields with tiles
+    computed_numpy = rp.grav_fields(
+        coords, model, rho, ["zz", "z"], tile_shape=(2, 2)
+    )
+    aae(computed_numpy["z"], rp.grav(coords, model, rho, "z"), decimal=10)
+    aae(computed_numpy["zz"], rp.grav(coords, model, rho, "zz"), decimal=10)
+
+
+def test_grav_fields_invalid_fields():
+    "Check if passing invalid fields raises an error"
+    model = {
+        "x1": np.array([-130.0]),
+        "x2": np.array([100.0]),
+        "y1": np.array([-100.0]),
+        "y2": np.array([100.0]),
+        "z1": np.array([100.0]),
+        "z2": np.array([213.0]),
+    }
+    coords = {
+        "x": np.array([0.0, 30.0]),
+        "y": np.array([0.0, -10.0]),
+        "z": np.array([-1.0, 0.0]),
+    }
+    rho = np.array([1300.0])
+    for grav_fields in [rp.grav_fields, rp_nb.grav_fields]:
+        with pytest.raises(ValueError):
+            grav_fields(coords, model, rho, "z")
+        with pytest.raises(ValueError):
+            grav_fields(coords, model, rho, [])
+        with pytest.raises(ValueError):
+            grav_fields(coords, model, rho, ["z", "invalid field"])
+
+
+def test_grav_mag_numbaXnumpy():
+    "Verify if grav and mag computed with numba and numpy are equal to each other"
+    model = {
+        "x1": np.array([-130.0, 200.0, -40.0]),
+        "x2": np.array([100.0, 300.0, 40.0]),
+        "y1": np.array([-100.0, -20.0, 100.0]),
+        "y2": np.array([100.0, 80.0, 150.0]),
+        "z1": np.array([100.0, 50.0, 10.0]),
+        "z2": np.array([213.0, 150.0, 90.0]),
+    }
+    coords = {
+        "x": np.array([0.0, 30.0, -62.1, 150.0]),
+        "y": np.array([0.0, -10.0, 80.0, 40.0]),
+        "z": np.array([-1.0, 0.0, -2.0, -10.0]),
+    }
+    rho = np.array([1300.0, -200.0, 450.0])
+    for field in ["potential", "z", "xz", "yy"]:
+        aae(
+            rp_nb.grav(coords, model, rho, field=field),
+            rp.grav(coords, model, rho, field=field),
+            decimal=8,
+        )
+    mx = np.array([1.2, -0.5, 3.0])
+    my = np.array([0.3, 2.0, -1.0])
+    mz = np.array([-2.0, 0.7, 1.5])
+    for field in ["potential", "x", "y", "z"]:
+        aae(
+            rp_nb.mag(coords, model, mx, my, mz, field=field),
+            rp.mag(coords, model, mx, my, mz, field=field),
+            decimal=8,
+        )
+
+
+##### parallel
+
+
+def test_grav_parallel_compare_serial():
+    "verify that parallel and serial computations produce the same gravitational fields"
+    coordinates = {
+        "x": np.linspace(-300.0, 300.0, 37),
+        "y": np.linspace(-250.0, 350.0, 37),
+        "z": np.full(37, -10.0),
+    }
+    prisms = {
+        "x1": np.array([-150.0, 20.0, -40.0]),
+        "x2": np.array([-50.0, 120.0, 40.0]),
+        "y1": np.array([-80.0, -60.0, 100.0]),
+        "y2": np.array([20.0, 30.0, 180.0]),
+        "z1": np.array([30.0, 50.0, 10.0]),
+        "z2": np.array([130.0, 200.0, 90.0]),
+    }
+    density = np.array([1000.0, -500.0, 800.0])
+    for field in rp_nb.FIELDS:
+        serial = rp_nb.grav(coordinates, prisms, density, field)
+        parallel = rp_nb.grav(coordinates, prisms, density, field, parallel=True)
+        ae(parallel, serial)
+        parallel = rp_nb.grav(
+            coordinates, prisms, density, field, parallel=True, nthreads=1
+        )
+        ae(parallel, serial)
+    serial = rp_nb.grav_fields(coordinates, prisms, density, rp_nb.FIELDS)
+    parallel = rp_nb.grav_fields(
+        coordinates, prisms, density, rp_nb.FIELDS, parallel=True
+    )
+    for field in rp_nb.FIELDS:
+        ae(parallel[field], serial[field])
+
+
+def test_mag_parallel_compare_serial():
+    "verify that parallel and serial computations produce the same magnetic fields"
+    coordinates = {
+        "x": np.linspace(-300.0, 300.0, 37),
+        "y": np.linspace(-250.0, 350.0, 37),
+        "z": np.full(37, -10.0),
+    }
+    prisms = {
+        "x1": np.array([-150.0, 20.0]),
+        "x2": np.array([-50.0, 120.0]),
+        "y1": np.array([-80.0, -60.0]),
+        "y2": np.array([20.0, 30.0]),
+        "z1": np.array([30.0, 50.0]),
+        "z2": np.array([130.0, 200.0]),
+    }
+    mx = np.array([1.2, -0.3])
+    my = np.array([0.5, 0.8])
+    mz = np.array([-1.0, 2.1])
+    for field in ["x", "y", "z"]:
+        serial = rp_nb.mag(coordinates, prisms, mx, my, mz, field)
+        parallel = rp_nb.mag(coordinates, prisms, mx, my, mz, field, parallel=True)
+        ae(parallel, serial)
+
+
+def test_invalid_threads():
+    "must raise error for invalid parallel parameters"
+    coordinates = {
+        "x": np.array([0.0]),
+        "y": np.array([0.0]),
+        "z": np.array([0.0]),
+    }
+    prisms = {
+        "x1": np.array([-10.0]),
+        "x2": np.array([10.0]),
+        "y1": np.array([-10.0]),
+        "y2": np.array([10.0]),
+        "z1": np.array([10.0]),
+        "z2": np.array([20.0]),
+    }
+    density = np.array([1000.0])
+    # parallel must be boolean
+    with pytest.raises(ValueError):
+        rp_nb.grav(coordinates, prisms, density, "z", parallel="yes")
+    # nthreads must be a positive integer
+    for nthreads in [0, -2, 1.5]:
+        with pytest.raises(ValueError):
+            rp_nb.grav(
+                coordinates, prisms, density, "z", parallel=True, nthreads=nthreads
+            )
+    # nthreads must not exceed the number of threads available to numba
+    with pytest.raises(ValueError):
+        rp_nb.grav(
+            coordinates,
+            prisms,
+            density,
+            "z",
+            parallel=True,
+            nthreads=rp_nb.numba.config.NUMBA_NUM_THREADS + 1,
+        )
+
+
+##### sensitivity matrix
+
+
+def test_grav_sensitivity_compare_grav():
+    "verify that the sensitivity matrix times the density produces the field computed by grav"
+    coordinates = {
+        "x": np.linspace(-300.0, 300.0, 13),
+        "y": np.linspace(-250.0, 350.0, 13),
+        "z": np.full(13, -10.0),
+    }
+    prisms = {
+        "x1": np.array([-150.0, 20.0, -40.0]),
+        "x2": np.array([-50.0, 120.0, 40.0]),
+        "y1": np.array([-80.0, -60.0, 100.0]),
+        "y2": np.array([20.0, 30.0, 180.0]),
+        "z1": np.array([30.0, 50.0, 10.0]),
+        "z2": np.array([130.0, 200.0, 90.0]),
+    }
+    density = np.array([1000.0, -500.0, 800.0])
+    for field in rp.kernels:
+        G = rp.grav_sensitivity(coordinates, prisms, field)
+        ae(G.shape, (13, 3))
+        aae(G @ density, rp.grav(coordinates, prisms, density, field), decimal=10)
+        G_tiles = rp.grav_sensitivity(coordinates, prisms, field, tile_shape=(4, 2))
+        ae(G_tiles, G)
+
+
+def test_grav_sensitivity_memmap(tmp_path):
+    "verify that the sensitivity matrix written into a memmap is equal to that kept in memory"
+    coordinates = {
+        "x": np.linspace(-300.0, 300.0, 13),
+        "y": np.linspace(-250.0, 350.0, 13),
+        "z": np.full(13, -10.0),
+    }
+    prisms = {
+        "x1": np.array([-150.0, 20.0, -40.0]),
+        "x2": np.array([-50.0, 120.0, 40.0]),
+        "y1": np.array([-80.0, -60.0, 100.0]),
+        "y2": np.array([20.0, 30.0, 180.0]),
+        "z1": np.array([30.0, 50.0, 10.0]),
+        "z2": np.array([130.0, 200.0, 90.0]),
+    }
+    filename = str(tmp_path / "G.dat")
+    G = rp.grav_sensitivity(coordinates, prisms, "zz")
+    G_memmap = rp.grav_sensitivity(
+        coordinates, prisms, "zz", tile_shape=(5, 2), filename=filename
+    )
+    assert isinstance(G_memmap, np.memmap)
+    ae(G_memmap, G)
+    # reopen the file
+    G_read = np.memmap(filename, dtype="float64", mode="r", shape=(13, 3))
+    ae(G_read, G)
+    # invalid filename
+    with pytest.raises(ValueError):
+        rp.grav_sensitivity(coordinates, prisms, "zz", filename=3)
+    # invalid field
+    with pytest.raises(ValueError):
+        rp.grav_sensitivity(coordinates, prisms, "zzz")
+
+
+##### mesh
+
+
+def test_grav_mesh_compare_grav():
+    "verify that grav_mesh and grav produce the same fields for a voxel mesh"
+    x = np.linspace(-200.0, 200.0, 5)
+    y = np.linspace(-300.0, 300.0, 4)
+    z = np.linspace(100.0, 300.0, 3)
+    x1, y1, z1 = np.meshgrid(x[:-1], y[:-1], z[:-1], indexing="ij")
+    x2, y2, z2 = np.meshgrid(x[1:], y[1:], z[1:], indexing="ij")
+    prisms = {
+        "x1": x1.ravel(),
+        "x2": x2.ravel(),
+        "y1": y1.ravel(),
+        "y2": y2.ravel(),
+        "z1": z1.ravel(),
+        "z2": z2.ravel(),
+    }
+    rng = np.random.default_rng(7)
+    density = rng.uniform(-1000.0, 1000.0, prisms["x1"].size)
+    coordinates = {
+        "x": np.linspace(-350.0, 350.0, 11),
+        "y": np.linspace(-450.0, 250.0, 11),
+        "z": np.full(11, -10.0),
+    }
+    for field in rp.kernels:
+        reference = rp.grav(coordinates, prisms, density, field)
+        computed = rp.grav_mesh(coordinates, prisms, density, field)
+        aae(computed, reference, decimal=8)
+        computed = rp.grav_mesh(
+            coordinates, prisms, density, field, tile_shape=(4, 7)
+        )
+        aae(computed, reference, decimal=8)
+
+
+def test_mesh_vertices_homogeneous_block():
+    "verify that only the 8 outer corners remain for a homogeneous block"
+    x = np.linspace(0.0, 300.0, 4)
+    y = np.linspace(0.0, 200.0, 3)
+    z = np.linspace(100.0, 300.0, 3)
+    x1, y1, z1 = np.meshgrid(x[:-1], y[:-1], z[:-1], indexing="ij")
+    x2, y2, z2 = np.meshgrid(x[1:], y[1:], z[1:], indexing="ij")
+    prisms = {
+        "x1": x1.ravel(),
+        "x2": x2.ravel(),
+        "y1": y1.ravel(),
+        "y2": y2.ravel(),
+        "z1": z1.ravel(),
+        "z2": z2.ravel(),
+    }
+    density = np.full(prisms["x1"].size, 500.0)
+    vertices, (weights,) = rp.mesh_vertices(prisms, [density])
+    ae(vertices["x"].size, 8)
+    ae(np.abs(weights), np.full(8, 500.0))
+    ae(np.sort(np.unique(vertices["x"])), np.array([0.0, 300.0]))
+    ae(np.sort(np.unique(vertices["z"])), np.array([100.0, 300.0]))
+
+
+def test_grav_mesh_null_weights():
+    "verify that grav_mesh returns zeros if all vertex weights cancel"
+    coordinates = {
+        "x": np.linspace(-300.0, 300.0, 7),
+        "y": np.linspace(-250.0, 350.0, 7),
+        "z": np.full(7, -10.0),
+    }
+    # two coincident prisms with opposite densities
+    prisms = {
+        "x1": np.array([-150.0, -150.0]),
+        "x2": np.array([-50.0, -50.0]),
+        "y1": np.array([-80.0, -80.0]),
+        "y2": np.array([20.0, 20.0]),
+        "z1": np.array([30.0, 30.0]),
+        "z2": np.array([130.0, 130.0]),
+    }
+    for density in [np.zeros(2), np.array([500.0, -500.0])]:
+        vertices, _ = rp.mesh_vertices(prisms, [density])
+        ae(vertices["x"].size, 0)
+        for field in rp.kernels:
+            ae(rp.grav_mesh(coordinates, prisms, density, field), np.zeros(7))
+            ae(
+                rp.grav_mesh(
+                    coordinates, prisms, density, field, tile_shape=(4, 7)
+                ),
+                np.zeros(7),
+            )
+    computed = rp.grav_mesh(coordinates, prisms, np.zeros((2, 3)), "z")
+    ae(computed, np.zeros((7, 3)))
+
+
+##### multiple models
+
+
+def test_grav_multiple_models_compare_single_model():
+    "verify that the fields of K density models are equal to those computed model by model"
+    coordinates = {
+        "x": np.linspace(-300.0, 300.0, 13),
+        "y": np.linspace(-250.0, 350.0, 13),
+        "z": np.full(13, -10.0),
+    }
+    prisms = {
+        "x1": np.array([-150.0, 20.0, -40.0, -150.0]),
+        "x2": np.array([-50.0, 120.0, 40.0, -50.0]),
+        "y1": np.array([-80.0, -60.0, 100.0, 20.0]),
+        "y2": np.array([20.0, 30.0, 180.0, 120.0]),
+        "z1": np.array([30.0, 50.0, 10.0, 30.0]),
+        "z2": np.array([130.0, 200.0, 90.0, 130.0]),
+    }
+    rng = np.random.default_rng(3)
+    density = rng.uniform(-1000.0, 1000.0, (4, 5))
+    for field in rp.kernels:
+        computed = rp.grav(coordinates, prisms, density, field, tile_shape=(5, 3))
+        ae(computed.shape, (13, 5))
+        computed_fields = rp.grav_fields(coordinates, prisms, density, [field])
+        computed_mesh = rp.grav_mesh(coordinates, prisms, density, field)
+        for k in range(5):
+            reference = rp.grav(coordinates, prisms, density[:, k], field)
+            aae(computed[:, k], reference, decimal=10)
+            aae(computed_fields[field][:, k], reference, decimal=10)
+            aae(computed_mesh[:, k], reference, decimal=8)
+
+
+def test_mag_multiple_models_compare_single_model():
+    "verify that the fields of K magnetization models are equal to those computed model by model"
+    coordinates = {
+        "x": np.linspace(-300.0, 300.0, 13),
+        "y": np.linspace(-250.0, 350.0, 13),
+        "z": np.full(13, -10.0),
+    }
+    prisms = {
+        "x1": np.array([-150.0, 20.0]),
+        "x2": np.array([-50.0, 120.0]),
+        "y1": np.array([-80.0, -60.0]),
+        "y2": np.array([20.0, 30.0]),
+        "z1": np.array([30.0, 50.0]),
+        "z2": np.array([130.0, 200.0]),
+    }
+    rng = np.random.default_rng(4)
+    mx, my, mz = rng.uniform(-2.0, 2.0, (3, 2, 4))
+    for field in ["potential", "x", "y", "z"]:
+        computed = rp.mag(coordinates, prisms, mx, my, mz, field)
+        ae(computed.shape, (13, 4))
+        for k in range(4):
+            reference = rp.mag(
+                coordinates, prisms, mx[:, k], my[:, k], mz[:, k], field
+            )
+            aae(computed[:, k], reference, decimal=10)
+    # magnetization components with different shapes
+    with pytest.raises(ValueError):
+        rp.mag(coordinates, prisms, mx, my[:, 0], mz, "z")
+    # invalid number of dimensions
+    with pytest.raises(ValueError):
+        rp.mag(coordinates, prisms, mx[..., None], my[..., None], mz[..., None], "z")
+
+
+##### far-field approximation
+
+
+def test_grav_approximate_error_bound():
+    "verify that the errors of the approximated gravitational fields do not exceed the error bounds"
+    x = np.linspace(-20000.0, 20000.0, 11)
+    x1, y1 = np.meshgrid(x[:-1], x[:-1], indexing="ij")
+    x2, y2 = np.meshgrid(x[1:], x[1:], indexing="ij")
+    rng = np.random.default_rng(11)
+    prisms = {
+        "x1": x1.ravel(),
+        "x2": x2.ravel(),
+        "y1": y1.ravel(),
+        "y2": y2.ravel(),
+        "z1": np.full(100, 500.0),
+        "z2": rng.uniform(1500.0, 3000.0, 100),
+    }
+    density = rng.uniform(-300.0, 300.0, 100)
+    coordinates = {
+        "x": rng.uniform(-20000.0, 20000.0, 50),
+        "y": rng.uniform(-20000.0, 20000.0, 50),
+        "z": np.zeros(50),
+    }
+    for field in rp.kernels:
+        reference = rp.grav(coordinates, prisms, density, field)
+        computed, error_bound = rp.grav_approximate(
+            coordinates, prisms, density, field, tolerance=1e-2, tile_shape=(20, 30)
+        )
+        # some pairs are approximated
+        assert np.any(error_bound > 0)
+        # allow for rounding errors in the exactly computed pairs
+        rounding = 1e-10 * np.max(np.abs(reference))
+        assert np.all(np.abs(computed - reference) <= error_bound + rounding)
+        # a tiny tolerance reproduces the exact field
+        computed, error_bound = rp.grav_approximate(
+            coordinates, prisms, density, field, tolerance=1e-12
+        )
+        ae(error_bound, np.zeros(50))
+        aae(computed, reference, decimal=10)
+
+
+def test_mag_approximate_error_bound():
+    "verify that the errors of the approximated magnetic fields do not exceed the error bounds"
+    x = np.linspace(-20000.0, 20000.0, 11)
+    x1, y1 = np.meshgrid(x[:-1], x[:-1], indexing="ij")
+    x2, y2 = np.meshgrid(x[1:], x[1:], indexing="ij")
+    rng = np.random.default_rng(12)
+    prisms = {
+        "x1": x1.ravel(),
+        "x2": x2.ravel(),
+        "y1": y1.ravel(),
+        "y2": y2.ravel(),
+        "z1": np.full(100, 500.0),
+        "z2": rng.uniform(1500.0, 3000.0, 100),
+    }
+    mx, my, mz = rng.normal(size=(3, 100, 2))
+    coordinates = {
+        "x": rng.uniform(-20000.0, 20000.0, 50),
+        "y": rng.uniform(-20000.0, 20000.0, 50),
+        "z": np.zeros(50),
+    }
+    for field in ["potential", "x", "y", "z"]:
+        reference = rp.mag(coordinates, prisms, mx, my, mz, field)
+        computed, error_bound = rp.mag_approximate(
+            coordinates, prisms, mx, my, mz, field, tolerance=1e-2
+        )
+        ae(computed.shape, (50, 2))
+        assert np.any(error_bound > 0)
+        # allow for rounding errors in the exactly computed pairs
+        rounding = 1e-10 * np.max(np.abs(reference))
+        assert np.all(np.abs(computed - reference) <= error_bound + rounding)
+    # invalid tolerance
+    with pytest.raises(ValueError):
+        rp.mag_approximate(coordinates, prisms, mx, my, mz, "z", tolerance=-1.0)
+    # invalid field
+    with pytest.raises(ValueError):
+        rp.mag_approximate(coordinates, prisms, mx, my, mz, "xx", tolerance=1e-2)
+
+
+##### BTTB
+
+
+def test_grav_BTTB_compare_grav():
+    "verify that grav_BTTB and grav produce the same fields for layers of prisms"
+    data_grid = ds.grid_xy(
+        area=[-1000.0, 1500.0, -800.0, 1200.0], shape=(6, 5), z0=-50.0
+    )
+    dx, dy = ds.grid_xy_spacing(area=data_grid["area"], shape=data_grid["shape"])
+    rng = np.random.default_rng(8)
+    density = [rng.uniform(-500.0, 500.0, 30), rng.uniform(-500.0, 500.0, 30)]
+    delta_z = [100.0, 300.0]
+    thickness = [150.0, 50.0]
+    for ordering in ["xy", "yx"]:
+        coordinates = ds.grid_xy_to_full_flatten(data_grid, ordering)
+        for field in rp.kernels:
+            reference = np.zeros(30)
+            for dz, t, rho in zip(delta_z, thickness, density):
+                prisms = {
+                    "x1": coordinates["x"] - 0.5 * dx,
+                    "x2": coordinates["x"] + 0.5 * dx,
+                    "y1": coordinates["y"] - 0.5 * dy,
+                    "y2": coordinates["y"] + 0.5 * dy,
+                    "z1": np.full(30, -50.0 + dz),
+                    "z2": np.full(30, -50.0 + dz + t),
+                }
+                reference += rp.grav(coordinates, prisms, rho, field)
+            computed = rp.grav_BTTB(
+                data_grid, delta_z, thickness, density, field, ordering
+            )
+            aae(computed, reference, decimal=10)
+            # sum of single layers
+            computed = 0
+            for dz, t, rho in zip(delta_z, thickness, density):
+                computed += rp.grav_BTTB(data_grid, dz, t, rho, field, ordering)
+            aae(computed, reference, decimal=10)
+
+
+def test_mag_BTTB_compare_mag():
+    "verify that mag_BTTB and mag produce the same fields for a layer of prisms"
+    data_grid = ds.grid_xy(
+        area=[-1000.0, 1500.0, -800.0, 1200.0], shape=(6, 5), z0=-50.0
+    )
+    dx, dy = ds.grid_xy_spacing(area=data_grid["area"], shape=data_grid["shape"])
+    rng = np.random.default_rng(9)
+    mx, my, mz = rng.normal(size=(3, 30))
+    for ordering in ["xy", "yx"]:
+        coordinates = ds.grid_xy_to_full_flatten(data_grid, ordering)
+        prisms = {
+            "x1": coordinates["x"] - 0.5 * dx,
+            "x2": coordinates["x"] + 0.5 * dx,
+            "y1": coordinates["y"] - 0.5 * dy,
+            "y2": coordinates["y"] + 0.5 * dy,
+            "z1": np.full(30, 50.0),
+            "z2": np.full(30, 150.0),
+        }
+        for field in ["potential", "x", "y", "z"]:
+            reference = rp.mag(coordinates, prisms, mx, my, mz, field)
+            computed = rp.mag_BTTB(
+                data_grid, 100.0, 100.0, mx, my, mz, field, ordering
+            )
+            aae(computed, reference, decimal=10)
+
+
+def test_grav_BTTB_invalid_layers():
+    "must raise error for inconsistent layers"
+    data_grid = ds.grid_xy(
+        area=[-1000.0, 1500.0, -800.0, 1200.0], shape=(6, 5), z0=-50.0
+    )
+    density = np.ones(30)
+    # different number of layers
+    with pytest.raises(ValueError):
+        rp.grav_BTTB(data_grid, [100.0, 200.0], [50.0], [density, density], "z")
+    with pytest.raises(ValueError):
+        rp.grav_BTTB(data_grid, [100.0, 200.0], [50.0, 50.0], [density], "z")
+    # negative delta_z
+    with pytest.raises(ValueError):
+        rp.grav_BTTB(data_grid, -100.0, 50.0, density, "z")
+    # density with wrong number of elements
+    with pytest.raises(ValueError):
+        rp.grav_BTTB(data_grid, 100.0, 50.0, np.ones(29), "z")
+
+
+##### incremental update
+
+
+def test_incremental_grav_compare_grav():
+    "verify that the incrementally updated field is equal to that computed from scratch"
+    coordinates = {
+        "x": np.linspace(-300.0, 300.0, 13),
+        "y": np.linspace(-250.0, 350.0, 13),
+        "z": np.full(13, -10.0),
+    }
+    prisms = {
+        "x1": np.array([-150.0, 20.0, -40.0, -150.0]),
+        "x2": np.array([-50.0, 120.0, 40.0, -50.0]),
+        "y1": np.array([-80.0, -60.0, 100.0, 20.0]),
+        "y2": np.array([20.0, 30.0, 180.0, 120.0]),
+        "z1": np.array([30.0, 50.0, 10.0, 30.0]),
+        "z2": np.array([130.0, 200.0, 90.0, 130.0]),
+    }
+    density = np.array([1000.0, -500.0, 800.0, 300.0])
+    for field in rp.kernels:
+        model = rp.IncrementalGrav(
+            coordinates, prisms, density, field, tile_shape=(5, 3)
+        )
+        aae(model.result, rp.grav(coordinates, prisms, density, field), decimal=10)
+        # repeated indices accumulate their changes
+        indices = np.array([2, 0, 2])
+        delta_density = np.array([100.0, -200.0, 50.0])
+        model.update(indices, delta_density)
+        updated_density = np.array([800.0, -500.0, 950.0, 300.0])
+        ae(model.density, updated_density)
+        aae(
+            model.result,
+            rp.grav(coordinates, prisms, updated_density, field),
+            decimal=10,
+        )
+    # the input density is not modified
+    ae(density, np.array([1000.0, -500.0, 800.0, 300.0]))
+    # invalid indices
+    with pytest.raises(ValueError):
+        model.update(np.array([4]), np.array([1.0]))
+    with pytest.raises(ValueError):
+        model.update(np.array([1.0]), np.array([1.0]))
+    # delta_density inconsistent with indices
+    with pytest.raises(ValueError):
+        model.update(np.array([1, 2]), np.array([1.0]))
+
+
+##### total-field anomaly
+
+
+def test_mag_tfa_compare_mag():
+    "verify that mag_tfa is equal to the projection of the induction computed by mag"
+    coordinates = {
+        "x": np.linspace(-300.0, 300.0, 37),
+        "y": np.linspace(-250.0, 350.0, 37),
+        "z": np.full(37, -10.0),
+    }
+    prisms = {
+        "x1": np.array([-150.0, 20.0, -40.0]),
+        "x2": np.array([-50.0, 120.0, 40.0]),
+        "y1": np.array([-80.0, -60.0, 100.0]),
+        "y2": np.array([20.0, 30.0, 180.0]),
+        "z1": np.array([30.0, 50.0, 10.0]),
+        "z2": np.array([130.0, 200.0, 90.0]),
+    }
+    mx = np.array([1.2, -0.3, 0.7])
+    my = np.array([0.5, 0.8, -1.1])
+    mz = np.array([-1.0, 2.1, 0.4])
+    for inc, dec in [(-30.0, 20.0), (90, 0), (15.0, -45.0)]:
+        F = utils.unit_vector(inc, dec)
+        reference = (
+            F[0] * rp_nb.mag(coordinates, prisms, mx, my, mz, "x")
+            + F[1] * rp_nb.mag(coordinates, prisms, mx, my, mz, "y")
+            + F[2] * rp_nb.mag(coordinates, prisms, mx, my, mz, "z")
+        )
+        computed = rp_nb.mag_tfa(coordinates, prisms, mx, my, mz, inc, dec)
+        aae(computed, reference, decimal=10)
+        computed_parallel = rp_nb.mag_tfa(
+            coordinates, prisms, mx, my, mz, inc, dec, parallel=True
+        )
+        ae(computed_parallel, computed)
+    # invalid inclination
+    with pytest.raises(ValueError):
+        rp_nb.mag_tfa(coordinates, prisms, mx, my, mz, "30", 20.0)
+
+
+##### compilation
+
+
+def test_warmup_signatures():
+    "verify that warmup compiles the signatures used by the functions"
+    rp_nb.warmup(parallel=False)
+    for function, signature in rp_nb._signatures(parallel=False):
+        assert len(function.signatures) > 0
+    # the compiled signatures are used by grav (no new compilation)
+    nsignatures = len(rp_nb.jit_grav.signatures)
+    coordinates = {
+        "x": np.array([0.0, 10.0]),
+        "y": np.array([0.0, 10.0]),
+        "z": np.array([0.0, 0.0]),
+    }
+    prisms = {
+        "x1": np.array([-10.0]),
+        "x2": np.array([10.0]),
+        "y1": np.array([-10.0]),
+        "y2": np.array([10.0]),
+        "z1": np.array([10.0]),
+        "z2": np.array([20.0]),
+    }
+    rp_nb.grav(coordinates, prisms, np.array([1000.0]), "z")
+    ae(len(rp_nb.jit_grav.signatures), nsignatures)
+    # invalid parallel
+    with pytest.raises(ValueError):
+        rp_nb.warmup(parallel="no")
+
+
+##### prism model
+
+
+def test_prism_model_compare_functions():
+    "verify that the methods of PrismModel produce the same fields as functions grav and mag"
+    coordinates = {
+        "x": np.linspace(-300.0, 300.0, 13),
+        "y": np.linspace(-250.0, 350.0, 13),
+        "z": np.full(13, -10.0),
+    }
+    prisms = {
+        "x1": np.array([-150.0, 20.0, -40.0]),
+        "x2": np.array([-50.0, 120.0, 40.0]),
+        "y1": np.array([-80.0, -60.0, 100.0]),
+        "y2": np.array([20.0, 30.0, 180.0]),
+        "z1": np.array([30.0, 50.0, 10.0]),
+        "z2": np.array([130.0, 200.0, 90.0]),
+    }
+    density = np.array([1000.0, -500.0, 800.0])
+    mx = np.array([1.2, -0.3, 0.7])
+    my = np.array([0.5, 0.8, -1.1])
+    mz = np.array([-1.0, 2.1, 0.4])
+    model = rp_nb.PrismModel(prisms)
+    ae(model.size, 3)
+    aae(model.volumes, np.array([1e6, 1.35e6, 5.12e5]), decimal=6)
+    ae(model.bounds, np.array([-150.0, 120.0, -80.0, 180.0, 10.0, 200.0]))
+    packed = rp_nb.pack_coordinates(coordinates)
+    ae(packed.shape, (3, 13))
+    for field in rp_nb.FIELDS:
+        reference = rp_nb.grav(coordinates, prisms, density, field)
+        ae(model.grav(packed, density, field), reference)
+        ae(model.grav(coordinates, density, field), reference)
+    for field in ["potential", "x", "y", "z"]:
+        reference = rp_nb.mag(coordinates, prisms, mx, my, mz, field)
+        ae(model.mag(packed, mx, my, mz, field), reference)
+    # invalid coordinates
+    with pytest.raises(ValueError):
+        model.grav(packed[:2], density, "z")
+    # invalid density
+    with pytest.raises(ValueError):
+        model.grav(packed, density[:2], "z")
+    # invalid field
+    with pytest.raises(ValueError):
+        model.mag(packed, mx, my, mz, "xx")
+
+
+##### hierarchical (Barnes-Hut) algorithm
+
+
+def _voxel_model(shape=(12, 12, 6), size=100.0, seed=11):
+    "regular mesh of prisms with random densities"
+    x, y, z = np.meshgrid(
+        size * np.arange(shape[0]),
+        size * np.arange(shape[1]),
+        50.0 + size * np.arange(shape[2]),
+        indexing="ij",
+    )
+    prisms = {
+        "x1": x.ravel(),
+        "x2": x.ravel() + size,
+        "y1": y.ravel(),
+        "y2": y.ravel() + size,
+        "z1": z.ravel(),
+        "z2": z.ravel() + size,
+    }
+    density = np.random.default_rng(seed).uniform(-500.0, 1000.0, x.size)
+    return prisms, density
+
+
+def test_grav_tree_theta_zero():
+    "verify that theta = 0 computes all prisms with the closed-form formulas"
+    prisms, density = _voxel_model()
+    x, y = np.meshgrid(np.linspace(-200, 1400, 9), np.linspace(-200, 1400, 9))
+    coordinates = {"x": x.ravel(), "y": y.ravel(), "z": np.full(x.size, -20.0)}
+    for field in rp_nb.FIELDS:
+        reference = rp_nb.grav(coordinates, prisms, density, field)
+        computed = rp_nb.grav_tree(
+            coordinates, prisms, density, field, theta=0, leaf_size=8
+        )
+        aae(computed, reference, decimal=10)
+
+
+def test_grav_tree_compare_direct():
+    "verify that the error with respect to grav decreases with theta"
+    prisms, density = _voxel_model()
+    x, y = np.meshgrid(np.linspace(-200, 1400, 9), np.linspace(-200, 1400, 9))
+    coordinates = {"x": x.ravel(), "y": y.ravel(), "z": np.full(x.size, -20.0)}
+    for field in rp_nb.FIELDS:
+        reference = rp_nb.grav(coordinates, prisms, density, field)
+        errors = []
+        for theta in [0.6, 0.4, 0.2]:
+            computed = rp_nb.grav_tree(
+                coordinates, prisms, density, field, theta=theta, leaf_size=8
+            )
+            errors.append(
+                np.max(np.abs(computed - reference))
+                / np.max(np.abs(reference))
+            )
+        assert errors[2] < errors[1] < errors[0]
+        assert errors[2] < 1e-3
+
+
+def test_grav_tree_parallel_and_model():
+    "verify that parallel and PrismModel.grav_tree produce the same result as grav_tree"
+    prisms, density = _voxel_model(shape=(8, 8, 4))
+    coordinates = {
+        "x": np.linspace(-100.0, 900.0, 15),
+        "y": np.linspace(900.0, -100.0, 15),
+        "z": np.full(15, -10.0),
+    }
+    reference = rp_nb.grav_tree(coordinates, prisms, density, "zz")
+    ae(
+        rp_nb.grav_tree(
+            coordinates, prisms, density, "zz", parallel=True, nthreads=1
+        ),
+        reference,
+    )
+    model = rp_nb.PrismModel(prisms)
+    packed = rp_nb.pack_coordinates(coordinates)
+    ae(model.grav_tree(packed, density, "zz"), reference)
+    # the octree is reused by the subsequent calls
+    tree = model._tree(32)
+    model.grav_tree(packed, 2 * density, "zz")
+    assert model._tree(32) is tree
+
+
+def test_grav_tree_invalid_parameters():
+    "Check if passing invalid theta, leaf_size and field raises an error"
+    prisms, density = _voxel_model(shape=(2, 2, 2))
+    coordinates = {
+        "x": np.array([0.0]),
+        "y": np.array([0.0]),
+        "z": np.array([0.0]),
+    }
+    for theta in [-0.1, 1.0, 2, "0.5"]:
+        with pytest.raises(ValueError):
+            rp_nb.grav_tree(coordinates, prisms, density, "z", theta=theta)
+    for leaf_size in [0, 2.5]:
+        with pytest.raises(ValueError):
+            rp_nb.grav_tree(
+                coordinates, prisms, density, "z", leaf_size=leaf_size
+            )
+    with pytest.raises(ValueError):
+        rp_nb.grav_tree(coordinates, prisms, density, "invalid field")
+    with pytest.raises(ValueError):
+        rp_nb.grav_tree(coordinates, prisms, density[:3], "z")
@@ -3,7 +3,7 @@ from numba import njit
 from . import check, data_structures
 
 
-@njit
+@njit(cache=True)
 def safe_atan2_entrywise(y, x):
     """
     Principal value of the arctangent expressed as a two variable function
@@ -26,7 +26,7 @@ def safe_atan2_entrywise(y, x):
     return result
 
 
-@njit
+@njit(cache=True)
 def safe_atan2(y, x):
     """
     Principal value of the arctangent expressed as a two variable function
@@ -76,7 +76,7 @@ def safe_atan2_np(y, x):
     return result
 
 
-@njit
+@njit(cache=True)
 def safe_log_entrywise(x):
     """
     Modified log to return 0 for log(0).
@@ -89,7 +89,7 @@ def safe_log_entrywise(x):
     return result
 
 
-@njit
+@njit(cache=True)
 def safe_log(x):
     """
     Modified log to return 0 for log(0).